@@ -0,0 +1,156 @@
+"""
+Statistiques vectorisées des annonces (NumPy)
+
+Les colonnes utiles sont chargées en une seule requête dans des tableaux
+NumPy; comptes, moyennes, médianes, centiles et prix au m² sont ensuite
+calculés pour tous les groupes (source, commune, DPE, statut) à la fois,
+sans boucle Python sur les annonces. Utilisé par analyzer.py et les exports.
+"""
+import logging
+
+from config import ANALYTICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    logger.info("numpy non installé: statistiques détaillées indisponibles (pip install numpy)")
+    NUMPY_AVAILABLE = False
+
+NUMERIC_COLUMNS = ('price', 'surface', 'rooms')
+GROUP_COLUMNS = ('source', 'location', 'dpe', 'status')
+
+
+def _none_if_nan(value):
+    value = float(value)
+    return None if value != value else value
+
+
+class ListingArrays:
+    """Colonnes des annonces sous forme de tableaux NumPy
+
+    Les valeurs numériques manquantes valent NaN; chaque colonne de groupe
+    est codée en entiers (`codes[col]`) avec ses libellés (`labels[col]`).
+
+    Args:
+        rows: tuples (price, surface, rooms, source, location, dpe, status)
+    """
+
+    def __init__(self, rows=()):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy est requis pour les statistiques vectorisées (pip install numpy)")
+        rows = rows if isinstance(rows, list) else list(rows)
+        self.size = len(rows)
+        columns = list(zip(*rows)) if rows else [()] * (len(NUMERIC_COLUMNS) + len(GROUP_COLUMNS))
+
+        self.values = {}
+        for name, column in zip(NUMERIC_COLUMNS, columns):
+            # None -> NaN avec dtype float
+            self.values[name] = np.array(column, dtype=np.float64)
+        price, surface = self.values['price'], self.values['surface']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.values['price_per_sqm'] = np.where(surface > 0, price / surface, np.nan)
+
+        self.codes = {}
+        self.labels = {}
+        for name, column in zip(GROUP_COLUMNS, columns[len(NUMERIC_COLUMNS):]):
+            index = {}
+            codes = np.fromiter((index.setdefault(value, len(index)) for value in column),
+                                dtype=np.int64, count=self.size)
+            # Codes sur 16 bits quand c'est possible: tri par groupe en radix
+            self.codes[name] = codes.astype(np.uint16 if len(index) <= 1 << 16 else np.uint32)
+            self.labels[name] = list(index)
+        self._order = {}
+
+    @classmethod
+    def from_database(cls, db, filters=None, since_hours=None, date_range=None):
+        """Charger les annonces (mêmes filtres que Database.compute_statistics)"""
+        return cls(db.listing_columns(NUMERIC_COLUMNS + GROUP_COLUMNS, filters, since_hours, date_range))
+
+    @classmethod
+    def from_listings(cls, listings):
+        """Construire à partir de dicts d'annonces"""
+        return cls([tuple(prop.get(name) for name in NUMERIC_COLUMNS + GROUP_COLUMNS) for prop in listings])
+
+    def summary(self):
+        """Statistiques de l'ensemble des annonces"""
+        return self._describe(np.zeros(self.size, dtype=np.uint16), 1)[0]
+
+    def group_stats(self, by):
+        """Statistiques par valeur de `by` (source, location, dpe ou status)
+
+        Returns:
+            dict {libellé: statistiques}, libellés triés par nombre d'annonces décroissant
+        """
+        if by not in self.codes:
+            raise ValueError(f"Regroupement inconnu: {by} (attendu: {', '.join(GROUP_COLUMNS)})")
+        labels = self.labels[by]
+        stats = self._describe(self.codes[by], len(labels))
+        order = sorted(range(len(labels)), key=lambda i: -stats[i]['count'])
+        return {labels[i]: stats[i] for i in order}
+
+    def _describe(self, codes, n_groups):
+        """Statistiques de chaque groupe (liste indexée par code)"""
+        percentiles = ANALYTICS_CONFIG.get('percentiles', (10, 25, 75, 90))
+        counts = np.bincount(codes, minlength=n_groups)
+        price = self._grouped('price', codes, n_groups, [0, 50, 100] + list(percentiles))
+        surface = self._grouped('surface', codes, n_groups, [50])
+        rooms = self._grouped('rooms', codes, n_groups, [])
+        per_sqm = self._grouped('price_per_sqm', codes, n_groups, [50])
+
+        groups = []
+        for g in range(n_groups):
+            groups.append({
+                'count': int(counts[g]),
+                'avg_price': _none_if_nan(price['mean'][g]),
+                'median_price': _none_if_nan(price[50][g]),
+                'min_price': _none_if_nan(price[0][g]),
+                'max_price': _none_if_nan(price[100][g]),
+                'price_percentiles': {f'p{q}': _none_if_nan(price[q][g]) for q in percentiles},
+                'avg_surface': _none_if_nan(surface['mean'][g]),
+                'median_surface': _none_if_nan(surface[50][g]),
+                'avg_rooms': _none_if_nan(rooms['mean'][g]),
+                'avg_price_per_sqm': _none_if_nan(per_sqm['mean'][g]),
+                'median_price_per_sqm': _none_if_nan(per_sqm[50][g])
+            })
+        return groups
+
+    def _sorted(self, name):
+        """Indices des valeurs présentes de `name`, triées (calculé une fois par colonne)"""
+        if name not in self._order:
+            values = self.values[name]
+            order = np.argsort(values, kind='stable')
+            self._order[name] = order[:np.count_nonzero(~np.isnan(values))]  # NaN en fin de tri
+        return self._order[name]
+
+    def _grouped(self, name, codes, n_groups, percentiles):
+        """Moyenne et centiles (interpolation linéaire) de la colonne `name` par groupe
+
+        Les valeurs étant déjà triées, un tri stable par code de groupe donne
+        chaque groupe en tranche ordonnée: le centile q est lu à la position
+        début + q% * (n - 1) de la tranche. NaN pour un groupe sans valeur.
+        """
+        order = self._sorted(name)
+        group_codes = codes[order]
+        values = self.values[name][order]
+        counts = np.bincount(group_codes, minlength=n_groups)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = {'mean': np.bincount(group_codes, weights=values, minlength=n_groups) / counts}
+        if not percentiles:
+            return result
+
+        sorted_values = values[np.argsort(group_codes, kind='stable')]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        last = max(len(sorted_values) - 1, 0)
+        for q in percentiles:
+            position = starts + q / 100 * np.maximum(counts - 1, 0)
+            low = np.clip(np.floor(position).astype(np.int64), 0, last)
+            high = np.clip(np.ceil(position).astype(np.int64), 0, last)
+            if len(sorted_values):
+                value = sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+            else:
+                value = np.zeros(n_groups)
+            result[q] = np.where(counts > 0, value, np.nan)
+        return result
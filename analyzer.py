@@ -6,7 +6,9 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import json
 
+from analytics import NUMPY_AVAILABLE, ListingArrays
 from database import Database
+from reference_prices import deal_score
 from utils import PropertyUtils, DataProcessor, DateUtils
 
 logger = logging.getLogger(__name__)
@@ -36,64 +38,59 @@ class PropertyAnalyzer:
                 property_data.get('surface')
             )
         
-        # Déterminer si c'est une bonne affaire
+        # Déterminer si c'est une bonne affaire (prix de référence de la commune)
         if analysis.get('price_per_sqm'):
+            reference = self.db.deal_reference(property_data.get('location'),
+                                               property_data.get('property_type'))
+            analysis['reference_price_per_sqm'] = reference['median_price_per_sqm'] if reference else None
+            analysis['deal_score'] = deal_score(property_data.get('price'),
+                                                property_data.get('surface'), reference)
             analysis['is_good_deal'] = PropertyUtils.is_good_deal(
                 property_data.get('price'),
                 property_data.get('surface'),
-                property_data.get('location', 'Paris')
+                reference
             )
         
         return analysis
     
     def get_summary_stats(self, time_period_hours=24):
         """Obtenir un résumé des statistiques"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # Propriétés récentes
-        cursor.execute('''
-            SELECT * FROM properties
-            WHERE created_at >= datetime('now', '-' || ? || ' hours')
-            ORDER BY created_at DESC
-        ''', (time_period_hours,))
-        
-        recent_properties = cursor.fetchall()
+        db_stats = self.db.compute_statistics(since_hours=time_period_hours)
         
         stats = {
             'period': f'{time_period_hours}h',
-            'count': len(recent_properties),
-            'by_source': {},
-            'average_price': None,
+            'count': db_stats['total_properties'],
+            'by_source': db_stats['by_source'],
+            'average_price': db_stats['avg_price'],
             'price_range': None,
-            'average_surface': None,
-            'average_rooms': None
+            'average_surface': db_stats['avg_surface'],
+            'average_rooms': db_stats['avg_rooms']
         }
         
-        if recent_properties:
-            # Par source
-            from collections import Counter
-            sources = Counter(p['source'] for p in recent_properties)
-            stats['by_source'] = dict(sources)
-            
-            # Prix
-            prices = [p['price'] for p in recent_properties if p['price']]
-            if prices:
-                stats['average_price'] = sum(prices) / len(prices)
-                stats['price_range'] = (min(prices), max(prices))
-            
-            # Surface
-            surfaces = [p['surface'] for p in recent_properties if p['surface']]
-            if surfaces:
-                stats['average_surface'] = sum(surfaces) / len(surfaces)
-            
-            # Pièces
-            rooms_list = [p['rooms'] for p in recent_properties if p['rooms']]
-            if rooms_list:
-                stats['average_rooms'] = sum(rooms_list) / len(rooms_list)
+        if db_stats['min_price'] is not None:
+            stats['price_range'] = (db_stats['min_price'], db_stats['max_price'])
+        
+        if NUMPY_AVAILABLE:
+            arrays = ListingArrays.from_database(self.db, since_hours=time_period_hours)
+            summary = arrays.summary()
+            stats.update({
+                'median_price': summary['median_price'],
+                'price_percentiles': summary['price_percentiles'],
+                'average_price_per_sqm': summary['avg_price_per_sqm'],
+                'median_price_per_sqm': summary['median_price_per_sqm'],
+                'by_dpe': {dpe: group['count'] for dpe, group in arrays.group_stats('dpe').items()}
+            })
         
         return stats
     
+    def get_group_stats(self, by='location', filters=None, since_hours=None):
+        """Statistiques par source, commune (location), DPE ou statut
+        
+        Returns:
+            dict {valeur: count, moyennes, médianes, centiles, prix au m²}
+        """
+        return ListingArrays.from_database(self.db, filters, since_hours).group_stats(by)
+    
     def get_market_report(self):
         """Générer un rapport de marché complet"""
         db_stats = self.db.get_statistics()
@@ -115,6 +112,10 @@ class PropertyAnalyzer:
         if summary.get('count') > 0:
             report['analysis']['new_listings_24h'] = summary['count']
         
+        if NUMPY_AVAILABLE:
+            arrays = ListingArrays.from_database(self.db)
+            report['segments'] = {by: arrays.group_stats(by) for by in ('source', 'location', 'dpe')}
+        
         return report
     
     def export_report(self, filepath: Path, report_format='json'):
@@ -142,38 +143,38 @@ class PropertyComparator:
         if not props_list:
             return {}
         
-        comparison = {
+        # Un seul parcours pour tous les extrêmes
+        prices, surfaces = [], []
+        best_value = most_expensive = largest = None
+        for p in props_list:
+            price, surface = p.get('price') or 0, p.get('surface') or 0
+            if price:
+                prices.append(price)
+            if surface:
+                surfaces.append(surface)
+            # Meilleur rapport prix/surface
+            if price and surface and (best_value is None or price / surface < best_value[0]):
+                best_value = (price / surface, p['id'])
+            if most_expensive is None or price > most_expensive[0]:
+                most_expensive = (price, p['id'])
+            if largest is None or surface > largest[0]:
+                largest = (surface, p['id'])
+        
+        return {
             'count': len(props_list),
             'price': {
-                'min': min(p.get('price', float('inf')) for p in props_list),
-                'max': max(p.get('price', 0) for p in props_list),
-                'avg': sum(p.get('price', 0) for p in props_list) / len(props_list)
+                'min': min(prices, default=None),
+                'max': max(prices, default=None),
+                'avg': sum(prices) / len(props_list)
             },
             'surface': {
-                'min': min(p.get('surface', float('inf')) for p in props_list if p.get('surface')),
-                'max': max(p.get('surface', 0) for p in props_list if p.get('surface')),
+                'min': min(surfaces, default=None),
+                'max': max(surfaces, default=None),
             },
-            'best_value': None,
-            'most_expensive': None,
-            'largest': None
+            'best_value': best_value[1] if best_value else None,
+            'most_expensive': most_expensive[1],
+            'largest': largest[1]
         }
-        
-        # Meilleure rapport prix/surface
-        valid_props = [p for p in props_list if p.get('price') and p.get('surface')]
-        if valid_props:
-            best = min(valid_props, 
-                      key=lambda p: p.get('price', 0) / p.get('surface', 1))
-            comparison['best_value'] = best['id']
-        
-        # Plus cher
-        most_expensive = max(props_list, key=lambda p: p.get('price', 0))
-        comparison['most_expensive'] = most_expensive['id']
-        
-        # Plus grand
-        largest = max(props_list, key=lambda p: p.get('surface', 0))
-        comparison['largest'] = largest['id']
-        
-        return comparison
 
 
 def generate_market_insight():
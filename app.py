@@ -1,7 +1,8 @@
 """
 Interface Web d'Administration pour le Scraping Immobilier
 """
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import (Flask, render_template, request, jsonify, redirect, url_for,
+                   Response, stream_with_context)
 from flask_cors import CORS
 import sys
 from pathlib import Path
@@ -12,12 +13,21 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from logger import setup_logging
 from database import Database
+from database.db import encode_cursor, decode_cursor
 from scrapers.manager import ScraperManager
+from scrapers.rate_limiter import rate_limiter_stats, reset_rate_limiters
+from scrapers.http_cache import get_response_cache
 from analyzer import PropertyAnalyzer
-from config import SEARCH_CONFIG, SCRAPERS_CONFIG
-from utils import PropertyUtils
-from validators import validate_property
-from datetime import datetime
+from comparables import ComparablesIndex
+from reference_prices import deal_score
+from geo import distance_m, parse_bbox, parse_near
+from locations import department_code
+from config import SEARCH_CONFIG, SCRAPERS_CONFIG, COMPARABLES_CONFIG, REFERENCE_CONFIG
+from cache import TTLCache, cache_key
+from jobs import JobManager, JobQueueFull
+from events import event_bus, DatabaseWatcher, format_sse, SCRAPE_PROGRESS
+from config import EVENTS_CONFIG, LOG_CONFIG
+from datetime import datetime, timezone
 import json
 
 logger = setup_logging()
@@ -26,10 +36,55 @@ app = Flask(__name__)
 CORS(app)
 app.config['JSON_AS_ASCII'] = False
 
+# Pagination des endpoints JSON (/api/properties, /api/search)
+API_PAGE_SIZE = 100
+SEARCH_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
 # Initialiser
 db = Database()
 scraper_manager = ScraperManager()
 analyzer = PropertyAnalyzer()
+comparables = ComparablesIndex(db)
+
+
+def last_scrape_run():
+    """Date du dernier scraping terminé, y compris ceux de scheduler.py, ou None
+    
+    Le planificateur tourne dans son propre processus: seule la base (points
+    de reprise du scraping incrémental) est commune aux deux.
+    """
+    last_run = db.get_last_scrape_run()
+    return format_scrape_run(last_run) if last_run else None
+
+
+def format_scrape_run(last_run):
+    """Heure locale d'un last_run_at (CURRENT_TIMESTAMP de SQLite: UTC)"""
+    last_run = datetime.strptime(last_run, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return last_run.astimezone().strftime('%d/%m/%Y %H:%M')
+
+
+# Relais vers le flux SSE des écritures de tous les processus (CLI, scheduler.py)
+db_watcher = DatabaseWatcher(event_bus, db, log_file=LOG_CONFIG['log_dir'] / 'immobilier-scraper.log',
+                             format_last_run=format_scrape_run)
+
+# Cache des statistiques, invalidé à chaque écriture en base
+stats_cache = TTLCache(generation=lambda: db.generation)
+
+
+def cached_statistics(filters=None):
+    """Statistiques globales et nombre d'annonces des dernières 24h (en cache)"""
+    def compute():
+        stats = db.get_statistics(filters=filters)
+        stats['new_24h'] = db.compute_statistics(filters=filters, since_hours=24)['total_properties']
+        return stats
+    return stats_cache.get_or_compute(cache_key('statistics', filters), compute)
+
+
+def cached_count(filters):
+    """Nombre d'annonces correspondant aux filtres (en cache jusqu'à la prochaine écriture)"""
+    return stats_cache.get_or_compute(cache_key('count', filters),
+                                      lambda: db.count_properties(filters=filters))
 
 # ============================================================================
 # CHARGER LA CONFIG UTILISATEUR AU DÉMARRAGE
@@ -84,9 +139,7 @@ def dashboard():
             'dpe_max': SEARCH_CONFIG.get('dpe_max', 'G')
         }
         
-        stats = db.get_statistics(filters=filters) or {}
-        summary = analyzer.get_summary_stats(24) or {}
-        properties = db.get_new_properties(hours=24, filters=filters) or []
+        stats = cached_statistics(filters)
         
         # Valeurs par défaut si aucune propriété
         avg_price = stats.get('avg_price') or 0
@@ -96,10 +149,11 @@ def dashboard():
         data = {
             'total_properties': stats.get('total_properties', 0),
             'avg_price': f"{int(avg_price):,.0f}" if avg_price else "0",
-            'new_24h': len(properties) if properties else 0,
+            'new_24h': stats.get('new_24h', 0),
             'by_source': stats.get('by_source', {}),
             'by_status': stats.get('by_status', {}),
-            'price_range': f"{int(min_price):,} - {int(max_price):,}" if (min_price or max_price) else "N/A"
+            'price_range': f"{int(min_price):,} - {int(max_price):,}" if (min_price or max_price) else "N/A",
+            'filters': filters
         }
         
         return render_template('dashboard.html', **data)
@@ -112,7 +166,7 @@ def dashboard():
 def properties():
     """Page des propriétés"""
     page = request.args.get('page', 1, type=int)
-    sort_by = request.args.get('sort', 'date_desc')  # date_desc, date_asc, price_desc, price_asc
+    sort_by = request.args.get('sort', 'date_desc')  # date_desc, date_asc, price_desc, price_asc, deal_desc
     limit = 20
     offset = (page - 1) * limit
     
@@ -120,41 +174,17 @@ def properties():
     filters = {
         'price_min': SEARCH_CONFIG.get('budget_min', 0),
         'price_max': SEARCH_CONFIG.get('budget_max', 9999999),
-        'dpe_max': SEARCH_CONFIG.get('dpe_max', 'G')
+        'dpe_max': SEARCH_CONFIG.get('dpe_max', 'G'),
+        # Zones configurées -> codes département (table locations)
+        'department': [code for code in map(department_code, SEARCH_CONFIG.get('zones', [])) if code]
     }
     
-    props = db.get_properties(filters=filters)
-    
-    # NOTE: Le filtre par zones est désactivé car la table properties n'a pas de colonne 'department'
-    # Toutes les propriétés dans la base sont déjà dans les zones configurées
-    # TODO: Ajouter colonne 'department' pour filtrage précis par zone
-    
-    # Filtrer par zones si configuré
-    # zones = SEARCH_CONFIG.get('zones', [])
-    # if zones:
-    #     filtered_props = []
-    #     for p in props:
-    #         location = p['location'] or ''
-    #         # Vérifier si la location contient une des zones configurées
-    #         if any(zone in location for zone in zones):
-    #             filtered_props.append(p)
-    #     props = filtered_props
+    # Même total d'une page à l'autre: compté une fois par génération de la base
+    total = cached_count(filters)
+    props = db.get_properties(filters=filters, sort=sort_by, limit=limit, offset=offset)
     
     # Log pour debug
-    logger.info(f"Filtrage propriétés: {len(props)} résultats (budget: {filters['price_min']}-{filters['price_max']})")
-    
-    # Trier les propriétés
-    if sort_by == 'date_desc':
-        props = sorted(props, key=lambda x: x['posted_date'] or '', reverse=True)
-    elif sort_by == 'date_asc':
-        props = sorted(props, key=lambda x: x['posted_date'] or '')
-    elif sort_by == 'price_desc':
-        props = sorted(props, key=lambda x: x['price'] or 0, reverse=True)
-    elif sort_by == 'price_asc':
-        props = sorted(props, key=lambda x: x['price'] or 0)
-    
-    total = len(props)
-    props = props[offset:offset + limit]
+    logger.info(f"Filtrage propriétés: {total} résultats (budget: {filters['price_min']}-{filters['price_max']})")
     
     # Convertir Row objects en dictionnaires
     from datetime import datetime
@@ -182,6 +212,8 @@ def properties():
             'dpe': p['dpe'] or 'N/A',
             'status': p['status'],
             'url': p['url'],
+            'deal_score': p['deal_score'],
+            'good_deal': (p['deal_score'] or 0) >= REFERENCE_CONFIG['good_deal_score'],
             'posted_date_formatted': posted_date_str or 'Non spécifiée'
         })
     
@@ -209,9 +241,22 @@ def api_properties():
             'price_max': SEARCH_CONFIG.get('budget_max', 9999999),
             'dpe_max': SEARCH_CONFIG.get('dpe_max', 'G')
         }
-        props = db.get_properties(filters=filters)
+        limit = min(request.args.get('limit', API_PAGE_SIZE, type=int), API_MAX_PAGE_SIZE)
+        props, next_cursor = db.get_properties_page(
+            filters=filters,
+            sort=request.args.get('sort', 'date_desc'),
+            cursor=request.args.get('cursor'),
+            limit=limit
+        )
         props_list = [dict(p) for p in props]
-        return jsonify({'success': True, 'properties': props_list, 'count': len(props_list)})
+        return jsonify({
+            'success': True,
+            'properties': props_list,
+            'count': len(props_list),
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erreur api_properties: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -253,7 +298,7 @@ def sites():
 @app.route('/statistics')
 def statistics():
     """Page des statistiques"""
-    stats = db.get_statistics()
+    stats = cached_statistics()
     return render_template('statistics.html', stats=stats)
 
 
@@ -288,98 +333,214 @@ def logs():
 # API - SCRAPING
 # ============================================================================
 
+def run_scrape_job(job, source, criteria):
+    """Scraper puis enregistrer les annonces (exécuté dans un worker de jobs)"""
+    sources = list(scraper_manager.scrapers) if source == 'all' else [source]
+    for name in sources:
+        job.source_started(name)
+    
+    def on_progress(name, count, error):
+        job.source_done(name, count, error)
+        event_bus.publish(SCRAPE_PROGRESS, {
+            'job_id': job.id, 'stage': 'source_done', 'source': name, 'count': count, 'error': error
+        })
+    
+    # Scraping → normalisation → validation → base, en flux; les nouvelles
+    # annonces et la fin du run sont publiées par db_watcher, lot par lot
+    stats = scraper_manager.ingest(
+        db, sources=None if source == 'all' else [source],
+        on_progress=on_progress, **criteria
+    )
+    new_count = stats.get('inserted', 0)
+    
+    return {
+        'total': stats.get('scraped', 0),
+        'new': new_count,
+        'rejected': stats.get('rejected', 0),
+        'skipped_pages': stats.get('skipped_pages', 0),
+        'first_write_seconds': stats.get('first_write_seconds'),
+        'message': f'{new_count} nouvelle(s) propriété(s) trouvée(s)'
+    }
+
+
+def publish_job_state(job):
+    """Diffuser le démarrage et la fin des jobs de scraping"""
+    event_bus.publish(SCRAPE_PROGRESS, {
+        'job_id': job['id'],
+        'stage': 'started' if job['status'] == 'running' else 'finished',
+        'status': job['status'],
+        'source': job['params'].get('source'),
+        'result': job['result'],
+        'error': job['error']
+    })
+
+
+job_manager = JobManager(listener=publish_job_state)
+
+
 @app.route('/api/scrape', methods=['POST'])
 def api_scrape():
-    """Lancer un scraping avec les paramètres de configuration"""
+    """Mettre en file un scraping avec les paramètres de configuration
+    
+    Répond immédiatement (202) avec l'identifiant du job à suivre via
+    /api/jobs/<id>; une soumission identique à un job en cours lui est fusionnée.
+    """
     try:
-        data = request.json
+        data = request.json or {}
         source = data.get('source', 'all').lower()  # Normaliser en minuscules
+        full_resync = bool(data.get('full_resync', False))
         
         # Utiliser les paramètres de configuration actuels
-        budget_min = SEARCH_CONFIG.get('budget_min', 200000)
-        budget_max = SEARCH_CONFIG.get('budget_max', 500000)
-        dpe_max = SEARCH_CONFIG.get('dpe_max', 'D')
-        zones = SEARCH_CONFIG.get('zones', ['Paris', 'Hauts-de-Seine', 'Val-de-Marne'])
-        
-        logger.info(f"🔍 Scraping avec paramètres: {budget_min}€-{budget_max}€, DPE<={dpe_max}, zones={zones}")
-        
-        if source == 'all':
-            properties = scraper_manager.scrape_all(
-                budget_min=budget_min,
-                budget_max=budget_max,
-                dpe_max=dpe_max,
-                zones=zones
-            )
-        else:
-            properties = scraper_manager.scrape_single(
-                source,
-                budget_min=budget_min,
-                budget_max=budget_max,
-                dpe_max=dpe_max,
-                zones=zones
-            )
+        criteria = {
+            'budget_min': SEARCH_CONFIG.get('budget_min', 200000),
+            'budget_max': SEARCH_CONFIG.get('budget_max', 500000),
+            'dpe_max': SEARCH_CONFIG.get('dpe_max', 'D'),
+            'zones': SEARCH_CONFIG.get('zones', ['Paris', 'Hauts-de-Seine', 'Val-de-Marne'])
+        }
         
-        # Normaliser, valider et ajouter à la base
-        new_count = 0
-        for prop in properties:
-            normalized = PropertyUtils.normalize_property(prop)
-            try:
-                validated = validate_property(normalized)
-            except Exception as e:
-                logger.warning(f"Propriété ignorée (validation): {e}")
-                continue
-
-            if not db.property_exists(validated.get('url')):
-                db.add_property(validated)
-                new_count += 1
+        logger.info(f"🔍 Scraping {source} avec paramètres: {criteria['budget_min']}€-{criteria['budget_max']}€, "
+                    f"DPE<={criteria['dpe_max']}, zones={criteria['zones']}")
+        
+        job, coalesced = job_manager.submit(
+            'scrape', dict(criteria, source=source, full_resync=full_resync),
+            lambda job: run_scrape_job(job, source, dict(criteria, full_resync=full_resync))
+        )
         
         return jsonify({
             'success': True,
-            'total': len(properties),
-            'new': new_count,
-            'message': f'{new_count} nouvelle(s) propriété(s) trouvée(s)'
-        })
+            'job_id': job.id,
+            'status': job.status,
+            'coalesced': coalesced,
+            'status_url': url_for('api_job', job_id=job.id),
+            'message': 'Scraping déjà en cours' if coalesced else 'Scraping lancé'
+        }), 202
     
+    except JobQueueFull as e:
+        logger.warning(f"File de scraping pleine: {e}")
+        response = jsonify({'success': False, 'error': 'Trop de scrapings en attente, réessayez plus tard'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
     except Exception as e:
         logger.error(f"Erreur scraping: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/jobs')
+def api_jobs():
+    """Liste des jobs de scraping récents et occupation de la file"""
+    return jsonify({'success': True, 'jobs': job_manager.list_jobs(), 'queue': job_manager.stats()})
+
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """Progression d'un job: état, compteurs et durées par source"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job introuvable'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
 @app.route('/api/search', methods=['POST'])
 def api_search():
-    """Recherche avancée"""
+    """Recherche avancée
+    
+    `q` lance une recherche plein texte (titre, description, localisation),
+    triée par pertinence BM25 sauf si un autre `sort` est demandé.
+    `unique` ne garde qu'une annonce par bien publié sur plusieurs sites.
+    `deal_min` ne garde que les annonces dont le deal_score atteint ce seuil.
+    `department` (code, nom ou liste) et `commune` filtrent sur la table locations.
+    `near` ({lat, lon, radius_m}) et `bbox` ([south, west, north, east])
+    limitent la recherche à une zone; avec `near` et sans `q`, les résultats
+    sont triés par distance. `include_dvf` ajoute les ventes DVF de la zone.
+    `count` (nombre total de résultats) n'est renvoyé que pour la première
+    page, ou avec `with_count`: le client garde celui de la première page.
+    """
     try:
         filters = request.json
+        q = (filters.get('q') or '').strip()
+        near = parse_near(filters['near']) if filters.get('near') else None
+        bbox = parse_bbox(filters['bbox']) if filters.get('bbox') else None
         
         db_filters = {
             'price_min': filters.get('price_min'),
             'price_max': filters.get('price_max'),
             'dpe_max': filters.get('dpe_max'),
             'location': filters.get('location'),
-            'status': filters.get('status')
+            'status': filters.get('status'),
+            'unique': bool(filters.get('unique')),
+            'deal_min': float(filters['deal_min']) if filters.get('deal_min') is not None else None,
+            'near': near,
+            'bbox': bbox,
+            'department': filters.get('department'),
+            'commune': filters.get('commune')
         }
         
-        properties = db.get_properties(db_filters)
+        limit = min(int(filters.get('limit') or SEARCH_PAGE_SIZE), API_MAX_PAGE_SIZE)
+        sort = filters.get('sort') or ('relevance' if q else 'distance' if near else 'date_desc')
+        if sort == 'distance':
+            if not near:
+                raise ValueError("Tri par distance: paramètre near requis")
+            # Classement par distance: pagination par décalage, comme la pertinence
+            offset = decode_cursor(filters['cursor'], 'distance')[0] if filters.get('cursor') else 0
+            properties = db.properties_near(*near, filters=dict(db_filters, q=q), limit=limit + 1, offset=offset)
+            next_cursor = encode_cursor('distance', offset + limit, None) if len(properties) > limit else None
+            properties = properties[:limit]
+        elif q and sort == 'relevance':
+            # Classement par score: pagination par décalage encodé dans le curseur
+            offset = decode_cursor(filters['cursor'], 'relevance')[0] if filters.get('cursor') else 0
+            properties = db.search_properties(q, db_filters, limit=limit + 1, offset=offset)
+            next_cursor = encode_cursor('relevance', offset + limit, None) if len(properties) > limit else None
+            properties = properties[:limit]
+        else:
+            properties, next_cursor = db.get_properties_page(
+                dict(db_filters, q=q),
+                sort=sort,
+                cursor=filters.get('cursor'),
+                limit=limit
+            )
         
         props_list = []
-        for p in properties[:50]:  # Limiter à 50
+        for p in properties:
             props_list.append({
                 'id': p['id'],
                 'title': p['title'][:60],
                 'price': p['price'],
                 'location': p['location'],
+                'location_id': p['location_id'],
                 'dpe': p['dpe'],
                 'surface': p['surface'],
                 'source': p['source'],
-                'posted_date': p['posted_date']
+                'posted_date': p['posted_date'],
+                'deal_score': p['deal_score'],
+                'latitude': p['latitude'],
+                'longitude': p['longitude'],
+                'distance_m': round(distance_m(p['latitude'], p['longitude'], *near[:2]))
+                              if near and p['latitude'] is not None else None
             })
         
-        return jsonify({
+        result = {
             'success': True,
-            'count': len(properties),
-            'properties': props_list
-        })
+            'properties': props_list,
+            'next_cursor': next_cursor
+        }
+        if not filters.get('cursor') or filters.get('with_count'):
+            result['count'] = cached_count(dict(db_filters, q=q))
+        if filters.get('include_dvf') and (near or bbox):
+            result['dvf_transactions'] = [{
+                'date_mutation': t['date_mutation'],
+                'valeur_fonciere': t['valeur_fonciere'],
+                'type_local': t['type_local'],
+                'surface_reelle_bati': t['surface_reelle_bati'],
+                'nombre_pieces': t['nombre_pieces'],
+                'commune': t['commune'],
+                'latitude': t['latitude'],
+                'longitude': t['longitude'],
+                'distance_m': round(t['distance_m']) if t['distance_m'] is not None else None
+            } for t in db.get_dvf_transactions(near=near, bbox=bbox, limit=limit)]
+        return jsonify(result)
     
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erreur recherche: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -391,11 +552,7 @@ def api_property(property_id):
     try:
         if request.method == 'GET':
             # Récupérer les détails
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM properties WHERE id = ?', (property_id,))
-            prop = cursor.fetchone()
-            conn.close()
+            prop = db.get_property(property_id)
             
             if prop:
                 return jsonify({
@@ -420,20 +577,181 @@ def api_property(property_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/property/<property_id>/history', methods=['GET'])
+def api_property_history(property_id):
+    """Série temporelle des prix d'une annonce (prix initial puis chaque changement)"""
+    try:
+        prop = db.get_property(property_id)
+        if not prop:
+            return jsonify({'success': False, 'error': 'Non trouvé'}), 404
+        
+        changes = db.get_price_history(property_id)
+        history = []
+        for change in changes:
+            old_price, new_price = change['old_price'], change['new_price']
+            history.append({
+                'changed_at': change['changed_at'],
+                'old_price': old_price,
+                'new_price': new_price,
+                'change': round(new_price - old_price, 2) if old_price is not None else None,
+                'change_pct': round((new_price - old_price) / old_price * 100, 2) if old_price else None
+            })
+        
+        first_price = changes[0]['old_price'] if changes else prop['price']
+        series = [{'date': prop['created_at'], 'price': first_price}]
+        series += [{'date': change['changed_at'], 'price': change['new_price']} for change in changes]
+        
+        return jsonify({
+            'success': True,
+            'property_id': property_id,
+            'current_price': prop['price'],
+            'first_price': first_price,
+            'history': history,
+            'series': series
+        })
+    except Exception as e:
+        logger.error(f"Erreur historique propriété: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/property/<property_id>/duplicates', methods=['GET'])
+def api_property_duplicates(property_id):
+    """Même bien publié sur d'autres sites (groupe de doublons)"""
+    try:
+        if not db.get_property(property_id):
+            return jsonify({'success': False, 'error': 'Non trouvé'}), 404
+        
+        duplicates = [{
+            'id': p['id'],
+            'title': p['title'],
+            'price': p['price'],
+            'surface': p['surface'],
+            'location': p['location'],
+            'source': p['source'],
+            'url': p['url']
+        } for p in db.get_duplicates(property_id)]
+        
+        return jsonify({
+            'success': True,
+            'property_id': property_id,
+            'count': len(duplicates),
+            'duplicates': duplicates
+        })
+    except Exception as e:
+        logger.error(f"Erreur doublons propriété: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def comparables_response(listing, k):
+    """Comparables d'une annonce ou d'un bien hypothétique (dict)"""
+    estimate = comparables.estimate(listing, k)
+    price, surface = listing.get('price'), listing.get('surface')
+    reference = db.deal_reference(listing.get('location'), listing.get('property_type'))
+    return {
+        'price_per_sqm': round(price / surface, 2) if price and surface else None,
+        'reference': reference,
+        'deal_score': deal_score(price, surface, reference),
+        'median_price_per_sqm': estimate['median_price_per_sqm'],
+        'estimated_price': estimate['estimated_price'],
+        'comparables': comparables.nearest(listing, k)
+    }
+
+
+@app.route('/api/property/<property_id>/comparables', methods=['GET'])
+def api_property_comparables(property_id):
+    """Annonces comparables de la même commune et prix/m² médian local"""
+    try:
+        prop = db.get_property(property_id)
+        if not prop:
+            return jsonify({'success': False, 'error': 'Non trouvé'}), 404
+        
+        k = min(request.args.get('k', COMPARABLES_CONFIG['k'], type=int), API_MAX_PAGE_SIZE)
+        return jsonify(dict(comparables_response(dict(prop), k), success=True, property_id=property_id))
+    except Exception as e:
+        logger.error(f"Erreur comparables propriété: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/comparables', methods=['POST'])
+def api_comparables():
+    """Comparables d'un bien hypothétique (location et surface obligatoires)"""
+    try:
+        data = request.json or {}
+        if not data.get('location') or not data.get('surface'):
+            return jsonify({'success': False, 'error': 'location et surface sont obligatoires'}), 400
+        
+        listing = {
+            'location': data['location'],
+            'surface': float(data['surface']),
+            'rooms': int(data['rooms']) if data.get('rooms') else None,
+            'dpe': data.get('dpe'),
+            'price': float(data['price']) if data.get('price') else None
+        }
+        k = min(int(data.get('k') or COMPARABLES_CONFIG['k']), API_MAX_PAGE_SIZE)
+        return jsonify(dict(comparables_response(listing, k), success=True))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur comparables: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/reference', methods=['GET'])
+def api_reference():
+    """Prix de référence au m² par commune (toute la table, ou une commune avec ?location)"""
+    try:
+        location = request.args.get('location')
+        if location:
+            reference = db.deal_reference(location, request.args.get('property_type'))
+            if reference is None:
+                return jsonify({'success': False, 'error': 'Aucune référence pour cette commune'}), 404
+            return jsonify({'success': True, 'location': location, 'reference': reference})
+        
+        references = [dict(row) for row in db.get_commune_references()]
+        return jsonify({'success': True, 'count': len(references), 'references': references})
+    except Exception as e:
+        logger.error(f"Erreur prix de référence: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/reference/refresh', methods=['POST'])
+def api_reference_refresh():
+    """Recalculer les prix de référence et les deal_score des annonces"""
+    try:
+        result = db.refresh_commune_reference()
+        return jsonify(dict(result, success=True))
+    except Exception as e:
+        logger.error(f"Erreur recalcul prix de référence: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/locations', methods=['GET'])
+def api_locations():
+    """Localisations connues (communes / arrondissements) et nombre d'annonces, ?department=92"""
+    try:
+        locations = db.get_locations(request.args.get('department'))
+        return jsonify({'success': True, 'count': len(locations), 'locations': locations})
+    except Exception as e:
+        logger.error(f"Erreur localisations: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/property/<property_id>')
 def property_page(property_id):
     """Page HTML pour une propriété"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM properties WHERE id = ?', (property_id,))
-        prop = cursor.fetchone()
-        conn.close()
+        prop = db.get_property(property_id)
 
         if not prop:
             return render_template('404.html'), 404
 
-        return render_template('property.html', prop=dict(prop))
+        prop = dict(prop)
+        try:
+            market = comparables_response(prop, COMPARABLES_CONFIG['k'])
+        except Exception as e:
+            logger.error(f"Erreur comparables (page propriété): {e}")
+            market = None
+        return render_template('property.html', prop=prop, market=market)
     except Exception as e:
         logger.error(f"Erreur property_page: {e}")
         return render_template('500.html'), 500
@@ -469,9 +787,11 @@ def api_update_site(site_id):
             
             # Sauvegarder la config
             # Note: Dans une vraie app, on sauvegarderait dans la BD
-            # Recharger les scrapers en mémoire pour prendre en compte le changement
+            # Recharger les scrapers en mémoire pour prendre en compte le changement,
+            # et les limiteurs de débit pour leurs nouveaux réglages (rate_limit, délais)
             try:
                 scraper_manager.reload()
+                reset_rate_limiters()
             except Exception:
                 # Pas bloquant, on continue
                 logger.warning('Impossible de recharger le gestionnaire de scrapers')
@@ -532,12 +852,15 @@ def api_add_site():
 
 @app.route('/api/scheduler/status', methods=['GET'])
 def api_scheduler_status():
-    """État du planificateur"""
+    """Dernier scraping et fréquence du planificateur
+    
+    scheduler.py est un processus distinct: son état et sa prochaine
+    exécution ne sont pas connus de l'application web.
+    """
+    from config import SCHEDULER_CONFIG
     return jsonify({
-        'running': True,  # À implémenter avec état réel
-        'last_run': 'Maintenant',
-        'next_run': '12:00',
-        'frequency': '2h'
+        'last_run': last_scrape_run() or '-',
+        'frequency': f"{SCHEDULER_CONFIG['interval_hours']}h"
     })
 
 
@@ -580,8 +903,7 @@ def api_stats():
             'dpe_max': SEARCH_CONFIG.get('dpe_max', 'G')
         }
         
-        stats = db.get_statistics(filters=filters)
-        new_properties = db.get_new_properties(hours=24, filters=filters)
+        stats = cached_statistics(filters)
         
         return jsonify({
             'total': stats.get('total_properties', 0),
@@ -590,13 +912,49 @@ def api_stats():
             'max_price': stats.get('max_price', 0),
             'by_source': stats.get('by_source', {}),
             'by_status': stats.get('by_status', {}),
-            'new_24h': len(new_properties)
+            'new_24h': stats.get('new_24h', 0)
         })
     except Exception as e:
         logger.error(f"Erreur stats: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# ============================================================================
+# API - FLUX D'ÉVÉNEMENTS (SSE)
+# ============================================================================
+
+@app.route('/api/stream/events')
+def api_stream_events():
+    """Flux Server-Sent Events: nouvelles annonces, progression, planificateur, logs
+    
+    Paramètre optionnel `types` (liste séparée par des virgules) pour ne
+    recevoir que certains événements. L'en-tête Last-Event-ID envoyé par le
+    navigateur à la reconnexion rejoue les événements manqués. Annonces,
+    fins de run et logs viennent de la base et du fichier de log (db_watcher):
+    ceux du CLI et de scheduler.py sont donc diffusés aussi.
+    """
+    db_watcher.start()
+    types = [t for t in request.args.get('types', '').split(',') if t] or None
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    heartbeat = EVENTS_CONFIG.get('heartbeat_seconds', 15)
+    subscription = event_bus.subscribe(last_event_id, types)
+    
+    def stream():
+        with subscription:
+            yield 'retry: 5000\n\n'
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield format_sse(event)
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 # ============================================================================
 # API - ALERTES EMAIL
 # ============================================================================
@@ -770,6 +1128,33 @@ def api_config_smtp_test():
         })
 
 
+@app.route('/api/cache/stats', methods=['GET'])
+def api_cache_stats():
+    """Compteurs du cache des statistiques"""
+    return jsonify({'success': True, 'cache': stats_cache.stats(), 'generation': db.generation})
+
+
+@app.route('/api/db/pool', methods=['GET'])
+def api_db_pool():
+    """Statistiques du pool de connexions"""
+    return jsonify({'success': True, 'pool': db.pool_stats()})
+
+
+@app.route('/api/scrapers/rate-limits', methods=['GET'])
+def api_rate_limits():
+    """Débit et attente cumulée des limiteurs par hôte"""
+    return jsonify({'success': True, 'hosts': rate_limiter_stats()})
+
+
+@app.route('/api/scrapers/http-cache', methods=['GET', 'DELETE'])
+def api_http_cache():
+    """Statistiques du cache HTTP des scrapers (DELETE pour le vider)"""
+    cache = get_response_cache()
+    if request.method == 'DELETE':
+        cache.clear()
+    return jsonify({'success': True, 'cache': cache.stats()})
+
+
 @app.route('/api/db/optimize', methods=['POST'])
 def api_db_optimize():
     """Optimiser la base de données"""
@@ -789,9 +1174,12 @@ def api_db_cleanup():
     """Nettoyer les doublons"""
     try:
         removed = db.cleanup_duplicates()
+        comparables.reset()
         return jsonify({
             'success': True,
-            'message': f'{removed} doublon(s) supprimé(s)'
+            'message': f'{removed} doublon(s) supprimé(s)',
+            'removed': removed,
+            'clusters': db.duplicate_stats()
         })
     except Exception as e:
         logger.error(f"Erreur cleanup db: {e}")
@@ -803,6 +1191,7 @@ def api_db_reset():
     """Réinitialiser la base de données"""
     try:
         db.reset()
+        comparables.reset()
         return jsonify({
             'success': True,
             'message': 'Base de données réinitialisée'
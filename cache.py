@@ -0,0 +1,101 @@
+"""
+Cache mémoire TTL/LRU pour les pages et endpoints de statistiques
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from config import CACHE_CONFIG
+
+
+class TTLCache:
+    """Cache LRU à durée de vie limitée, invalidé par compteur de génération
+
+    Chaque entrée mémorise la génération en cours lors de son calcul; si la
+    fonction `generation` renvoie une autre valeur (écriture en base depuis),
+    l'entrée est considérée périmée.
+    """
+
+    def __init__(self, maxsize=None, ttl=None, generation=None):
+        self.maxsize = maxsize or CACHE_CONFIG.get('max_entries', 256)
+        self.ttl = ttl if ttl is not None else CACHE_CONFIG.get('ttl_seconds', 30)
+        self.generation = generation or (lambda: 0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidated': 0, 'evictions': 0}
+
+    def get(self, key):
+        """Retourner (True, valeur) si l'entrée est valide, sinon (False, None)"""
+        generation = self.generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+
+            value, entry_generation, expires_at = entry
+            if entry_generation != generation:
+                self._stats['invalidated'] += 1
+            elif expires_at <= time.monotonic():
+                self._stats['expired'] += 1
+            else:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return True, value
+
+            del self._entries[key]
+            self._stats['misses'] += 1
+            return False, None
+
+    def set(self, key, value, generation=None):
+        """Mémoriser une valeur calculée pour la génération donnée"""
+        if generation is None:
+            generation = self.generation()
+        with self._lock:
+            self._entries[key] = (value, generation, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get_or_compute(self, key, compute):
+        """Retourner la valeur en cache ou la calculer avec `compute()`"""
+        found, value = self.get(key)
+        if found:
+            return value
+        # Génération lue avant le calcul: une écriture pendant le calcul
+        # rendra l'entrée périmée dès la prochaine lecture
+        generation = self.generation()
+        value = compute()
+        self.set(key, value, generation)
+        return value
+
+    def clear(self):
+        """Vider le cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Compteurs hits / misses / évictions et taille courante"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['max_entries'] = self.maxsize
+        stats['ttl_seconds'] = self.ttl
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+def _freeze(value):
+    """Valeur de filtre hashable (listes et dicts convertis en tuples)"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def cache_key(endpoint, filters=None):
+    """Clé de cache stable pour (endpoint, filtres)"""
+    return (endpoint, _freeze(filters or {}))
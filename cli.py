@@ -13,6 +13,8 @@ from logger import setup_logging
 from database import Database
 from scrapers.manager import ScraperManager
 from notifier import EmailNotifier
+from dvf_import import import_dvf, parse_args
+from geo import read_centroids
 from config import SEARCH_CONFIG, DPE_MAPPING, PROPERTY_STATUS
 
 logger = setup_logging()
@@ -27,21 +29,20 @@ class ImmobilierCLI:
         self.notifier = EmailNotifier()
     
     def cmd_scrape(self, args):
-        """Commande: scrape [--source SOURCE]"""
-        if args and args[0] in self.scraper_manager.scrapers:
-            properties = self.scraper_manager.scrape_single(args[0])
-        else:
-            properties = self.scraper_manager.scrape_all()
+        """Commande: scrape [--source SOURCE] [--full]"""
+        full_resync = '--full' in args
+        args = [arg for arg in args if arg != '--full']
+        sources = [args[0]] if args and args[0] in self.scraper_manager.scrapers else None
         
-        # Ajouter à la base
-        for prop in properties:
-            if not self.db.property_exists(prop.get('url')):
-                self.db.add_property(prop)
+        # Scraper et ajouter à la base au fil de l'eau
+        stats = self.scraper_manager.ingest(self.db, sources=sources, full_resync=full_resync)
         
-        print(f"✓ {len(properties)} propriétés trouvées")
+        print(f"✓ {stats.get('scraped', 0)} propriétés trouvées "
+              f"({stats.get('inserted', 0)} nouvelles, {stats.get('rejected', 0)} rejetées, "
+              f"{stats.get('skipped_pages', 0)} pages ignorées)")
     
     def cmd_list(self, args):
-        """Commande: list [--status STATUS] [--location LOCATION] [--limit LIMIT]"""
+        """Commande: list [--status STATUS] [--location LOCATION] [--department DEP] [--limit LIMIT]"""
         filters = {}
         limit = 10
         
@@ -53,6 +54,9 @@ class ImmobilierCLI:
             elif args[i] == '--location' and i + 1 < len(args):
                 filters['location'] = args[i + 1]
                 i += 2
+            elif args[i] == '--department' and i + 1 < len(args):
+                filters['department'] = args[i + 1]
+                i += 2
             elif args[i] == '--limit' and i + 1 < len(args):
                 limit = int(args[i + 1])
                 i += 2
@@ -96,6 +100,38 @@ class ImmobilierCLI:
         for status, count in stats.get('by_status', {}).items():
             print(f"  {status}: {count}")
     
+    def cmd_rebuild_stats(self, args):
+        """Commande: rebuild-stats"""
+        groups = self.db.rebuild_property_stats()
+        print(f"✓ Table d'agrégats reconstruite ({groups} groupes)")
+    
+    def cmd_dvf_import(self, args):
+        """Commande: dvf-import FICHIER... [--departments 75,92] [--restart]"""
+        paths, departments, restart = parse_args(list(args))
+        if not paths:
+            print("Usage: dvf-import FICHIER... [--departments 75,92] [--restart]")
+            return
+        
+        for path in paths:
+            stats = import_dvf(self.db, path, departments=departments, restart=restart)
+            print(f"✓ {stats['source_file']}: {stats['rows_imported']} transactions importées "
+                  f"({stats['rows_read']} lignes lues en {stats['seconds']}s)")
+        result = self.db.refresh_commune_reference()
+        print(f"✓ Prix de référence recalculés ({result['computed']} communes/types avec données)")
+        geocoded = self.db.refresh_commune_centroids()
+        print(f"✓ Centroïdes des communes recalculés ({geocoded} annonces géolocalisées)")
+    
+    def cmd_geo_import(self, args):
+        """Commande: geo-import FICHIER [--departments 75,92]"""
+        paths, departments, _ = parse_args(list(args))
+        if len(paths) != 1:
+            print("Usage: geo-import FICHIER [--departments 75,92]")
+            return
+        
+        centroids = read_centroids(paths[0], departments=departments)
+        geocoded = self.db.import_commune_centroids(centroids)
+        print(f"✓ {len(centroids)} centroïdes importés ({geocoded} annonces géolocalisées)")
+    
     def cmd_favorite(self, args):
         """Commande: favorite [--add ID | --list]"""
         if args and args[0] == '--add' and len(args) > 1:
@@ -144,9 +180,15 @@ class ImmobilierCLI:
         """Commande: help"""
         print("""
 Commandes disponibles:
-  scrape [--source SOURCE]  Effectuer un scraping (toutes sources ou une seule)
-  list [options]            Lister les propriétés (--status, --location, --limit)
+  scrape [--source SOURCE] [--full]  Effectuer un scraping (toutes sources ou une seule;
+                            --full: parcours complet sans arrêt sur les annonces connues)
+  list [options]            Lister les propriétés (--status, --location, --department, --limit)
   stats                     Afficher les statistiques
+  rebuild-stats             Reconstruire la table d'agrégats des statistiques
+  dvf-import FICHIER...     Importer des fichiers DVF valeurs foncières (.txt, .csv, .gz, .zip;
+                            --departments 75,92: départements gardés, --restart: réimporter)
+  geo-import FICHIER        Importer les centroïdes des communes (CSV latitude/longitude par
+                            code postal ou commune) et géolocaliser les annonces
   favorite [options]        Gérer les favoris (--add ID, --list)
   status [options]          Gérer les statuts (--set ID STATUS, --list)
   email [options]           Envoyer des emails (--send --new, --send --report)
@@ -159,6 +201,9 @@ Commandes disponibles:
             'scrape': self.cmd_scrape,
             'list': self.cmd_list,
             'stats': self.cmd_stats,
+            'rebuild-stats': self.cmd_rebuild_stats,
+            'dvf-import': self.cmd_dvf_import,
+            'geo-import': self.cmd_geo_import,
             'favorite': self.cmd_favorite,
             'status': self.cmd_status,
             'email': self.cmd_email,
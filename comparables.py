@@ -0,0 +1,315 @@
+"""
+Annonces comparables (k plus proches voisins)
+
+Les annonces d'une même commune sont indexées dans des arbres k-d sur des
+coordonnées normalisées: log(surface), pièces, classe DPE et log(prix/m²).
+Une requête donne les k annonces les plus proches et le prix/m² médian local,
+pour une annonce en base ou un bien hypothétique. Un arbre est construit à la
+demande pour chaque combinaison d'attributs connus de la requête: l'estimation
+du prix/m² n'utilise que les attributs physiques, la recherche d'annonces
+similaires à un bien dont le prix est connu aussi le prix/m².
+
+Mise à jour incrémentale: les annonces ajoutées (par rowid) et les changements
+de prix (property_history) sont rattrapés depuis la base (deux requêtes par
+plage de rowid / id, négligeables) dans un tampon par commune parcouru
+linéairement; les arbres de la commune ne sont reconstruits que lorsque le
+tampon dépasse une fraction de leur taille.
+"""
+import heapq
+import logging
+import math
+import statistics
+import threading
+import time
+
+from config import COMPARABLES_CONFIG, DPE_MAPPING
+from dedup import commune_key
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ('surface', 'rooms', 'dpe', 'price_per_sqm')
+PRICE_AXIS = 3
+# Classe DPE supposée pour une annonce indexée sans DPE (D)
+_DEFAULT_DPE = DPE_MAPPING['D']
+
+
+def feature_vector(listing, impute=False):
+    """Coordonnées normalisées d'une annonce (log surface, pièces, DPE, log prix/m²)
+
+    Une coordonnée inconnue vaut None. Avec `impute` (annonces indexées), les
+    pièces et le DPE manquants sont estimés (surface / sqm_per_room, classe D).
+
+    Returns:
+        tuple de 4 coordonnées, ou None sans surface exploitable
+    """
+    scales = COMPARABLES_CONFIG['scales']
+    surface = listing.get('surface')
+    if not surface or surface <= 0:
+        return None
+    rooms = listing.get('rooms')
+    if rooms is None and impute:
+        rooms = max(1, round(surface / COMPARABLES_CONFIG.get('sqm_per_room', 20)))
+    dpe = DPE_MAPPING.get((listing.get('dpe') or '').upper(), _DEFAULT_DPE if impute else None)
+    price = listing.get('price')
+    return (
+        math.log(surface) / scales['surface'],
+        rooms / scales['rooms'] if rooms is not None else None,
+        dpe / scales['dpe'] if dpe is not None else None,
+        math.log(price / surface) / scales['price_per_sqm'] if price and price > 0 else None
+    )
+
+
+class KDTree:
+    """Arbre k-d statique sur les coordonnées `axes` des points
+
+    Args:
+        points: tuples de coordonnées
+        items: objet associé à chaque point (même ordre)
+        axes: indices des coordonnées utilisées
+    """
+
+    def __init__(self, points, items, axes, leaf_size=None):
+        self.points = points
+        self.items = items
+        self.axes = tuple(axes)
+        self.leaf_size = leaf_size or COMPARABLES_CONFIG.get('leaf_size', 32)
+        self._columns = {axis: [point[axis] for point in points] for axis in self.axes}
+        self.root = self._build(list(range(len(points)))) if points else None
+        self._columns = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, indices):
+        if len(indices) <= self.leaf_size:
+            return (None, indices)
+        # Découper selon l'axe de plus grande étendue, à la médiane
+        spreads = {}
+        for axis, column in self._columns.items():
+            values = list(map(column.__getitem__, indices))
+            spreads[axis] = max(values) - min(values)
+        axis = max(spreads, key=spreads.__getitem__)
+        if spreads[axis] == 0:
+            return (None, indices)
+        indices.sort(key=self._columns[axis].__getitem__)
+        middle = len(indices) // 2
+        split = self.points[indices[middle]][axis]
+        return (axis, split, self._build(indices[:middle]), self._build(indices[middle:]))
+
+    def nearest(self, query, k, accept, heap):
+        """Compléter `heap` avec les k plus proches voisins de `query`
+
+        Args:
+            accept: filtre des items (versions périmées, annonce elle-même)
+            heap: tas [(-distance², -seq, item)] d'au plus k éléments
+        """
+        if self.root is None:
+            return
+        points, items, axes = self.points, self.items, self.axes
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            # Un sous-arbre n'est visité que s'il peut contenir un point plus proche
+            if len(heap) == k and bound >= -heap[0][0]:
+                continue
+            if node[0] is None:
+                for i in node[1]:
+                    item = items[i]
+                    if accept(item):
+                        _push(heap, k, _distance(query, points[i], axes), item)
+                continue
+            axis, split, left, right = node
+            diff = query[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+
+
+def _distance(query, point, axes):
+    distance = 0.0
+    for axis in axes:
+        diff = query[axis] - point[axis]
+        distance += diff * diff
+    return distance
+
+
+def _push(heap, k, distance, item):
+    entry = (-distance, -item[0], item)
+    if len(heap) < k:
+        heapq.heappush(heap, entry)
+    elif entry > heap[0]:
+        heapq.heapreplace(heap, entry)
+
+
+class _Partition:
+    """Annonces d'une commune: arbres k-d par combinaison d'axes + tampon des ajouts récents"""
+
+    def __init__(self):
+        self.points = []
+        self.items = []
+        self.buffer = []
+        self.trees = {}
+
+    def tree(self, axes, current):
+        threshold = max(COMPARABLES_CONFIG.get('min_rebuild', 256),
+                        COMPARABLES_CONFIG.get('rebuild_ratio', 0.1) * len(self.points))
+        if len(self.buffer) > threshold:
+            entries = [(point, item) for point, item in list(zip(self.points, self.items)) + self.buffer
+                       if current.get(item[1]) == item[0]]
+            self.points = [point for point, _ in entries]
+            self.items = [item for _, item in entries]
+            self.buffer = []
+            self.trees = {}
+        if axes not in self.trees:
+            self.trees[axes] = KDTree(self.points, self.items, axes)
+        return self.trees[axes]
+
+
+class ComparablesIndex:
+    """Index des annonces comparables, par commune
+
+    Seules les annonces avec prix et surface sont indexées.
+
+    Args:
+        db: instance Database (lecture seule)
+    """
+
+    def __init__(self, db, refresh_seconds=None):
+        self.db = db
+        self.refresh_seconds = (COMPARABLES_CONFIG.get('refresh_seconds', 0)
+                                if refresh_seconds is None else refresh_seconds)
+        self._partitions = {}
+        self._commune_keys = {}
+        self._current = {}  # id -> seq de la version indexée la plus récente
+        self._seq = 0
+        self._max_rowid = None
+        self._max_history_id = 0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._current)
+
+    def reset(self):
+        """Oublier l'index (après des suppressions): rechargé à la prochaine requête"""
+        with self._lock:
+            self._partitions.clear()
+            self._current.clear()
+            self._max_rowid = None
+            self._max_history_id = 0
+
+    def sync(self, force=False):
+        """Rattraper les annonces ajoutées et les changements de prix depuis la base"""
+        with self._lock:
+            if (not force and self._max_rowid is not None
+                    and time.monotonic() - self._synced_at < self.refresh_seconds):
+                return
+            first_load = self._max_rowid is None
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                max_rowid = cursor.execute('SELECT COALESCE(MAX(rowid), 0) FROM properties').fetchone()[0]
+                rows = cursor.execute('''
+                    SELECT id, price, surface, rooms, dpe, location FROM properties
+                    WHERE rowid > ? AND rowid <= ? AND price > 0 AND surface > 0
+                ''', (self._max_rowid or 0, max_rowid)).fetchall()
+                changed = cursor.execute('''
+                    SELECT h.id, p.id, p.price, p.surface, p.rooms, p.dpe, p.location
+                    FROM property_history h JOIN properties p ON p.id = h.property_id
+                    WHERE h.id > ? AND h.new_price IS NOT NULL AND p.price > 0 AND p.surface > 0
+                    ORDER BY h.id
+                ''', (self._max_history_id,)).fetchall()
+            for row in rows:
+                self._add(row)
+            # Au premier chargement, les prix lus sont déjà les derniers
+            if not first_load:
+                for row in changed:
+                    self._add(row[1:])
+            self._max_rowid = max_rowid
+            if changed:
+                self._max_history_id = changed[-1][0]
+            self._synced_at = time.monotonic()
+
+    def _add(self, row):
+        property_id, price, surface, rooms, dpe, location = row
+        point = feature_vector({'price': price, 'surface': surface, 'rooms': rooms, 'dpe': dpe}, impute=True)
+        if point is None or point[PRICE_AXIS] is None:
+            return
+        self._seq += 1
+        self._current[property_id] = self._seq
+        partition = self._partitions.setdefault(self._commune(location), _Partition())
+        partition.buffer.append((point, (self._seq,) + tuple(row)))
+
+    def _commune(self, location):
+        # Les localisations se répètent: clé de commune calculée une fois par libellé
+        key = self._commune_keys.get(location)
+        if key is None:
+            key = self._commune_keys[location] = commune_key(location)
+        return key
+
+    def nearest(self, listing, k=None, use_price=True):
+        """k annonces les plus proches d'une annonce (dict) de la même commune
+
+        La distance porte sur les attributs connus de l'annonce.
+
+        Args:
+            use_price: inclure le prix/m² dans la distance (s'il est connu)
+
+        Returns:
+            liste de dicts (id, price, surface, rooms, dpe, location,
+            price_per_sqm, distance), du plus proche au plus lointain
+        """
+        k = k or COMPARABLES_CONFIG.get('k', 10)
+        point = feature_vector(listing)
+        if point is None:
+            return []
+        axes = tuple(axis for axis, value in enumerate(point)
+                     if value is not None and (use_price or axis != PRICE_AXIS))
+        self.sync()
+
+        heap = []
+        with self._lock:
+            partition = self._partitions.get(self._commune(listing.get('location')))
+            if partition is None:
+                return []
+            current, own_id = self._current, listing.get('id')
+
+            def accept(item):
+                return item[1] != own_id and current.get(item[1]) == item[0]
+
+            partition.tree(axes, current).nearest(point, k, accept, heap)
+            for buffered_point, item in partition.buffer:
+                if accept(item):
+                    _push(heap, k, _distance(point, buffered_point, axes), item)
+
+        results = []
+        for distance, _, item in sorted(heap, reverse=True):
+            _, property_id, price, surface, rooms, dpe, location = item
+            results.append({
+                'id': property_id,
+                'price': price,
+                'surface': surface,
+                'rooms': rooms,
+                'dpe': dpe,
+                'location': location,
+                'price_per_sqm': round(price / surface, 2),
+                'distance': round(math.sqrt(-distance), 4)
+            })
+        return results
+
+    def estimate(self, listing, k=None):
+        """Prix/m² médian des comparables, trouvés sur surface, pièces et DPE
+
+        Returns:
+            dict: count, median_price_per_sqm, estimated_price (si surface connue),
+            comparables
+        """
+        comparables = self.nearest(listing, k, use_price=False)
+        median = statistics.median(c['price_per_sqm'] for c in comparables) if comparables else None
+        surface = listing.get('surface')
+        return {
+            'count': len(comparables),
+            'median_price_per_sqm': median,
+            'estimated_price': round(median * surface) if median and surface else None,
+            'comparables': comparables
+        }
@@ -37,16 +37,52 @@ EMAIL_CONFIG = {
 # Configuration Base de Données
 DATABASE_CONFIG = {
     'path': BASE_DIR / 'database' / 'immobilier.db',
-    'backup_dir': BASE_DIR / 'database' / 'backups'
+    'backup_dir': BASE_DIR / 'database' / 'backups',
+    # Pool de connexions (une connexion empruntée par thread)
+    'pool_size': 8,
+    'pool_timeout': 30,          # Attente max d'une connexion libre (s)
+    # PRAGMAs appliqués à chaque connexion du pool
+    'busy_timeout_ms': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,        # Négatif = en Ko (~20 Mo)
+    # Largeur des tranches de prix de la table d'agrégats property_stats (€)
+    # (la table est reconstruite automatiquement si la valeur change)
+    'stats_price_band': 10000,
+    # Ensemble en mémoire des URL connues: rattrapage des insertions des
+    # autres processus au plus toutes les N secondes
+    'url_set_refresh_seconds': 5
 }
 
 # Configuration des scrapers
+# `rate_limit`: budget global par hôte (token bucket + requêtes simultanées),
+# partagé par tous les threads, jobs et scrapers du processus
+# `cache_ttl`: durée (secondes) pendant laquelle une réponse HTTP en cache est
+# servie sans revalidation
+# `max_pages` (optionnel, 1 par défaut): pages de résultats demandées par zone
+# (scrapers paginés uniquement, ex. dvf_opendata, voir scrapers/incremental.py)
 SCRAPERS_CONFIG = {
     'dvf': {
         'name': 'DVF',
         'enabled': False,
         'timeout': 30,
         'delay_between_requests': 1,
+        'rate_limit': {'requests_per_second': 1.0, 'burst': 3, 'max_concurrent': 4},
+        'cache_ttl': 86400,
+        'headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'application/json',
+        }
+    },
+    'dvf_opendata': {
+        'name': 'DVF Open Data',
+        'enabled': False,
+        'dataset': 'dvf-data',     # Jeu de données OpenData Soft
+        'page_size': 100,          # Transactions par page (paramètre `limit`)
+        'max_pages': 5,            # Pages parcourues par zone (crawl incrémental)
+        'timeout': 30,
+        'delay_between_requests': 1,
+        'rate_limit': {'requests_per_second': 1.0, 'burst': 3, 'max_concurrent': 2},
+        'cache_ttl': 3600,
         'headers': {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'application/json',
@@ -59,6 +95,8 @@ SCRAPERS_CONFIG = {
         'enabled': False,
         'timeout': 30,
         'delay_between_requests': 2,
+        'rate_limit': {'requests_per_second': 0.5, 'burst': 2, 'max_concurrent': 2},
+        'cache_ttl': 900,
         'use_api': True,
         'headers': {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -72,6 +110,8 @@ SCRAPERS_CONFIG = {
         'enabled': False,
         'timeout': 30,
         'delay_between_requests': 2,
+        'rate_limit': {'requests_per_second': 0.5, 'burst': 2, 'max_concurrent': 2},
+        'cache_ttl': 900,
         'headers': {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -94,6 +134,8 @@ SCRAPERS_CONFIG = {
         'enabled': False,
         'timeout': 30,
         'delay_between_requests': 3,
+        'rate_limit': {'requests_per_second': 0.33, 'burst': 1, 'max_concurrent': 1},
+        'cache_ttl': 900,
         'use_api': True,
         'headers': {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -107,6 +149,8 @@ SCRAPERS_CONFIG = {
         'enabled': False,
         'timeout': 30,
         'delay_between_requests': 3,
+        'rate_limit': {'requests_per_second': 0.33, 'burst': 2, 'max_concurrent': 2},
+        'cache_ttl': 900,
         'headers': {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -131,10 +175,115 @@ LOG_CONFIG = {
     'max_log_size': '10MB'
 }
 
+# Cache mémoire des pages / endpoints de statistiques
+CACHE_CONFIG = {
+    'ttl_seconds': 30,   # Durée de vie d'une entrée
+    'max_entries': 256   # Éviction LRU au-delà
+}
+
+# Moteur HTTP des scrapers
+HTTP_CONFIG = {
+    'max_retries': 3,          # Tentatives (erreurs réseau, 429 et 5xx uniquement)
+    'retry_backoff': 1.0,      # Attente de base (s): 2, 4, 8... fois cette valeur
+    'retry_backoff_max': 30.0, # Plafond de l'attente entre deux tentatives (s)
+    'retry_jitter': 1.0        # Gigue aléatoire ajoutée à chaque attente (s)
+}
+
+# Cache disque des réponses HTTP (revalidation ETag / Last-Modified)
+HTTP_CACHE_CONFIG = {
+    'dir': BASE_DIR / 'database' / 'http_cache',
+    'max_size_mb': 200,            # Éviction LRU au-delà
+    'default_ttl_seconds': 3600,   # Fraîcheur par défaut (clé 'cache_ttl' par scraper)
+    'mode': os.getenv('HTTP_CACHE_MODE', 'normal')  # normal, replay (hors ligne) ou off
+}
+
+# Pipeline d'ingestion en flux (scraping → validation → base)
+PIPELINE_CONFIG = {
+    'batch_size': 200,      # Annonces par transaction d'écriture
+    'queue_size': 1000,     # Taille des files entre étapes (mémoire bornée)
+    'flush_seconds': 1.0,   # Écrire un lot incomplet après ce délai
+    'incremental': True,    # Arrêter une zone dès qu'une page n'a que des annonces connues
+    'full_resync_hours': 168  # Parcours complet forcé au-delà (0 = jamais)
+}
+
+# Regroupement des annonces en double entre sources (MinHash + LSH sur le titre)
+DEDUP_CONFIG = {
+    'num_perm': 64,             # Taille des signatures MinHash
+    'bands': 16,                # Bandes LSH (4 valeurs par bande)
+    'shingle_size': 3,          # k-grammes de caractères du titre
+    'similarity': 0.5,          # Jaccard estimé minimal entre titres
+    'surface_tolerance': 0.05,  # Écart relatif toléré sur la surface
+    'price_tolerance': 0.05     # Écart relatif toléré sur le prix
+}
+
+# Statistiques vectorisées (analytics.py, numpy)
+ANALYTICS_CONFIG = {
+    'percentiles': (10, 25, 75, 90)  # Centiles calculés en plus de la médiane
+}
+
+# Annonces comparables (comparables.py, arbre k-d par commune)
+COMPARABLES_CONFIG = {
+    'k': 10,                    # Nombre de comparables par défaut
+    'scales': {                 # Écart correspondant à une unité de distance
+        'surface': 0.15,        # log(surface): ~15 %
+        'rooms': 1,             # 1 pièce
+        'dpe': 1,               # 1 classe DPE
+        'price_per_sqm': 0.15   # log(prix/m²): ~15 %
+    },
+    'sqm_per_room': 20,         # Pièces estimées pour une annonce qui ne les précise pas
+    'leaf_size': 32,            # Points par feuille de l'arbre
+    'min_rebuild': 256,         # Taille du tampon avant reconstruction de l'arbre d'une commune...
+    'rebuild_ratio': 0.1,       # ...ou fraction de la taille de l'arbre si elle est plus grande
+    'refresh_seconds': 0        # Délai min. entre deux rattrapages depuis la base (0: à chaque requête)
+}
+
+# Prix de référence au m² par commune (table commune_reference, deal_score)
+REFERENCE_CONFIG = {
+    'window_days': 365,         # Fenêtre glissante des annonces prises en compte
+    'min_sample': 5,            # Annonces minimum pour une référence calculée
+    'seed_spread': 0.1,         # Quartiles estimés à ±10 % de PRIX_PAR_M2 (communes sans données)
+    'good_deal_score': 1.0,     # Bonne affaire: prix/m² au moins 1 IQR sous la médiane
+    'refresh_hours': 24,        # Recalcul planifié de la table
+    'refresh_seconds': 300,     # Rechargement en mémoire (recalculs d'un autre processus)
+    'dvf_window_days': 730      # Fenêtre des transactions DVF (publiées avec plusieurs mois de retard)
+}
+
+# Recherches géographiques (geo.py, index R*Tree)
+GEO_CONFIG = {
+    'default_radius_m': 1000,   # Rayon par défaut d'une recherche `near`
+    'max_radius_m': 50000,      # Rayon maximum accepté
+    'refresh_seconds': 300      # Rechargement en mémoire des centroïdes (mises à jour d'un autre processus)
+}
+
+# Import des fichiers DVF "valeurs foncières" (dvf_import.py)
+DVF_IMPORT_CONFIG = {
+    'chunk_lines': 50000,       # Lignes lues et insérées par transaction (mémoire constante)
+    'encoding': 'utf-8',        # Encodage des fichiers (caractères invalides remplacés)
+    'residential_types': ('Appartement', 'Maison')  # Types retenus pour les prix de référence
+}
+
+# Jobs de scraping asynchrones (/api/scrape)
+JOBS_CONFIG = {
+    'max_workers': 2,      # Scrapings exécutés simultanément
+    'max_pending': 10,     # Au-delà, /api/scrape répond 503
+    'history_size': 100    # Jobs terminés consultables via /api/jobs/<id>
+}
+
+# Flux d'événements temps réel (Server-Sent Events)
+EVENTS_CONFIG = {
+    'history_size': 200,            # Événements rejoués à la reconnexion (Last-Event-ID)
+    'subscriber_queue_size': 500,   # File par onglet connecté
+    'heartbeat_seconds': 15,        # Commentaire keep-alive pour les proxys
+    'db_poll_seconds': 2            # Relecture de la base et du log (écritures du CLI / scheduler.py)
+}
+
 # Configuration Planification
 SCHEDULER_CONFIG = {
     'interval_hours': 2,  # Scraper tous les 2 heures
-    'max_workers': 3,      # Nombre de workers parallèles
+    'max_workers': 16,     # Plafond des unités (source, zone, page) scrapées en parallèle
+    'min_workers': 2,      # Plancher après un ralentissement (429 / 5xx)
+    'initial_workers': 4,  # Concurrence de départ, augmentée si les sources répondent vite
+    'target_latency_seconds': 5,  # Au-delà, une unité lente réduit la concurrence
     'retry_failed_after_minutes': 30
 }
 
@@ -3,25 +3,479 @@ Gestion de la base de données SQLite pour les annonces immobilières
 """
 import sqlite3
 import logging
+import hashlib
+import itertools
 import json
-from datetime import datetime
+import math
+import base64
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from config import DATABASE_CONFIG, DPE_MAPPING, PROPERTY_STATUS
+from config import DATABASE_CONFIG, DPE_MAPPING, DVF_IMPORT_CONFIG, PROPERTY_STATUS, REFERENCE_CONFIG
+from dedup import commune_key, is_duplicate, lsh_buckets, pack_signature, title_signature, unpack_signature
+from geo import CentroidTable, bbox_around, distance_m
+from locations import DEPARTMENT_NAMES, LocationTable, department_code, new_location, seed_locations
+from reference_prices import ReferenceTable, compute_references, seed_references
 
 logger = logging.getLogger(__name__)
 
+# Colonnes alimentées à l'insertion d'une annonce
+PROPERTY_COLUMNS = (
+    'id', 'source', 'url', 'title', 'location', 'price', 'price_per_sqm', 'surface',
+    'rooms', 'bedrooms', 'bathrooms', 'floor', 'building_year', 'property_type',
+    'description', 'dpe', 'dpe_value', 'ges', 'ges_value', 'images',
+    'contact_name', 'contact_phone', 'contact_email', 'posted_date', 'department', 'deal_score',
+    'latitude', 'longitude', 'location_id'
+)
+
+# Colonnes ajoutées après la création initiale du schéma (migrées par ALTER TABLE)
+ADDED_COLUMNS = {
+    'department': 'TEXT',
+    'deal_score': 'REAL',  # Voir reference_prices.py
+    'latitude': 'REAL',    # Voir geo.py
+    'longitude': 'REAL',
+    'location_id': 'INTEGER REFERENCES locations(id)',  # Voir locations.py
+}
+
+# Colonnes de dvf_transactions remplies par dvf_import.py (ordre des tuples insérés)
+DVF_COLUMNS = (
+    'source_file', 'mutation_id', 'date_mutation', 'nature_mutation', 'valeur_fonciere',
+    'code_postal', 'commune', 'code_departement', 'code_commune', 'type_local',
+    'surface_reelle_bati', 'nombre_pieces', 'surface_terrain', 'longitude', 'latitude'
+)
+
+# Colonnes NOT NULL à vérifier avant une insertion en lot
+REQUIRED_COLUMNS = ('source', 'url', 'title', 'location', 'price')
+
+# Nombre maximal de paramètres par requête IN (...)
+SQL_BATCH_SIZE = 500
+
+# Version des migrations de données (PRAGMA user_version), appliquées une seule fois:
+# 1 = rattachement des annonces existantes à la table locations
+DATA_VERSION = 1
+
+# Filtres que property_stats sait servir (les autres passent par properties)
+ROLLUP_FILTERS = {'price_min', 'price_max', 'dpe_max', 'status'}
+
+# Index plein texte (FTS5) sur ces colonnes, tokenisation sans accents
+FTS_COLUMNS = ('title', 'description', 'location')
+# Poids BM25 par colonne (ordre de FTS_COLUMNS): le titre compte le plus
+FTS_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Modes de tri de la liste des annonces (clé -> ORDER BY)
+SORT_ORDERS = {
+    'date_desc': 'posted_date DESC, id DESC',
+    'date_asc': 'posted_date ASC, id ASC',
+    'price_desc': 'price DESC, id DESC',
+    'price_asc': 'price ASC, id ASC',
+    'deal_desc': 'deal_score DESC, id DESC',
+}
+DEFAULT_SORT_ORDER = 'created_at DESC, id DESC'
+
+# Pagination par curseur (keyset): clé de tri -> (colonne, sens)
+# Les colonnes sont NOT NULL pour que (colonne, id) soit un ordre total
+KEYSET_ORDERS = {
+    'date_desc': ('created_at', 'DESC'),
+    'date_asc': ('created_at', 'ASC'),
+    'price_desc': ('price', 'DESC'),
+    'price_asc': ('price', 'ASC'),
+}
+
+
+def encode_cursor(sort, value, last_id):
+    """Encoder un curseur de pagination opaque"""
+    payload = json.dumps([sort, value, last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Décoder un curseur; ValueError s'il est invalide ou d'un autre tri"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Curseur invalide: {cursor}") from e
+    if cursor_sort != sort:
+        raise ValueError(f"Curseur créé pour le tri '{cursor_sort}', pas '{sort}'")
+    return value, last_id
+
+
+def fts_query(text, column=None):
+    """Requête FTS5 depuis une saisie libre (None si aucun mot)
+    
+    Chaque mot est cité (pas d'opérateurs FTS5 injectés) et cherché en préfixe;
+    tous les mots sont requis.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    query = ' '.join(f'"{word}"*' for word in words)
+    return f'{column} : ({query})' if column else query
+
+
+class ConnectionPool:
+    """Pool de connexions SQLite longue durée
+    
+    Chaque thread emprunte au plus une connexion à la fois: les emprunts
+    imbriqués dans un même thread réutilisent la connexion déjà prise, ce qui
+    permet d'enchaîner plusieurs méthodes dans une même transaction.
+    Les connexions rendues retournent dans une file d'attente et sont
+    réutilisées par les threads suivants (serveur Flask, scheduler, jobs).
+    
+    Le pool porte aussi ce qui est partagé par toutes les instances de
+    Database sur le même fichier: le compteur de génération des écritures
+    (invalidation des caches), l'ensemble des URL connues (tests d'existence
+    sans requête), les prix de référence, les centroïdes des communes et la
+    table des localisations.
+    """
+    
+    def __init__(self, db_path, max_size=None, timeout=None):
+        self.db_path = str(db_path)
+        self.max_size = max_size or DATABASE_CONFIG.get('pool_size', 8)
+        self.timeout = timeout or DATABASE_CONFIG.get('pool_timeout', 30)
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0}
+        self.generation = 0
+        self.urls = UrlSet()
+        self.references = ReferenceTable()
+        self.centroids = CentroidTable()
+        self.locations = LocationTable()
+    
+    def _connect(self):
+        """Ouvrir une nouvelle connexion configurée avec les PRAGMAs"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DATABASE_CONFIG.get('busy_timeout_ms', 5000) / 1000,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f"PRAGMA busy_timeout={int(DATABASE_CONFIG.get('busy_timeout_ms', 5000))}")
+        cursor.execute(f"PRAGMA mmap_size={int(DATABASE_CONFIG.get('mmap_size', 268435456))}")
+        cursor.execute(f"PRAGMA cache_size={int(DATABASE_CONFIG.get('cache_size', -20000))}")
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+        # Distance exacte des recherches par rayon (après filtrage par l'index R*Tree)
+        conn.create_function('geo_distance', 4, distance_m, deterministic=True)
+        return conn
+    
+    def _acquire(self):
+        """Prendre une connexion libre, en ouvrir une ou attendre"""
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._stats['hits'] += 1
+            return conn
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            can_open = self._open < self.max_size
+            if can_open:
+                self._open += 1
+                self._stats['misses'] += 1
+            else:
+                self._stats['waits'] += 1
+        
+        if can_open:
+            try:
+                return self._connect()
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._open -= 1
+                logger.error(f"Erreur de connexion à la base de données: {e}")
+                raise
+        
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise sqlite3.OperationalError(
+                f"Aucune connexion disponible après {self.timeout}s (pool de {self.max_size})"
+            )
+    
+    def _release(self, conn):
+        """Rendre une connexion au pool"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Connexion invalide retirée du pool: {e}")
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+    
+    def _discard(self, conn):
+        """Fermer une connexion et libérer sa place"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._open -= 1
+    
+    @contextmanager
+    def connection(self):
+        """Emprunter une connexion (context manager)
+        
+        Usage:
+            with pool.connection() as conn:
+                conn.execute(...)
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            # Emprunt imbriqué: même connexion, même transaction
+            self._local.depth += 1
+            with self._lock:
+                self._stats['hits'] += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+    
+    def bump_generation(self):
+        """Signaler une écriture en base"""
+        with self._lock:
+            self.generation += 1
+            return self.generation
+    
+    def stats(self):
+        """Statistiques du pool (hits, waits, connexions ouvertes...)"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_connections'] = self._open
+        stats['idle_connections'] = self._idle.qsize()
+        stats['in_use'] = stats['open_connections'] - stats['idle_connections']
+        stats['max_size'] = self.max_size
+        return stats
+    
+    def close_all(self):
+        """Fermer toutes les connexions inactives"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+def url_key(url):
+    """Empreinte 64 bits d'une URL (clé de UrlSet)"""
+    return int.from_bytes(hashlib.blake2b((url or '').strip().encode(), digest_size=8).digest(), 'big')
+
+
+class UrlSet:
+    """Empreintes des URL de properties, en mémoire
+    
+    Chargé une fois puis complété à chaque insertion du processus; les lignes
+    insérées par d'autres processus sont rattrapées par rowid, au plus toutes
+    les DATABASE_CONFIG['url_set_refresh_seconds'].
+    """
+    
+    def __init__(self, refresh_seconds=None):
+        self.refresh_seconds = (DATABASE_CONFIG.get('url_set_refresh_seconds', 5)
+                                if refresh_seconds is None else refresh_seconds)
+        self._keys = set()
+        self._max_rowid = None
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+    
+    def due(self):
+        """Vrai si un rattrapage depuis la base est nécessaire"""
+        return (self._max_rowid is None
+                or time.monotonic() - self._synced_at >= self.refresh_seconds)
+    
+    def sync(self, conn):
+        """Charger les URL des lignes ajoutées depuis le dernier rattrapage"""
+        with self._lock:
+            rows = conn.execute(
+                'SELECT rowid, url FROM properties WHERE rowid > ? ORDER BY rowid',
+                (self._max_rowid or 0,)
+            ).fetchall()
+            self._keys.update(url_key(row['url']) for row in rows)
+            if rows:
+                self._max_rowid = rows[-1]['rowid']
+            elif self._max_rowid is None:
+                self._max_rowid = 0
+            self._synced_at = time.monotonic()
+    
+    def add(self, urls):
+        with self._lock:
+            self._keys.update(url_key(url) for url in urls)
+    
+    def reset(self):
+        """Oublier le contenu (après des suppressions): rechargé au prochain accès"""
+        with self._lock:
+            self._keys.clear()
+            self._max_rowid = None
+    
+    def __contains__(self, url):
+        return url_key(url) in self._keys
+    
+    def __len__(self):
+        return len(self._keys)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """Obtenir le pool partagé pour un fichier de base de données
+    
+    Toutes les instances de Database (app, analyzer, scheduler...) pointant
+    vers le même fichier partagent le même pool.
+    """
+    key = str(Path(db_path).resolve())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[key] = pool
+        return pool
+
+
+# Clé de regroupement de property_stats pour une ligne de properties
+_STATS_KEY_SQL = (
+    "{row}.source, COALESCE({row}.status, ''), COALESCE({row}.department, ''), "
+    "COALESCE({row}.dpe_value, 99), CAST({row}.price / {band} AS INTEGER), "
+    "COALESCE(date({row}.created_at), '')"
+)
+
+
+def _property_stats_triggers(band):
+    """SQL des triggers qui maintiennent property_stats à jour
+    
+    Ajout: incrémente le groupe de la nouvelle ligne. Retrait: décrémente le
+    groupe de l'ancienne ligne, supprime le groupe s'il est vide et recalcule
+    min/max sur la seule tranche de prix concernée si l'ancienne valeur était
+    un extrême.
+    """
+    def add(row):
+        return f'''
+            INSERT INTO property_stats
+            VALUES ({_STATS_KEY_SQL.format(row=row, band=band)},
+                    1, {row}.price, {row}.price, {row}.price,
+                    {row}.surface IS NOT NULL, COALESCE({row}.surface, 0), {row}.surface, {row}.surface,
+                    {row}.rooms IS NOT NULL, COALESCE({row}.rooms, 0))
+            ON CONFLICT (source, status, department, dpe_value, price_band, day) DO UPDATE SET
+                n = n + 1,
+                sum_price = sum_price + excluded.sum_price,
+                min_price = CASE WHEN min_price IS NULL OR excluded.min_price < min_price
+                                 THEN excluded.min_price ELSE min_price END,
+                max_price = CASE WHEN max_price IS NULL OR excluded.max_price > max_price
+                                 THEN excluded.max_price ELSE max_price END,
+                n_surface = n_surface + excluded.n_surface,
+                sum_surface = sum_surface + excluded.sum_surface,
+                min_surface = CASE WHEN min_surface IS NULL OR excluded.min_surface < min_surface
+                                   THEN excluded.min_surface ELSE min_surface END,
+                max_surface = CASE WHEN max_surface IS NULL OR excluded.max_surface > max_surface
+                                   THEN excluded.max_surface ELSE max_surface END,
+                n_rooms = n_rooms + excluded.n_rooms,
+                sum_rooms = sum_rooms + excluded.sum_rooms;'''
+
+    def remove(row):
+        key = (f"(source, status, department, dpe_value, price_band, day) = "
+               f"({_STATS_KEY_SQL.format(row=row, band=band)})")
+        same_group = (f"p.source = {row}.source AND COALESCE(p.status, '') = COALESCE({row}.status, '') "
+                      f"AND COALESCE(p.department, '') = COALESCE({row}.department, '') "
+                      f"AND COALESCE(p.dpe_value, 99) = COALESCE({row}.dpe_value, 99) "
+                      f"AND p.price >= CAST({row}.price / {band} AS INTEGER) * {band} "
+                      f"AND p.price < (CAST({row}.price / {band} AS INTEGER) + 1) * {band} "
+                      f"AND COALESCE(date(p.created_at), '') = COALESCE(date({row}.created_at), '')")
+        return f'''
+            UPDATE property_stats SET
+                n = n - 1,
+                sum_price = sum_price - {row}.price,
+                n_surface = n_surface - ({row}.surface IS NOT NULL),
+                sum_surface = sum_surface - COALESCE({row}.surface, 0),
+                n_rooms = n_rooms - ({row}.rooms IS NOT NULL),
+                sum_rooms = sum_rooms - COALESCE({row}.rooms, 0)
+            WHERE {key};
+            DELETE FROM property_stats WHERE {key} AND n <= 0;
+            UPDATE property_stats SET
+                min_price = (SELECT MIN(p.price) FROM properties p WHERE {same_group}),
+                max_price = (SELECT MAX(p.price) FROM properties p WHERE {same_group}),
+                min_surface = (SELECT MIN(p.surface) FROM properties p WHERE {same_group}),
+                max_surface = (SELECT MAX(p.surface) FROM properties p WHERE {same_group})
+            WHERE {key} AND ({row}.price IN (min_price, max_price)
+                             OR {row}.surface IN (min_surface, max_surface));'''
+
+    tracked = ('source', 'status', 'department', 'dpe_value', 'price', 'surface', 'rooms', 'created_at')
+    changed = ' OR '.join(f'OLD.{col} IS NOT NEW.{col}' for col in tracked)
+    return {
+        'trg_property_stats_insert': (
+            f"CREATE TRIGGER trg_property_stats_insert AFTER INSERT ON properties\n"
+            f"BEGIN{add('NEW')}\nEND"
+        ),
+        'trg_property_stats_delete': (
+            f"CREATE TRIGGER trg_property_stats_delete AFTER DELETE ON properties\n"
+            f"BEGIN{remove('OLD')}\nEND"
+        ),
+        'trg_property_stats_update': (
+            f"CREATE TRIGGER trg_property_stats_update AFTER UPDATE OF {', '.join(tracked)} ON properties\n"
+            f"WHEN {changed}\n"
+            f"BEGIN{remove('OLD')}{add('NEW')}\nEND"
+        ),
+    }
+
 
 class Database:
     """Classe pour gérer la base de données"""
     
+    # Index plein texte disponible (SQLite compilé avec FTS5), voir _init_fts
+    fts_enabled = False
+    # Index géographiques disponibles (SQLite compilé avec R*Tree), voir _init_rtree
+    rtree_enabled = False
+    
     def __init__(self):
         self.db_path = DATABASE_CONFIG['path']
         self.backup_dir = DATABASE_CONFIG['backup_dir']
         self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.pool = get_pool(self.db_path)
         self.init_database()
+        self._known_urls()
+    
+    def connection(self):
+        """Emprunter une connexion au pool (à utiliser avec `with`)"""
+        return self.pool.connection()
+    
+    def pool_stats(self):
+        """Statistiques du pool de connexions"""
+        return self.pool.stats()
+    
+    @property
+    def generation(self):
+        """Compteur incrémenté à chaque écriture (clé d'invalidation des caches)"""
+        return self.pool.generation
     
     def get_connection(self):
-        """Obtenir une connexion à la base de données"""
+        """Obtenir une connexion dédiée hors pool
+        
+        Conservée pour compatibilité: l'appelant doit la fermer lui-même.
+        Préférer `with db.connection() as conn:`.
+        """
         try:
             conn = sqlite3.connect(str(self.db_path))
             conn.row_factory = sqlite3.Row
@@ -31,8 +485,24 @@ class Database:
             raise
     
     def init_database(self):
-        """Initialiser les tables de la base de données"""
-        conn = self.get_connection()
+        """Initialiser les tables de la base de données
+        
+        Les migrations de données ne tournent qu'une fois par base, suivies
+        par PRAGMA user_version (voir DATA_VERSION).
+        """
+        with self.connection() as conn:
+            self._init_schema(conn)
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < 1:
+            # Les écritures rattachent déjà leurs annonces: seules les anciennes restent
+            self.assign_locations()
+        if version < DATA_VERSION:
+            with self.connection() as conn:
+                conn.execute(f'PRAGMA user_version = {DATA_VERSION}')
+                conn.commit()
+    
+    def _init_schema(self, conn):
+        """Créer ou migrer le schéma"""
         cursor = conn.cursor()
         
         try:
@@ -135,6 +605,8 @@ class Database:
                     )
                 ''')
             
+            self._add_missing_columns(cursor)
+            
             # Table d'historique
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS property_history (
@@ -148,6 +620,11 @@ class Database:
                 )
             ''')
             
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_history_property_changed
+                ON property_history(property_id, changed_at)
+            ''')
+            
             # Table des recherches
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS searches (
@@ -175,13 +652,146 @@ class Database:
                 )
             ''')
             
+            # Points de reprise du scraping incrémental, par (source, zone)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scrape_state (
+                    source TEXT NOT NULL,
+                    zone TEXT NOT NULL,
+                    last_listing_id TEXT,
+                    last_posted_date TIMESTAMP,
+                    last_run_at TIMESTAMP,
+                    last_full_run_at TIMESTAMP,
+                    PRIMARY KEY (source, zone)
+                )
+            ''')
+            
+            # Groupes de doublons entre sources (cluster_id = annonce de référence)
+            # et seaux LSH des signatures MinHash des titres (voir dedup.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS listing_clusters (
+                    property_id TEXT PRIMARY KEY,
+                    cluster_id TEXT NOT NULL,
+                    signature BLOB,
+                    clustered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_listing_clusters_cluster ON listing_clusters(cluster_id)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS listing_lsh (
+                    bucket TEXT NOT NULL,
+                    property_id TEXT NOT NULL,
+                    PRIMARY KEY (bucket, property_id)
+                ) WITHOUT ROWID
+            ''')
+            
+            # Transactions des fichiers DVF (une ligne par local), importées en flux
+            # par dvf_import.py avec un point de reprise par fichier
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS dvf_transactions (
+                    id INTEGER PRIMARY KEY,
+                    source_file TEXT NOT NULL,
+                    mutation_id TEXT,
+                    date_mutation TEXT,
+                    nature_mutation TEXT,
+                    valeur_fonciere REAL,
+                    code_postal TEXT,
+                    commune TEXT,
+                    code_departement TEXT,
+                    code_commune TEXT,
+                    type_local TEXT,
+                    surface_reelle_bati REAL,
+                    nombre_pieces INTEGER,
+                    surface_terrain REAL,
+                    longitude REAL,
+                    latitude REAL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_dvf_source_file ON dvf_transactions(source_file)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_dvf_mutation ON dvf_transactions(mutation_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_dvf_date ON dvf_transactions(date_mutation)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS dvf_import_state (
+                    source_file TEXT PRIMARY KEY,
+                    file_size INTEGER NOT NULL,
+                    byte_offset INTEGER NOT NULL DEFAULT 0,
+                    rows_read INTEGER NOT NULL DEFAULT 0,
+                    rows_imported INTEGER NOT NULL DEFAULT 0,
+                    completed BOOLEAN DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Centroïdes par code postal ou commune (kind = 'postal' / 'commune'),
+            # pour placer les annonces sur la carte (voir geo.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS commune_centroids (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    latitude REAL NOT NULL,
+                    longitude REAL NOT NULL,
+                    source TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (kind, key)
+                )
+            ''')
+            
+            # Dimension des localisations: une ligne par commune ou arrondissement,
+            # department = code ('' si inconnu), voir locations.py
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS locations (
+                    id INTEGER PRIMARY KEY,
+                    commune TEXT NOT NULL,
+                    commune_key TEXT NOT NULL,
+                    insee_code TEXT,
+                    postal_code TEXT,
+                    department TEXT NOT NULL DEFAULT '',
+                    latitude REAL,
+                    longitude REAL,
+                    UNIQUE (commune_key, department)
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_locations_department ON locations(department)')
+            cursor.executemany('''
+                INSERT OR IGNORE INTO locations (commune, commune_key, insee_code, postal_code, department)
+                VALUES (:commune, :commune_key, :insee_code, :postal_code, :department)
+            ''', seed_locations())
+            
+            # Prix de référence au m² par commune et type de bien ('' = tous types),
+            # recalculés par refresh_commune_reference (voir reference_prices.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS commune_reference (
+                    commune TEXT NOT NULL,
+                    property_type TEXT NOT NULL DEFAULT '',
+                    median_price_per_sqm REAL NOT NULL,
+                    q1 REAL NOT NULL,
+                    q3 REAL NOT NULL,
+                    sample_size INTEGER NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (commune, property_type)
+                )
+            ''')
+            
             # Créer les index
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_source ON properties(source)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_status ON properties(status)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_price ON properties(price)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_dpe ON properties(dpe)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_location ON properties(location)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_created_at ON properties(created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_url ON properties(url)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_location_id ON properties(location_id)')
+            
+            # Index composites alignés sur les tris de /properties (SORT_ORDERS)
+            # et sur les filtres prix / DPE; remplacent idx_price et idx_created_at
+            cursor.execute('DROP INDEX IF EXISTS idx_price')
+            cursor.execute('DROP INDEX IF EXISTS idx_created_at')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_price_id ON properties(price, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_posted_date_id ON properties(posted_date, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_created_at_id ON properties(created_at, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_dpe_value_price ON properties(dpe_value, price)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_deal_score_id ON properties(deal_score, id)')
+            
+            self._init_property_stats(cursor)
+            self._init_fts(cursor)
+            self._init_rtree(cursor)
             
             conn.commit()
             logger.info("Base de données initialisée avec succès")
@@ -189,227 +799,1440 @@ class Database:
             logger.error(f"Erreur lors de l'initialisation de la base de données: {e}")
             conn.rollback()
             raise
-        finally:
-            conn.close()
+    
+    def _add_missing_columns(self, cursor):
+        """Ajouter à properties les colonnes de ADDED_COLUMNS absentes"""
+        cursor.execute('PRAGMA table_info(properties)')
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in existing_columns:
+                logger.info(f"Migrating properties table: adding column {column}")
+                cursor.execute(f'ALTER TABLE properties ADD COLUMN {column} {definition}')
+    
+    def _init_fts(self, cursor):
+        """Créer l'index plein texte properties_fts et ses triggers de synchronisation
+        
+        Table FTS5 à contenu externe (les textes restent dans properties);
+        sans FTS5 dans SQLite, la recherche texte se replie sur LIKE.
+        """
+        columns = ', '.join(FTS_COLUMNS)
+        new_values = ', '.join(f'new.{col}' for col in FTS_COLUMNS)
+        old_values = ', '.join(f'old.{col}' for col in FTS_COLUMNS)
+        try:
+            exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'properties_fts'"
+            ).fetchone()
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS properties_fts USING fts5(
+                    {columns}, content='properties', content_rowid='rowid',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 indisponible ({e}): recherche texte par LIKE")
+            self.fts_enabled = False
+            return
+        
+        insert_new = f"INSERT INTO properties_fts (rowid, {columns}) VALUES (new.rowid, {new_values});"
+        delete_old = (f"INSERT INTO properties_fts (properties_fts, rowid, {columns}) "
+                      f"VALUES ('delete', old.rowid, {old_values});")
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_properties_fts_insert AFTER INSERT ON properties
+            BEGIN {insert_new} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_properties_fts_delete AFTER DELETE ON properties
+            BEGIN {delete_old} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_properties_fts_update AFTER UPDATE OF {columns} ON properties
+            BEGIN {delete_old} {insert_new} END
+        ''')
+        if not exists:
+            logger.info("Construction de l'index plein texte properties_fts")
+            cursor.execute("INSERT INTO properties_fts (properties_fts) VALUES ('rebuild')")
+        self.fts_enabled = True
+    
+    def _init_rtree(self, cursor):
+        """Créer les index R*Tree properties_rtree et dvf_rtree et leurs triggers
+        
+        Un point par ligne (rowid de properties / id de dvf_transactions) pour
+        les lignes ayant des coordonnées; sans module R*Tree dans SQLite, les
+        recherches géographiques filtrent directement latitude / longitude.
+        """
+        for table, rtree, key in (('properties', 'properties_rtree', 'rowid'),
+                                  ('dvf_transactions', 'dvf_rtree', 'id')):
+            try:
+                exists = cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (rtree,)
+                ).fetchone()
+                cursor.execute(f'''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {rtree}
+                    USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+                ''')
+            except sqlite3.OperationalError as e:
+                logger.warning(f"R*Tree indisponible ({e}): recherches géographiques sans index")
+                self.rtree_enabled = False
+                return
+            
+            insert_new = (f"INSERT INTO {rtree} SELECT new.{key}, new.latitude, new.latitude, "
+                          f"new.longitude, new.longitude "
+                          f"WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;")
+            delete_old = f"DELETE FROM {rtree} WHERE id = old.{key};"
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{rtree}_insert AFTER INSERT ON {table}
+                BEGIN {insert_new} END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{rtree}_delete AFTER DELETE ON {table}
+                BEGIN {delete_old} END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{rtree}_update AFTER UPDATE OF latitude, longitude ON {table}
+                BEGIN {delete_old} {insert_new} END
+            ''')
+            if not exists:
+                cursor.execute(f'''
+                    INSERT INTO {rtree} SELECT {key}, latitude, latitude, longitude, longitude
+                    FROM {table} WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+                ''')
+        self.rtree_enabled = True
+    
+    def _init_property_stats(self, cursor):
+        """Créer la table d'agrégats property_stats et ses triggers
+        
+        Les triggers sont recréés si leur définition a changé (par exemple
+        après modification de DATABASE_CONFIG['stats_price_band']); la table
+        est alors reconstruite depuis properties. Une table antérieure à la
+        colonne `day` (jour de created_at) est recréée.
+        """
+        cursor.execute('PRAGMA table_info(property_stats)')
+        columns = {row[1] for row in cursor.fetchall()}
+        if columns and 'day' not in columns:
+            cursor.execute('DROP TABLE property_stats')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS property_stats (
+                source TEXT NOT NULL,
+                status TEXT NOT NULL,
+                department TEXT NOT NULL,
+                dpe_value INTEGER NOT NULL,
+                price_band INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                n INTEGER NOT NULL DEFAULT 0,
+                sum_price REAL NOT NULL DEFAULT 0,
+                min_price REAL,
+                max_price REAL,
+                n_surface INTEGER NOT NULL DEFAULT 0,
+                sum_surface REAL NOT NULL DEFAULT 0,
+                min_surface REAL,
+                max_surface REAL,
+                n_rooms INTEGER NOT NULL DEFAULT 0,
+                sum_rooms REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (source, status, department, dpe_value, price_band, day)
+            )
+        ''')
+        
+        triggers = _property_stats_triggers(DATABASE_CONFIG.get('stats_price_band', 10000))
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_property_stats_%'")
+        current = {row[0]: row[1] for row in cursor.fetchall()}
+        
+        if current != triggers:
+            for name in current:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            for sql in triggers.values():
+                cursor.execute(sql)
+            self._rebuild_property_stats(cursor)
+    
+    def _rebuild_property_stats(self, cursor):
+        """Recalculer property_stats depuis properties"""
+        band = DATABASE_CONFIG.get('stats_price_band', 10000)
+        cursor.execute('DELETE FROM property_stats')
+        cursor.execute(f'''
+            INSERT INTO property_stats
+            SELECT {_STATS_KEY_SQL.format(row='properties', band=band)},
+                   COUNT(*), SUM(price), MIN(price), MAX(price),
+                   COUNT(surface), COALESCE(SUM(surface), 0), MIN(surface), MAX(surface),
+                   COUNT(rooms), COALESCE(SUM(rooms), 0)
+            FROM properties
+            GROUP BY 1, 2, 3, 4, 5, 6
+        ''')
+    
+    def rebuild_property_stats(self):
+        """Reconstruire entièrement la table d'agrégats (récupération)"""
+        with self.connection() as conn:
+            try:
+                self._rebuild_property_stats(conn.cursor())
+                conn.commit()
+                self.pool.bump_generation()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de la reconstruction des statistiques: {e}")
+                conn.rollback()
+                raise
+            return conn.execute('SELECT COUNT(*) FROM property_stats').fetchone()[0]
+    
+    def _property_row(self, property_data):
+        """Construire le tuple d'insertion d'une annonce (ordre de PROPERTY_COLUMNS)"""
+        # Convertir les listes/dicts en JSON
+        images = property_data.get('images', [])
+        if isinstance(images, list):
+            images = json.dumps(images)
+        
+        return (
+            property_data.get('id'),
+            property_data.get('source'),
+            property_data.get('url'),
+            property_data.get('title'),
+            property_data.get('location'),
+            property_data.get('price'),
+            property_data.get('price_per_sqm'),
+            property_data.get('surface'),
+            property_data.get('rooms'),
+            property_data.get('bedrooms'),
+            property_data.get('bathrooms'),
+            property_data.get('floor'),
+            property_data.get('building_year'),
+            property_data.get('property_type'),
+            property_data.get('description'),
+            property_data.get('dpe'),
+            DPE_MAPPING.get(property_data.get('dpe'), 6),
+            property_data.get('ges'),
+            property_data.get('ges_value'),
+            images,
+            property_data.get('contact_name'),
+            property_data.get('contact_phone'),
+            property_data.get('contact_email'),
+            property_data.get('posted_date'),
+            property_data.get('department'),
+            self.pool.references.score(property_data),
+            *self.pool.centroids.coordinates(property_data),
+            self.pool.locations.lookup(property_data)
+        )
     
     def add_property(self, property_data):
         """Ajouter une annonce à la base de données"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                self._load_references(conn)
+                self._load_centroids(conn)
+                self._resolve_locations(conn, [property_data])
+                cursor.execute(f'''
+                    INSERT INTO properties ({', '.join(PROPERTY_COLUMNS)})
+                    VALUES ({', '.join('?' * len(PROPERTY_COLUMNS))})
+                ''', self._property_row(property_data))
+                if property_data.get('id'):
+                    self._cluster_listings(conn, [property_data])
+                conn.commit()
+                self.pool.bump_generation()
+                self.pool.urls.add([property_data.get('url')])
+                return cursor.lastrowid
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de l'ajout de la propriété: {e}")
+                conn.rollback()
+                self.pool.locations.reset()
+                return None
+    
+    def add_properties_bulk(self, properties):
+        """Insérer ou mettre à jour un lot d'annonces en une seule transaction
         
-        try:
-            # Convertir les listes/dicts en JSON
-            images = property_data.get('images', [])
-            if isinstance(images, list):
-                images = json.dumps(images)
+        Les annonces sont identifiées par leur `id` (hash source + URL).
+        Une annonce déjà connue dont le prix a changé est mise à jour
+        (price, price_per_sqm, deal_score, updated_at) et le changement est inscrit dans
+        property_history, dans la même transaction; sinon elle n'est pas modifiée.
+        Les nouvelles annonces sont rattachées à leur groupe de doublons.
+        
+        Args:
+            properties: itérable de dicts normalisés (PropertyUtils.normalize_property)
+        
+        Returns:
+            liste de tuples (property_data, outcome) dans l'ordre d'entrée, avec
+            outcome parmi 'inserted', 'unchanged', 'price_changed' ou 'skipped'
+            (champs obligatoires manquants ou doublon dans le lot)
+        """
+        outcomes = []
+        batch = {}
+        for prop in properties:
+            prop_id = prop.get('id')
+            if (not prop_id or prop_id in batch
+                    or any(prop.get(field) in (None, '') for field in REQUIRED_COLUMNS)):
+                outcomes.append((prop, 'skipped'))
+                continue
+            batch[prop_id] = prop
+            outcomes.append((prop, None))
+        
+        if not batch:
+            return outcomes
+        
+        with self.connection() as conn:
+            try:
+                if not conn.in_transaction:
+                    # Lecture des prix et écriture atomiques face aux autres écrivains
+                    conn.execute('BEGIN IMMEDIATE')
+                existing = self._existing_prices(conn, list(batch))
+                self._load_references(conn)
+                self._load_centroids(conn)
+                self._resolve_locations(conn, batch.values())
+                
+                update_columns = ('price', 'price_per_sqm', 'deal_score')
+                conn.executemany(f'''
+                    INSERT INTO properties ({', '.join(PROPERTY_COLUMNS)})
+                    VALUES ({', '.join('?' * len(PROPERTY_COLUMNS))})
+                    ON CONFLICT(id) DO UPDATE SET
+                        {', '.join(f'{col} = excluded.{col}' for col in update_columns)},
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE properties.price IS NOT excluded.price
+                ''', [self._property_row(prop) for prop in batch.values()])
+                self._cluster_listings(conn, [prop for prop_id, prop in batch.items() if prop_id not in existing])
+                conn.executemany('''
+                    INSERT INTO property_history (property_id, old_price, new_price, changed_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ''', [
+                    (prop_id, existing[prop_id], prop.get('price'))
+                    for prop_id, prop in batch.items()
+                    if prop_id in existing and existing[prop_id] != prop.get('price')
+                ])
+                conn.commit()
+                self.pool.bump_generation()
+                self.pool.urls.add(prop.get('url') for prop in batch.values())
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de l'insertion en lot: {e}")
+                conn.rollback()
+                self.pool.locations.reset()
+                raise
+        
+        results = []
+        for prop, outcome in outcomes:
+            if outcome is None:
+                prop_id = prop.get('id')
+                if prop_id not in existing:
+                    outcome = 'inserted'
+                elif existing[prop_id] != prop.get('price'):
+                    outcome = 'price_changed'
+                else:
+                    outcome = 'unchanged'
+            results.append((prop, outcome))
+        return results
+    
+    def _cluster_listings(self, conn, listings):
+        """Rattacher des annonces à un groupe de doublons (transaction de l'appelant)
+        
+        Seules les annonces partageant un seau LSH (même commune, bande de
+        signature identique) sont comparées; un rattachement à plusieurs
+        groupes les fusionne.
+        
+        Returns:
+            nombre d'annonces rattachées à un groupe existant
+        """
+        matched = 0
+        for prop in listings:
+            signature = title_signature(prop.get('title'))
+            buckets = lsh_buckets(prop, signature)
+            rows = conn.execute(f'''
+                SELECT DISTINCT c.property_id, c.cluster_id, c.signature, p.price, p.surface, p.rooms
+                FROM listing_lsh l
+                JOIN listing_clusters c ON c.property_id = l.property_id
+                JOIN properties p ON p.id = c.property_id
+                WHERE l.bucket IN ({', '.join('?' * len(buckets))}) AND l.property_id != ?
+            ''', buckets + [prop['id']]).fetchall()
+            clusters = {
+                row['cluster_id'] for row in rows
+                if is_duplicate(prop, dict(row), signature, unpack_signature(row['signature']))
+            }
             
-            cursor.execute('''
-                INSERT INTO properties 
-                (id, source, url, title, location, price, price_per_sqm, surface,
-                 rooms, bedrooms, bathrooms, floor, building_year, property_type,
-                 description, dpe, dpe_value, ges, ges_value, images,
-                 contact_name, contact_phone, contact_email, posted_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
-                        ?, ?, ?, ?)
-            ''', (
-                property_data.get('id'),
-                property_data.get('source'),
-                property_data.get('url'),
-                property_data.get('title'),
-                property_data.get('location'),
-                property_data.get('price'),
-                property_data.get('price_per_sqm'),
-                property_data.get('surface'),
-                property_data.get('rooms'),
-                property_data.get('bedrooms'),
-                property_data.get('bathrooms'),
-                property_data.get('floor'),
-                property_data.get('building_year'),
-                property_data.get('property_type'),
-                property_data.get('description'),
-                property_data.get('dpe'),
-                DPE_MAPPING.get(property_data.get('dpe'), 6),
-                property_data.get('ges'),
-                property_data.get('ges_value'),
-                images,
-                property_data.get('contact_name'),
-                property_data.get('contact_phone'),
-                property_data.get('contact_email'),
-                property_data.get('posted_date')
-            ))
-            conn.commit()
-            return cursor.lastrowid
-        except sqlite3.Error as e:
-            logger.error(f"Erreur lors de l'ajout de la propriété: {e}")
-            conn.rollback()
-            return None
-        finally:
-            conn.close()
+            cluster_id = min(clusters) if clusters else prop['id']
+            if len(clusters) > 1:
+                others = sorted(clusters - {cluster_id})
+                conn.execute(
+                    f"UPDATE listing_clusters SET cluster_id = ? WHERE cluster_id IN ({', '.join('?' * len(others))})",
+                    [cluster_id] + others
+                )
+            matched += bool(clusters)
+            conn.execute('''
+                INSERT OR REPLACE INTO listing_clusters (property_id, cluster_id, signature)
+                VALUES (?, ?, ?)
+            ''', (prop['id'], cluster_id, pack_signature(signature)))
+            conn.executemany('INSERT OR IGNORE INTO listing_lsh (bucket, property_id) VALUES (?, ?)',
+                             [(bucket, prop['id']) for bucket in buckets])
+        return matched
     
-    def get_properties(self, filters=None):
-        """Récupérer les annonces filtrées"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def cluster_unclustered(self, batch_size=1000):
+        """Grouper les annonces pas encore passées par la détection de doublons
+        
+        Returns:
+            nombre d'annonces rattachées à un groupe existant
+        """
+        matched = 0
+        while True:
+            with self.connection() as conn:
+                try:
+                    rows = conn.execute('''
+                        SELECT p.id, p.title, p.location, p.price, p.surface, p.rooms
+                        FROM properties p LEFT JOIN listing_clusters c ON c.property_id = p.id
+                        WHERE c.property_id IS NULL ORDER BY p.rowid LIMIT ?
+                    ''', (batch_size,)).fetchall()
+                    if not rows:
+                        return matched
+                    matched += self._cluster_listings(conn, [dict(row) for row in rows])
+                    conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Erreur lors du regroupement des doublons: {e}")
+                    conn.rollback()
+                    raise
+    
+    def cleanup_duplicates(self):
+        """Supprimer les doublons exacts (même URL) et regrouper les doublons entre sources
+        
+        Les annonces d'un même bien sur plusieurs sites sont conservées et
+        regroupées dans listing_clusters (filtre `unique` pour n'en afficher qu'une).
+        
+        Returns:
+            nombre d'annonces supprimées
+        """
+        with self.connection() as conn:
+            try:
+                removed = conn.execute('''
+                    DELETE FROM properties
+                    WHERE rowid NOT IN (SELECT MIN(rowid) FROM properties GROUP BY url)
+                ''').rowcount
+                if removed:
+                    conn.execute('DELETE FROM listing_lsh WHERE property_id NOT IN (SELECT id FROM properties)')
+                    conn.execute('DELETE FROM listing_clusters WHERE property_id NOT IN (SELECT id FROM properties)')
+                    # Groupes dont l'annonce de référence a été supprimée
+                    conn.execute('''
+                        UPDATE listing_clusters SET cluster_id = (
+                            SELECT MIN(other.property_id) FROM listing_clusters other
+                            WHERE other.cluster_id = listing_clusters.cluster_id
+                        )
+                        WHERE cluster_id NOT IN (SELECT id FROM properties)
+                    ''')
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de la suppression des doublons: {e}")
+                conn.rollback()
+                raise
+        
+        self.cluster_unclustered()
+        self.pool.bump_generation()
+        logger.info(f"Nettoyage des doublons: {removed} supprimé(s)")
+        return removed
+    
+    def get_duplicates(self, property_id):
+        """Autres annonces du même bien (même groupe de doublons)"""
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT p.* FROM listing_clusters c
+                JOIN listing_clusters other ON other.cluster_id = c.cluster_id
+                JOIN properties p ON p.id = other.property_id
+                WHERE c.property_id = ? AND other.property_id != ?
+                ORDER BY p.price
+            ''', (property_id, property_id)).fetchall()
+    
+    def duplicate_stats(self):
+        """Nombre de groupes de doublons et d'annonces en double"""
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT COUNT(*) AS clusters, COALESCE(SUM(n - 1), 0) AS duplicates FROM (
+                    SELECT COUNT(*) AS n FROM listing_clusters GROUP BY cluster_id HAVING n > 1
+                )
+            ''').fetchone()
+        return {'clusters': row['clusters'], 'duplicates': row['duplicates']}
+    
+    def _existing_prices(self, conn, property_ids):
+        """Prix actuels des annonces déjà en base, par id"""
+        existing = {}
+        for i in range(0, len(property_ids), SQL_BATCH_SIZE):
+            chunk = property_ids[i:i + SQL_BATCH_SIZE]
+            rows = conn.execute(
+                f"SELECT id, price FROM properties WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            existing.update((row['id'], row['price']) for row in rows)
+        return existing
+    
+    def _known_urls(self):
+        """Ensemble des URL connues, rattrapé depuis la base si nécessaire"""
+        urls = self.pool.urls
+        if urls.due():
+            with self.connection() as conn:
+                urls.sync(conn)
+        return urls
+    
+    def existing_urls(self, urls):
+        """Sous-ensemble des URL déjà présentes en base (sans requête SQL)"""
+        known = self._known_urls()
+        return {url for url in urls if url in known}
+    
+    def _load_references(self, conn):
+        """Prix de référence par commune en mémoire, rechargés si nécessaire"""
+        references = self.pool.references
+        if references.due():
+            references.load(conn)
+        return references
+    
+    def deal_reference(self, location, property_type=None):
+        """Référence de prix/m² de la commune (médiane, q1, q3, sample_size) ou None"""
+        with self.connection() as conn:
+            return self._load_references(conn).lookup(location, property_type)
+    
+    def get_commune_references(self):
+        """Contenu de la table commune_reference, par commune"""
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT * FROM commune_reference ORDER BY commune, property_type
+            ''').fetchall()
+    
+    def refresh_commune_reference(self, window_days=None, rescore=True):
+        """Recalculer les prix de référence au m² par commune et type de bien
+        
+        Médiane et quartiles des annonces ajoutées dans la fenêtre glissante
+        (toutes sources; une annonce par groupe de doublons) et des ventes
+        importées dans dvf_transactions (logements vendus seuls dans leur
+        mutation, fenêtre dvf_window_days). Les communes de PRIX_PAR_M2 sans
+        données suffisantes gardent une référence estimée. Les deal_score des
+        annonces sont ensuite recalculés.
+        
+        Returns:
+            dict: references (lignes écrites), computed (issues des données), rescored
+        """
+        window_days = window_days or REFERENCE_CONFIG.get('window_days', 365)
+        dvf_window_days = REFERENCE_CONFIG.get('dvf_window_days', 730)
+        residential_types = DVF_IMPORT_CONFIG.get('residential_types', ('Appartement', 'Maison'))
+        unique_clauses, params = self._filter_clauses({'unique': True})
+        with self.connection() as conn:
+            listings = conn.cursor()
+            listings.row_factory = None
+            listings.execute(f'''
+                SELECT location, property_type, price, surface FROM properties
+                WHERE price > 0 AND surface > 0 AND created_at >= datetime('now', ?)
+                AND {' AND '.join(unique_clauses)}
+            ''', [f'-{int(window_days)} days'] + params)
+            # Une mutation DVF de plusieurs locaux n'a qu'une valeur globale: écartée
+            transactions = conn.cursor()
+            transactions.row_factory = None
+            transactions.execute(f'''
+                SELECT t.commune, t.type_local, t.valeur_fonciere, t.surface_reelle_bati
+                FROM dvf_transactions t
+                WHERE t.date_mutation >= date('now', ?) AND t.nature_mutation = 'Vente'
+                AND t.valeur_fonciere > 0 AND t.surface_reelle_bati > 0
+                AND t.type_local IN ({', '.join('?' * len(residential_types))})
+                AND NOT EXISTS (SELECT 1 FROM dvf_transactions o
+                                WHERE o.mutation_id = t.mutation_id AND o.source_file = t.source_file
+                                AND o.id != t.id)
+            ''', [f'-{int(dvf_window_days)} days'] + list(residential_types))
+            computed = compute_references(itertools.chain(listings, transactions))
+            references = {(ref['commune'], ref['property_type']): ref for ref in seed_references()}
+            references.update(((ref['commune'], ref['property_type']), ref) for ref in computed)
+            
+            try:
+                if not conn.in_transaction:
+                    conn.execute('BEGIN IMMEDIATE')
+                conn.execute('DELETE FROM commune_reference')
+                conn.executemany('''
+                    INSERT INTO commune_reference
+                        (commune, property_type, median_price_per_sqm, q1, q3, sample_size)
+                    VALUES (:commune, :property_type, :median_price_per_sqm, :q1, :q3, :sample_size)
+                ''', list(references.values()))
+                self.pool.references.load(conn)
+                rescored = self._rescore_deals(conn) if rescore else 0
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors du calcul des prix de référence: {e}")
+                conn.rollback()
+                self.pool.references.reset()
+                raise
+        
+        if rescored:
+            self.pool.bump_generation()
+        logger.info(f"Prix de référence: {len(references)} ligne(s) dont {len(computed)} calculée(s), "
+                    f"{rescored} annonce(s) renotée(s)")
+        return {'references': len(references), 'computed': len(computed), 'rescored': rescored}
+    
+    def _rescore_deals(self, conn):
+        """Recalculer deal_score avec les références en mémoire (lignes modifiées seulement)"""
+        references = self.pool.references
+        updates = []
+        rows = conn.execute('SELECT id, location, property_type, price, surface, deal_score FROM properties')
+        for row in rows:
+            score = references.score(dict(row))
+            if score != row['deal_score']:
+                updates.append((score, row['id']))
+        conn.executemany('UPDATE properties SET deal_score = ? WHERE id = ?', updates)
+        return len(updates)
+    
+    def _load_locations(self, conn):
+        """Table locations en mémoire, chargée si nécessaire"""
+        locations = self.pool.locations
+        if locations.due():
+            locations.load(conn)
+        return locations
+    
+    def _resolve_locations(self, conn, properties):
+        """Créer dans locations les communes inconnues des annonces (dans la transaction en cours)"""
+        locations = self._load_locations(conn)
+        for prop in properties:
+            if locations.lookup(prop) is not None:
+                continue
+            location = new_location(prop)
+            if location is None:
+                continue
+            latitude, longitude = self.pool.centroids.lookup(prop.get('location')) or (None, None)
+            conn.execute('''
+                INSERT OR IGNORE INTO locations
+                    (commune, commune_key, insee_code, postal_code, department, latitude, longitude)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (location['commune'], location['commune_key'], location['insee_code'],
+                  location['postal_code'], location['department'], latitude, longitude))
+            # Ligne éventuellement créée entre-temps par un autre processus
+            location_id = conn.execute(
+                'SELECT id FROM locations WHERE commune_key = ? AND department = ?',
+                (location['commune_key'], location['department'])
+            ).fetchone()[0]
+            locations.add(location_id, location)
+        return locations
+    
+    def assign_locations(self):
+        """Rattacher à locations les annonces qui ne le sont pas encore
+        
+        Appliqué une fois par init_database (migration de données); les
+        annonces sans localisation reconnue restent sans location_id.
+        
+        Returns:
+            nombre d'annonces rattachées
+        """
+        with self.connection() as conn:
+            rows = [dict(row) for row in conn.execute(
+                'SELECT rowid, location, department FROM properties WHERE location_id IS NULL'
+            )]
+            if not rows:
+                return 0
+            try:
+                self._load_centroids(conn)
+                locations = self._resolve_locations(conn, rows)
+                updates = [(locations.lookup(row), row['rowid']) for row in rows]
+                updates = [update for update in updates if update[0] is not None]
+                conn.executemany('UPDATE properties SET location_id = ? WHERE rowid = ?', updates)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors du rattachement des localisations: {e}")
+                conn.rollback()
+                self.pool.locations.reset()
+                raise
+        if updates:
+            self.pool.bump_generation()
+            logger.info(f"{len(updates)} annonce(s) rattachée(s) à la table locations")
+        return len(updates)
+    
+    def get_locations(self, department=None):
+        """Localisations connues avec leur nombre d'annonces, par département et commune"""
+        where_clause, params = '', []
+        if department:
+            where_clause, params = ' WHERE l.department = ?', [department_code(department) or department]
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT l.*, COUNT(p.id) AS n_properties
+                FROM locations l LEFT JOIN properties p ON p.location_id = l.id{where_clause}
+                GROUP BY l.id
+                ORDER BY l.department, l.commune
+            ''', params).fetchall()
+        return [dict(row, department_name=DEPARTMENT_NAMES.get(row['department'])) for row in rows]
+    
+    def _complete_locations(self, conn):
+        """Compléter code INSEE et code postal des localisations depuis dvf_transactions"""
+        codes = {}
+        for department, commune, insee_code, postal_code, n in conn.execute('''
+            SELECT code_departement, commune, code_commune, code_postal, COUNT(*)
+            FROM dvf_transactions
+            GROUP BY code_departement, commune, code_commune, code_postal
+        '''):
+            key = (commune_key(commune), department)
+            # Codes les plus fréquents de la commune
+            if key[0] and n > codes.get(key, (None, None, 0))[2]:
+                codes[key] = (insee_code, postal_code, n)
+        conn.executemany('''
+            UPDATE locations SET
+                insee_code = COALESCE(insee_code, ?),
+                postal_code = COALESCE(postal_code, ?)
+            WHERE commune_key = ? AND department = ?
+        ''', [(insee_code, postal_code, key, department)
+              for (key, department), (insee_code, postal_code, _) in codes.items()])
+    
+    def _geocode_locations(self, conn, centroids):
+        """Placer au centroïde de leur code postal / commune les localisations sans coordonnées"""
+        updates = []
+        for row in conn.execute('SELECT id, commune, postal_code FROM locations WHERE latitude IS NULL'):
+            centroid = centroids.lookup(f"{row['commune']} {row['postal_code'] or ''}")
+            if centroid:
+                updates.append(centroid + (row['id'],))
+        conn.executemany('UPDATE locations SET latitude = ?, longitude = ? WHERE id = ?', updates)
+    
+    def _load_centroids(self, conn):
+        """Centroïdes des communes en mémoire, rechargés si nécessaire"""
+        centroids = self.pool.centroids
+        if centroids.due():
+            centroids.load(conn)
+        return centroids
+    
+    def import_commune_centroids(self, centroids, source='import'):
+        """Enregistrer des centroïdes (fichier officiel, voir geo.read_centroids) puis géolocaliser
+        
+        Args:
+            centroids: tuples (kind, key, latitude, longitude)
+        
+        Returns:
+            nombre d'annonces géolocalisées
+        """
+        with self.connection() as conn:
+            try:
+                conn.executemany('''
+                    INSERT INTO commune_centroids (kind, key, latitude, longitude, source)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(kind, key) DO UPDATE SET
+                        latitude = excluded.latitude,
+                        longitude = excluded.longitude,
+                        source = excluded.source,
+                        updated_at = CURRENT_TIMESTAMP
+                ''', [tuple(centroid) + (source,) for centroid in centroids])
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de l'import des centroïdes: {e}")
+                conn.rollback()
+                raise
+        return self.geocode_properties()
+    
+    def refresh_commune_centroids(self):
+        """Centroïdes moyens des transactions DVF géolocalisées, par code postal et par commune
+        
+        Les centroïdes importés d'un fichier officiel sont conservés.
+        
+        Returns:
+            nombre d'annonces géolocalisées
+        """
+        sums = {}
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT code_postal, commune, SUM(latitude), SUM(longitude), COUNT(*)
+                FROM dvf_transactions
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+                GROUP BY code_postal, commune
+            ''').fetchall()
+            for code_postal, commune, lat, lon, n in rows:
+                for key in (('postal', code_postal), ('commune', commune_key(commune))):
+                    if key[1]:
+                        total = sums.setdefault(key, [0.0, 0.0, 0])
+                        total[0] += lat
+                        total[1] += lon
+                        total[2] += n
+            try:
+                conn.executemany('''
+                    INSERT INTO commune_centroids (kind, key, latitude, longitude, source)
+                    VALUES (?, ?, ?, ?, 'dvf')
+                    ON CONFLICT(kind, key) DO UPDATE SET
+                        latitude = excluded.latitude,
+                        longitude = excluded.longitude,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE commune_centroids.source = 'dvf'
+                ''', [(kind, key, lat / n, lon / n) for (kind, key), (lat, lon, n) in sums.items()])
+                self._complete_locations(conn)
+                conn.commit()
+                self.pool.locations.reset()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors du calcul des centroïdes: {e}")
+                conn.rollback()
+                raise
+        return self.geocode_properties()
+    
+    def geocode_properties(self):
+        """Placer au centroïde de leur code postal / commune les annonces (et localisations) sans coordonnées
+        
+        Returns:
+            nombre d'annonces géolocalisées
+        """
+        with self.connection() as conn:
+            centroids = self.pool.centroids
+            centroids.load(conn)
+            updates = []
+            for row in conn.execute('SELECT rowid, location FROM properties WHERE latitude IS NULL'):
+                centroid = centroids.lookup(row['location'])
+                if centroid:
+                    updates.append(centroid + (row['rowid'],))
+            try:
+                conn.executemany('UPDATE properties SET latitude = ?, longitude = ? WHERE rowid = ?', updates)
+                self._geocode_locations(conn, centroids)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de la géolocalisation des annonces: {e}")
+                conn.rollback()
+                raise
+        if updates:
+            self.pool.bump_generation()
+            logger.info(f"{len(updates)} annonce(s) géolocalisée(s)")
+        return len(updates)
+    
+    def get_scrape_states(self):
+        """Points de reprise du scraping incrémental, par (source, zone)"""
+        with self.connection() as conn:
+            rows = conn.execute('SELECT * FROM scrape_state').fetchall()
+        return {(row['source'], row['zone']): dict(row) for row in rows}
+    
+    def get_last_scrape_run(self):
+        """Fin du dernier run enregistré (UTC, tous processus confondus) ou None"""
+        with self.connection() as conn:
+            return conn.execute('SELECT MAX(last_run_at) FROM scrape_state').fetchone()[0]
+    
+    def save_scrape_states(self, states):
+        """Enregistrer les points de reprise d'un run terminé
+        
+        Args:
+            states: dict (source, zone) -> {'last_listing_id', 'last_posted_date', 'full'};
+                    un point de reprise ne recule jamais, 'full' (zone parcourue
+                    entièrement) met aussi à jour last_full_run_at
+        """
+        rows = [
+            (source, zone, state.get('last_listing_id'), state.get('last_posted_date'),
+             1 if state.get('full') else 0)
+            for (source, zone), state in states.items()
+        ]
+        if not rows:
+            return
+        with self.connection() as conn:
+            try:
+                conn.executemany('''
+                    INSERT INTO scrape_state
+                        (source, zone, last_listing_id, last_posted_date, last_run_at, last_full_run_at)
+                    VALUES (?1, ?2, ?3, ?4, CURRENT_TIMESTAMP, CASE WHEN ?5 THEN CURRENT_TIMESTAMP END)
+                    ON CONFLICT(source, zone) DO UPDATE SET
+                        last_listing_id = CASE
+                            WHEN excluded.last_posted_date >= COALESCE(scrape_state.last_posted_date, '')
+                            THEN excluded.last_listing_id ELSE scrape_state.last_listing_id END,
+                        last_posted_date = NULLIF(MAX(COALESCE(excluded.last_posted_date, ''),
+                                                      COALESCE(scrape_state.last_posted_date, '')), ''),
+                        last_run_at = CURRENT_TIMESTAMP,
+                        last_full_run_at = COALESCE(excluded.last_full_run_at, scrape_state.last_full_run_at)
+                ''', rows)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de l'enregistrement des points de reprise: {e}")
+                conn.rollback()
+                raise
+    
+    def get_dvf_import_state(self, source_file):
+        """Point de reprise de l'import d'un fichier DVF (dict) ou None"""
+        with self.connection() as conn:
+            row = conn.execute('SELECT * FROM dvf_import_state WHERE source_file = ?',
+                               (source_file,)).fetchone()
+        return dict(row) if row else None
+    
+    def reset_dvf_import(self, source_file, file_size):
+        """Oublier un import DVF (transactions et point de reprise) pour le reprendre au début"""
+        with self.connection() as conn:
+            try:
+                conn.execute('DELETE FROM dvf_transactions WHERE source_file = ?', (source_file,))
+                conn.execute('''
+                    INSERT OR REPLACE INTO dvf_import_state (source_file, file_size)
+                    VALUES (?, ?)
+                ''', (source_file, file_size))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de la réinitialisation de l'import DVF: {e}")
+                conn.rollback()
+                raise
+    
+    def add_dvf_chunk(self, source_file, rows, byte_offset, rows_read, completed=False):
+        """Insérer un bloc de transactions DVF et avancer le point de reprise
+        
+        Les deux écritures sont faites dans la même transaction: une reprise
+        après interruption repart exactement après le dernier bloc enregistré.
         
-        query = 'SELECT * FROM properties WHERE 1=1'
+        Args:
+            rows: tuples dans l'ordre de DVF_COLUMNS
+            byte_offset: position (octets, fichier décompressé) après le bloc
+            rows_read: lignes lues dans le bloc (retenues ou non)
+        """
+        with self.connection() as conn:
+            try:
+                conn.executemany(f'''
+                    INSERT INTO dvf_transactions ({', '.join(DVF_COLUMNS)})
+                    VALUES ({', '.join('?' * len(DVF_COLUMNS))})
+                ''', rows)
+                conn.execute('''
+                    UPDATE dvf_import_state SET
+                        byte_offset = ?,
+                        rows_read = rows_read + ?,
+                        rows_imported = rows_imported + ?,
+                        completed = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE source_file = ?
+                ''', (byte_offset, rows_read, len(rows), 1 if completed else 0, source_file))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de l'insertion des transactions DVF: {e}")
+                conn.rollback()
+                raise
+    
+    def _filter_clauses(self, filters):
+        """Construire les conditions WHERE et leurs paramètres depuis un dict de filtres"""
+        clauses = []
         params = []
         
         if filters:
             if filters.get('price_min'):
-                query += ' AND price >= ?'
+                clauses.append('price >= ?')
                 params.append(filters['price_min'])
             if filters.get('price_max'):
-                query += ' AND price <= ?'
+                clauses.append('price <= ?')
                 params.append(filters['price_max'])
             if filters.get('dpe_max'):
                 dpe_value = DPE_MAPPING[filters['dpe_max']]
-                query += ' AND dpe_value <= ?'
+                clauses.append('dpe_value <= ?')
                 params.append(dpe_value)
             if filters.get('location'):
-                query += ' AND location LIKE ?'
-                params.append(f"%{filters['location']}%")
+                location_query = fts_query(filters['location'], 'location') if self.fts_enabled else None
+                if location_query:
+                    clauses.append('rowid IN (SELECT rowid FROM properties_fts WHERE properties_fts MATCH ?)')
+                    params.append(location_query)
+                else:
+                    clauses.append('location LIKE ?')
+                    params.append(f"%{filters['location']}%")
+            if filters.get('department'):
+                departments = filters['department']
+                if isinstance(departments, str):
+                    departments = [departments]
+                codes = [department_code(value) or value for value in departments]
+                clauses.append(f"location_id IN (SELECT id FROM locations "
+                               f"WHERE department IN ({', '.join('?' * len(codes))}))")
+                params += codes
+            if filters.get('commune'):
+                clauses.append('location_id IN (SELECT id FROM locations WHERE commune_key = ?)')
+                params.append(commune_key(filters['commune']))
+            if filters.get('location_id'):
+                clauses.append('location_id = ?')
+                params.append(filters['location_id'])
+            if filters.get('q'):
+                self._text_clauses(filters['q'], clauses, params)
+            if filters.get('unique'):
+                # Une ligne par bien: masquer les annonces hors référence de leur groupe
+                clauses.append('NOT EXISTS (SELECT 1 FROM listing_clusters c '
+                               'WHERE c.property_id = properties.id AND c.cluster_id != c.property_id)')
+            if filters.get('bbox'):
+                self._bbox_clauses('properties_rtree', 'rowid', filters['bbox'], clauses, params)
+            if filters.get('near'):
+                lat, lon, radius_m = filters['near']
+                self._bbox_clauses('properties_rtree', 'rowid', bbox_around(lat, lon, radius_m), clauses, params)
+                clauses.append('geo_distance(latitude, longitude, ?, ?) <= ?')
+                params += [lat, lon, radius_m]
+            if filters.get('deal_min') is not None:
+                clauses.append('deal_score >= ?')
+                params.append(filters['deal_min'])
             if filters.get('status'):
-                query += ' AND status = ?'
+                clauses.append('status = ?')
                 params.append(filters['status'])
         
-        query += ' ORDER BY created_at DESC'
-        cursor.execute(query, params)
-        return cursor.fetchall()
+        return clauses, params
+    
+    def _bbox_clauses(self, rtree, key, bbox, clauses, params):
+        """Lignes dont le point est dans le rectangle (south, west, north, east)"""
+        south, west, north, east = bbox
+        if self.rtree_enabled:
+            clauses.append(f'{key} IN (SELECT id FROM {rtree} '
+                           f'WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?)')
+            params += [south, north, west, east]
+        # Bornes exactes: l'index R*Tree stocke des coordonnées arrondies (float32)
+        clauses.append('latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?')
+        params += [south, north, west, east]
+    
+    def _text_clauses(self, text, clauses, params):
+        """Recherche plein texte (titre, description, localisation)"""
+        query = fts_query(text)
+        if query is None:
+            return
+        if self.fts_enabled:
+            clauses.append('rowid IN (SELECT rowid FROM properties_fts WHERE properties_fts MATCH ?)')
+            params.append(query)
+            return
+        # Repli sans FTS5: chaque mot dans l'une des colonnes
+        for word in re.findall(r'\w+', text):
+            clauses.append('(' + ' OR '.join(f'{col} LIKE ?' for col in FTS_COLUMNS) + ')')
+            params += [f'%{word}%'] * len(FTS_COLUMNS)
+    
+    def _where(self, filters):
+        """Clause WHERE complète (ou chaîne vide) et ses paramètres"""
+        clauses, params = self._filter_clauses(filters)
+        where_clause = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        return where_clause, params
+    
+    def get_properties(self, filters=None, sort=None, limit=None, offset=0):
+        """Récupérer les annonces filtrées
+        
+        Args:
+            filters: dict (price_min, price_max, dpe_max, location, status)
+            sort: clé de SORT_ORDERS (date_desc, date_asc, price_desc, price_asc, deal_desc);
+                  par défaut les plus récemment ajoutées d'abord
+            limit: nombre maximal de lignes (toutes si None)
+            offset: nombre de lignes à sauter
+        """
+        where_clause, params = self._where(filters)
+        order_by = SORT_ORDERS.get(sort, DEFAULT_SORT_ORDER)
+        query = f'SELECT * FROM properties{where_clause} ORDER BY {order_by}'
+        
+        if limit is not None:
+            query += ' LIMIT ? OFFSET ?'
+            params += [limit, offset or 0]
+        
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchall()
+    
+    def get_properties_page(self, filters=None, sort='date_desc', cursor=None, limit=50):
+        """Récupérer une page d'annonces par pagination keyset
+        
+        Le coût d'une page ne dépend pas de sa profondeur: la page suivante
+        reprend après le dernier (colonne de tri, id) vu, via l'index composite.
+        
+        Args:
+            filters: dict (mêmes clés que get_properties)
+            sort: clé de KEYSET_ORDERS (date = created_at, price)
+            cursor: valeur next_cursor renvoyée par la page précédente
+            limit: taille de page
+        
+        Returns:
+            (liste de lignes, next_cursor ou None si dernière page)
+        
+        Raises:
+            ValueError: curseur invalide
+        """
+        if sort not in KEYSET_ORDERS:
+            sort = 'date_desc'
+        column, direction = KEYSET_ORDERS[sort]
+        clauses, params = self._filter_clauses(filters)
+        
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort)
+            operator = '<' if direction == 'DESC' else '>'
+            clauses.append(f'({column}, id) {operator} (?, ?)')
+            params += [value, last_id]
+        
+        where_clause = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        query = (f'SELECT * FROM properties{where_clause} '
+                 f'ORDER BY {column} {direction}, id {direction} LIMIT ?')
+        params.append(limit + 1)
+        
+        with self.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(sort, last[column], last['id'])
+        return rows, next_cursor
+    
+    def search_properties(self, text, filters=None, limit=50, offset=0):
+        """Recherche plein texte classée par pertinence (BM25)
+        
+        Args:
+            text: saisie libre; chaque mot est cherché en préfixe, sans accents
+            filters: dict (mêmes clés que get_properties)
+        
+        Returns:
+            lignes de properties avec une colonne `score` (plus bas = plus pertinent)
+        """
+        query = fts_query(text)
+        if query is None or not self.fts_enabled:
+            rows = self.get_properties(dict(filters or {}, q=text), limit=limit, offset=offset)
+            return [dict(row, score=None) for row in rows]
+        
+        clauses, params = self._filter_clauses(filters)
+        where_clause = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        sql = f'''
+            SELECT properties.*, matches.score FROM (
+                SELECT rowid AS match_rowid, bm25(properties_fts, {weights}) AS score
+                FROM properties_fts WHERE properties_fts MATCH ?
+            ) AS matches
+            JOIN properties ON properties.rowid = matches.match_rowid{where_clause}
+            ORDER BY matches.score, properties.id LIMIT ? OFFSET ?
+        '''
+        with self.connection() as conn:
+            return conn.execute(sql, [query] + params + [limit, offset or 0]).fetchall()
+    
+    def properties_near(self, lat, lon, radius_m, filters=None, limit=50, offset=0):
+        """Annonces à moins de radius_m mètres d'un point, de la plus proche à la plus lointaine
+        
+        Args:
+            filters: dict (mêmes clés que get_properties)
+        
+        Returns:
+            lignes de properties avec une colonne `distance_m`
+        """
+        clauses, params = self._filter_clauses(dict(filters or {}, near=(lat, lon, radius_m)))
+        sql = f'''
+            SELECT *, geo_distance(latitude, longitude, ?, ?) AS distance_m FROM properties
+            WHERE {' AND '.join(clauses)}
+            ORDER BY distance_m, id LIMIT ? OFFSET ?
+        '''
+        with self.connection() as conn:
+            return conn.execute(sql, [lat, lon] + params + [limit, offset or 0]).fetchall()
+    
+    def get_dvf_transactions(self, near=None, bbox=None, limit=100):
+        """Transactions DVF dans un rayon ou un rectangle
+        
+        Args:
+            near: (lat, lon, radius_m): les plus proches d'abord (colonne distance_m)
+            bbox: (south, west, north, east): les plus récentes d'abord
+        """
+        clauses, params = [], []
+        if near:
+            lat, lon, radius_m = near
+            self._bbox_clauses('dvf_rtree', 'id', bbox_around(lat, lon, radius_m), clauses, params)
+            clauses.append('geo_distance(latitude, longitude, ?, ?) <= ?')
+            params += [lat, lon, radius_m]
+            columns, order_by = 'geo_distance(latitude, longitude, ?, ?) AS distance_m', 'distance_m, id'
+            params = [lat, lon] + params
+        elif bbox:
+            self._bbox_clauses('dvf_rtree', 'id', bbox, clauses, params)
+            columns, order_by = 'NULL AS distance_m', 'date_mutation DESC, id DESC'
+        else:
+            raise ValueError("near ou bbox requis")
+        sql = f'''
+            SELECT *, {columns} FROM dvf_transactions
+            WHERE {' AND '.join(clauses)}
+            ORDER BY {order_by} LIMIT ?
+        '''
+        with self.connection() as conn:
+            return conn.execute(sql, params + [limit]).fetchall()
+    
+    def count_properties(self, filters=None):
+        """Compter les annonces correspondant aux filtres"""
+        where_clause, params = self._where(filters)
+        with self.connection() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM properties{where_clause}', params).fetchone()[0]
+    
+    def get_property(self, property_id):
+        """Récupérer une annonce par son identifiant"""
+        with self.connection() as conn:
+            return conn.execute('SELECT * FROM properties WHERE id = ?', (property_id,)).fetchone()
+    
+    def get_price_history(self, property_id):
+        """Changements de prix d'une annonce, du plus ancien au plus récent"""
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT old_price, new_price, changed_at FROM property_history
+                WHERE property_id = ? AND new_price IS NOT NULL
+                ORDER BY changed_at, id
+            ''', (property_id,)).fetchall()
     
     def update_property_status(self, property_id, status, notes=None):
         """Mettre à jour le statut d'une annonce"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                UPDATE properties 
-                SET status = ?, updated_at = CURRENT_TIMESTAMP, notes = ?
-                WHERE id = ?
-            ''', (status, notes, property_id))
-            
-            # Enregistrer dans l'historique
-            cursor.execute('''
-                INSERT INTO property_history (property_id, status_change, changed_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            ''', (property_id, status))
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Erreur lors de la mise à jour du statut: {e}")
-            conn.rollback()
-            return False
-        finally:
-            conn.close()
+            try:
+                cursor.execute('''
+                    UPDATE properties 
+                    SET status = ?, updated_at = CURRENT_TIMESTAMP, notes = ?
+                    WHERE id = ?
+                ''', (status, notes, property_id))
+                
+                # Enregistrer dans l'historique
+                cursor.execute('''
+                    INSERT INTO property_history (property_id, status_change, changed_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                ''', (property_id, status))
+                
+                conn.commit()
+                self.pool.bump_generation()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de la mise à jour du statut: {e}")
+                conn.rollback()
+                return False
     
     def mark_as_favorite(self, property_id, is_favorite=True):
         """Marquer une annonce comme favorite"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('''
+                    UPDATE properties 
+                    SET is_favorite = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (is_favorite, property_id))
+                conn.commit()
+                self.pool.bump_generation()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors de la mise à jour favorite: {e}")
+                conn.rollback()
+                return False
+    
+    def get_properties_after(self, rowid, limit=100):
+        """Annonces insérées après `rowid` (tous processus), par ordre d'insertion
         
-        try:
-            cursor.execute('''
-                UPDATE properties 
-                SET is_favorite = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (is_favorite, property_id))
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Erreur lors de la mise à jour favorite: {e}")
-            conn.rollback()
-            return False
-        finally:
-            conn.close()
+        Returns:
+            (dernier rowid vu, liste de dicts); une mise à jour (upsert) garde
+            son rowid et n'est donc pas renvoyée comme nouvelle
+        """
+        with self.connection() as conn:
+            rows = conn.execute(
+                'SELECT rowid AS _rowid, * FROM properties WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                (rowid, limit)
+            ).fetchall()
+        if not rows:
+            return rowid, []
+        return rows[-1]['_rowid'], [dict(row) for row in rows]
+    
+    def get_last_property_rowid(self):
+        """Dernier rowid de la table properties (0 si vide)"""
+        with self.connection() as conn:
+            return conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM properties').fetchone()[0]
     
     def get_new_properties(self, hours=2, filters=None):
         """Récupérer les annonces récentes"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+        clauses, params = self._filter_clauses(filters)
         query = "SELECT * FROM properties WHERE created_at >= datetime('now', '-' || ? || ' hours')"
-        params = [hours]
+        query += ''.join(f' AND {clause}' for clause in clauses)
+        params = [hours] + params
+        query += ' ORDER BY created_at DESC'
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchall()
+    
+    def property_exists(self, url):
+        """Vérifier si une annonce existe déjà (ensemble en mémoire des URL)"""
+        return url in self._known_urls()
+    
+    def compute_statistics(self, filters=None, since_hours=None, date_range=None):
+        """Calculer toutes les statistiques agrégées en un seul parcours
         
-        if filters:
-            if filters.get('price_min'):
-                query += ' AND price >= ?'
-                params.append(filters['price_min'])
-            if filters.get('price_max'):
-                query += ' AND price <= ?'
-                params.append(filters['price_max'])
-            if filters.get('dpe_max'):
-                dpe_value = DPE_MAPPING[filters['dpe_max']]
-                query += ' AND dpe_value <= ?'
-                params.append(dpe_value)
+        Une seule requête GROUP BY (source, status) renvoie, pour chaque
+        groupe, les comptes, sommes, min et max; les totaux globaux et les
+        répartitions par source / statut sont reconstitués à partir de ces
+        quelques groupes.
         
-        query += ' ORDER BY created_at DESC'
-        cursor.execute(query, params)
+        Args:
+            filters: dict (mêmes clés que get_properties)
+            since_hours: ne garder que les annonces créées depuis N heures
+            date_range: tuple (début, fin) sur created_at
         
-        return cursor.fetchall()
+        Returns:
+            dict: total_properties, by_source, by_status, avg_price, min_price,
+            max_price, avg_surface, avg_rooms (None si aucune valeur)
+        """
+        where_clause, params = self._stat_where(filters, since_hours, date_range)
+        with self.connection() as conn:
+            groups = self._stat_groups(conn, where_clause, params)
+        return self._merge_stat_groups(groups)
     
-    def property_exists(self, url):
-        """Vérifier si une annonce existe déjà"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def listing_columns(self, columns, filters=None, since_hours=None, date_range=None):
+        """Valeurs brutes de quelques colonnes, en une requête (analytics.ListingArrays)
         
-        cursor.execute('SELECT id FROM properties WHERE url = ?', (url,))
-        return cursor.fetchone() is not None
+        Returns:
+            liste de tuples, dans l'ordre de `columns`
+        """
+        unknown = set(columns) - set(PROPERTY_COLUMNS) - {'status', 'created_at', 'updated_at'}
+        if unknown:
+            raise ValueError(f"Colonnes inconnues: {sorted(unknown)}")
+        where_clause, params = self._stat_where(filters, since_hours, date_range)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # tuples: bien plus rapide que sqlite3.Row sur des millions de lignes
+            return cursor.execute(f"SELECT {', '.join(columns)} FROM properties{where_clause}", params).fetchall()
     
-    def get_statistics(self, filters=None):
-        """Récupérer les statistiques de la base de données"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def _stat_where(self, filters=None, since_hours=None, date_range=None):
+        """Clause WHERE des statistiques: filtres + fenêtre sur created_at"""
+        clauses, params = self._filter_clauses(filters)
+        if since_hours is not None:
+            clauses.append("created_at >= datetime('now', '-' || ? || ' hours')")
+            params.append(since_hours)
+        if date_range is not None:
+            start_date, end_date = self._date_bounds(date_range)
+            clauses.append('created_at BETWEEN ? AND ?')
+            params += [start_date, end_date]
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+    
+    @staticmethod
+    def _date_bounds(date_range):
+        """Bornes (début, fin) d'une plage de dates, en chaînes comparables à created_at"""
+        return tuple(d.isoformat() if hasattr(d, 'isoformat') else d for d in date_range)
+    
+    @staticmethod
+    def _full_days(start_date, end_date):
+        """Premier et dernier jour entièrement compris dans [start_date, end_date]"""
+        first_day = date.fromisoformat(start_date[:10])
+        if start_date[11:].strip('0:'):
+            first_day += timedelta(days=1)
+        last_day = date.fromisoformat(end_date[:10])
+        if end_date[11:19] < '23:59:59':
+            last_day -= timedelta(days=1)
+        return first_day, last_day
+    
+    def _stat_groups(self, conn, where_clause, params):
+        """Agrégats de properties par (source, statut) pour une clause WHERE"""
+        return conn.execute(f'''
+            SELECT source, status, COUNT(*) AS n,
+                   COUNT(price) AS n_price, SUM(price) AS sum_price,
+                   MIN(price) AS min_price, MAX(price) AS max_price,
+                   COUNT(surface) AS n_surface, SUM(surface) AS sum_surface,
+                   COUNT(rooms) AS n_rooms, SUM(rooms) AS sum_rooms
+            FROM properties{where_clause}
+            GROUP BY source, status
+        ''', params).fetchall()
+    
+    def _merge_stat_groups(self, groups):
+        """Reconstituer les statistiques globales à partir d'agrégats partiels"""
+        stats = {
+            'total_properties': 0,
+            'by_source': {},
+            'by_status': {},
+            'avg_price': None,
+            'min_price': None,
+            'max_price': None,
+            'avg_surface': None,
+            'avg_rooms': None
+        }
+        totals = {'n_price': 0, 'sum_price': 0, 'n_surface': 0, 'sum_surface': 0,
+                  'n_rooms': 0, 'sum_rooms': 0}
         
-        stats = {}
+        for group in groups:
+            status = group['status'] or None
+            stats['total_properties'] += group['n']
+            stats['by_source'][group['source']] = stats['by_source'].get(group['source'], 0) + group['n']
+            stats['by_status'][status] = stats['by_status'].get(status, 0) + group['n']
+            for key in totals:
+                totals[key] += group[key] or 0
         
-        # Construire la clause WHERE pour les filtres
-        where_clause = ''
-        params = []
+        priced = [group for group in groups if group['n_price']]
+        if priced:
+            stats['min_price'] = min(group['min_price'] for group in priced)
+            stats['max_price'] = max(group['max_price'] for group in priced)
         
-        if filters:
-            where_conditions = []
-            if filters.get('price_min'):
-                where_conditions.append('price >= ?')
-                params.append(filters['price_min'])
-            if filters.get('price_max'):
-                where_conditions.append('price <= ?')
-                params.append(filters['price_max'])
-            if filters.get('dpe_max'):
-                dpe_value = DPE_MAPPING[filters['dpe_max']]
-                where_conditions.append('dpe_value <= ?')
-                params.append(dpe_value)
-            
-            if where_conditions:
-                where_clause = ' WHERE ' + ' AND '.join(where_conditions)
+        if totals['n_price']:
+            stats['avg_price'] = totals['sum_price'] / totals['n_price']
+        if totals['n_surface']:
+            stats['avg_surface'] = totals['sum_surface'] / totals['n_surface']
+        if totals['n_rooms']:
+            stats['avg_rooms'] = totals['sum_rooms'] / totals['n_rooms']
+        
+        return stats
+    
+    def _rollup_statistics(self, filters=None, date_range=None):
+        """Statistiques lues dans property_stats, ou None si les filtres ne le permettent pas
+        
+        Les tranches de prix entièrement comprises dans [price_min, price_max]
+        et les jours entièrement compris dans `date_range` (sur created_at)
+        viennent de property_stats; les tranches et jours partiels aux bornes
+        sont calculés sur properties via les index de prix et de date.
+        """
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        if set(filters) - ROLLUP_FILTERS:
+            return None
+        price_min = filters.get('price_min')
+        price_max = filters.get('price_max')
+        if any(v is not None and not isinstance(v, (int, float)) for v in (price_min, price_max)):
+            return None
         
-        # Total des annonces
-        cursor.execute(f'SELECT COUNT(*) FROM properties{where_clause}', params)
-        stats['total_properties'] = cursor.fetchone()[0]
+        band = DATABASE_CONFIG.get('stats_price_band', 10000)
+        first_band = math.ceil(price_min / band) if price_min else None
+        last_band = math.floor(price_max / band) - 1 if price_max else None
+        if first_band is not None and last_band is not None and first_band > last_band:
+            return None
         
-        # Par source
-        cursor.execute(f'SELECT source, COUNT(*) FROM properties{where_clause} GROUP BY source', params)
-        stats['by_source'] = {row[0]: row[1] for row in cursor.fetchall()}
+        first_day = last_day = None
+        if date_range is not None:
+            start_date, end_date = self._date_bounds(date_range)
+            try:
+                first_day, last_day = self._full_days(start_date, end_date)
+            except ValueError:
+                return None
+            if first_day > last_day:
+                return None
         
-        # Par statut
-        cursor.execute(f'SELECT status, COUNT(*) FROM properties{where_clause} GROUP BY status', params)
-        stats['by_status'] = {row[0]: row[1] for row in cursor.fetchall()}
+        other_filters = {key: value for key, value in filters.items()
+                         if key not in ('price_min', 'price_max')}
         
-        # Moyenne des prix
-        cursor.execute(f'SELECT AVG(price) FROM properties{where_clause}', params)
-        stats['avg_price'] = cursor.fetchone()[0]
+        # Tranches (et jours) complets depuis la table d'agrégats
+        clauses, params = [], []
+        if first_band is not None:
+            clauses.append('price_band >= ?')
+            params.append(first_band)
+        if last_band is not None:
+            clauses.append('price_band <= ?')
+            params.append(last_band)
+        if other_filters.get('dpe_max'):
+            clauses.append('dpe_value <= ?')
+            params.append(DPE_MAPPING[other_filters['dpe_max']])
+        if other_filters.get('status'):
+            clauses.append('status = ?')
+            params.append(other_filters['status'])
+        if first_day is not None:
+            clauses.append('day BETWEEN ? AND ?')
+            params += [first_day.isoformat(), last_day.isoformat()]
+        where_clause = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
         
-        # Prix min/max
-        cursor.execute(f'SELECT MIN(price), MAX(price) FROM properties{where_clause}', params)
-        min_price, max_price = cursor.fetchone()
-        stats['min_price'] = min_price
-        stats['max_price'] = max_price
+        # Tranches et jours partiels aux bornes, sur la table properties
+        edges, edge_params = [], []
+        if first_band is not None and price_min < first_band * band:
+            edges.append('(price >= ? AND price < ?)')
+            edge_params += [price_min, first_band * band]
+        if last_band is not None:
+            edges.append('(price >= ? AND price <= ?)')
+            edge_params += [(last_band + 1) * band, price_max]
+        bounds, bound_params = [], []
+        if first_day is not None:
+            edges.append('(created_at >= ? AND created_at < ?)')
+            edge_params += [start_date, first_day.isoformat()]
+            edges.append('(created_at >= ? AND created_at <= ?)')
+            edge_params += [(last_day + timedelta(days=1)).isoformat(), end_date]
+            # Un jour partiel reste borné par la plage de prix, et inversement
+            bounds.append('created_at BETWEEN ? AND ?')
+            bound_params += [start_date, end_date]
+            if price_min:
+                bounds.append('price >= ?')
+                bound_params.append(price_min)
+            if price_max:
+                bounds.append('price <= ?')
+                bound_params.append(price_max)
         
-        return stats
+        with self.connection() as conn:
+            groups = conn.execute(f'''
+                SELECT source, status, SUM(n) AS n,
+                       SUM(n) AS n_price, SUM(sum_price) AS sum_price,
+                       MIN(min_price) AS min_price, MAX(max_price) AS max_price,
+                       SUM(n_surface) AS n_surface, SUM(sum_surface) AS sum_surface,
+                       SUM(n_rooms) AS n_rooms, SUM(sum_rooms) AS sum_rooms
+                FROM property_stats{where_clause}
+                GROUP BY source, status
+            ''', params).fetchall()
+            
+            if edges:
+                edge_clauses, other_params = self._filter_clauses(other_filters)
+                edge_clauses += bounds
+                edge_clauses.append('(' + ' OR '.join(edges) + ')')
+                groups += self._stat_groups(
+                    conn, ' WHERE ' + ' AND '.join(edge_clauses), other_params + bound_params + edge_params
+                )
+        
+        return self._merge_stat_groups(groups)
+    
+    def get_statistics(self, filters=None):
+        """Récupérer les statistiques de la base de données
+        
+        Servies par la table d'agrégats property_stats quand les filtres s'y
+        prêtent (prix, DPE, statut); sinon calculées sur properties.
+        """
+        stats = self._rollup_statistics(filters)
+        if stats is None:
+            stats = self.compute_statistics(filters=filters)
+        return {key: stats[key] for key in
+                ('total_properties', 'by_source', 'by_status', 'avg_price', 'min_price', 'max_price')}
     
     def get_statistics_by_date(self, start_date, end_date):
         """Récupérer les statistiques filtrées par date
         
+        Les jours complets sont lus dans property_stats; seuls les jours
+        partiels aux bornes sont recalculés sur properties.
+        
         Args:
             start_date: datetime ou string au format 'YYYY-MM-DD HH:MM:SS'
             end_date: datetime ou string au format 'YYYY-MM-DD HH:MM:SS'
@@ -417,64 +2240,15 @@ class Database:
         Returns:
             dict avec statistiques filtrées par plage de dates
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Convertir en string si datetime
-        if hasattr(start_date, 'isoformat'):
-            start_date = start_date.isoformat()
-        if hasattr(end_date, 'isoformat'):
-            end_date = end_date.isoformat()
-        
-        stats = {}
-        
-        # Total des annonces dans la plage
-        cursor.execute('''
-            SELECT COUNT(*) FROM properties
-            WHERE created_at BETWEEN ? AND ?
-        ''', (start_date, end_date))
-        stats['total_properties'] = cursor.fetchone()[0]
-        
-        # Par source
-        cursor.execute('''
-            SELECT source, COUNT(*) FROM properties
-            WHERE created_at BETWEEN ? AND ?
-            GROUP BY source
-        ''', (start_date, end_date))
-        stats['by_source'] = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        # Par statut
-        cursor.execute('''
-            SELECT status, COUNT(*) FROM properties
-            WHERE created_at BETWEEN ? AND ?
-            GROUP BY status
-        ''', (start_date, end_date))
-        stats['by_status'] = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        # Moyenne des prix
-        cursor.execute('''
-            SELECT AVG(price) FROM properties
-            WHERE created_at BETWEEN ? AND ?
-        ''', (start_date, end_date))
-        result = cursor.fetchone()
-        stats['avg_price'] = result[0] if result[0] is not None else 0
-        
-        # Prix min/max
-        cursor.execute('''
-            SELECT MIN(price), MAX(price) FROM properties
-            WHERE created_at BETWEEN ? AND ? AND price IS NOT NULL
-        ''', (start_date, end_date))
-        min_price, max_price = cursor.fetchone()
-        stats['min_price'] = min_price if min_price is not None else 0
-        stats['max_price'] = max_price if max_price is not None else 0
-        
-        # Surface moyenne
-        cursor.execute('''
-            SELECT AVG(surface) FROM properties
-            WHERE created_at BETWEEN ? AND ? AND surface IS NOT NULL
-        ''', (start_date, end_date))
-        result = cursor.fetchone()
-        stats['avg_surface'] = result[0] if result[0] is not None else 0
-        
-        conn.close()
-        return stats
+        stats = self._rollup_statistics(date_range=(start_date, end_date))
+        if stats is None:
+            stats = self.compute_statistics(date_range=(start_date, end_date))
+        return {
+            'total_properties': stats['total_properties'],
+            'by_source': stats['by_source'],
+            'by_status': stats['by_status'],
+            'avg_price': stats['avg_price'] or 0,
+            'min_price': stats['min_price'] or 0,
+            'max_price': stats['max_price'] or 0,
+            'avg_surface': stats['avg_surface'] or 0
+        }
@@ -0,0 +1,124 @@
+"""
+Détection des annonces en double entre sources (MinHash + LSH)
+
+Un même bien publié sur SeLoger, PAP, LeBonCoin et BienIci a des URL et des
+identifiants différents. Chaque titre est réduit à une signature MinHash de
+ses k-grammes de caractères; le découpage en bandes (LSH) ne compare une
+annonce qu'aux annonces de la même commune partageant au moins une bande,
+ce qui évite la comparaison de toutes les paires. Les candidats sont ensuite
+confirmés par la similarité estimée, la surface, le prix et le nombre de pièces.
+"""
+import hashlib
+import re
+import unicodedata
+from array import array
+
+from config import DEDUP_CONFIG
+
+# Nombre premier de Mersenne 2^61 - 1 pour les permutations (a * x + b) mod p
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text):
+    """Minuscules, sans accents ni ponctuation, espaces réduits"""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return ' '.join(re.findall(r'\w+', text))
+
+
+def commune_key(location):
+    """Clé de commune: mots alphabétiques de la localisation (« Paris 75015 » -> « paris »)"""
+    words = [word for word in normalize_text(location).split() if not word.isdigit()]
+    return ' '.join(words)
+
+
+def shingles(text, size=None):
+    """Ensemble des k-grammes de caractères du texte normalisé"""
+    size = size or DEDUP_CONFIG.get('shingle_size', 3)
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _hash32(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=4).digest(), 'big')
+
+
+class MinHasher:
+    """Signatures MinHash à `num_perm` permutations (déterministes)"""
+
+    def __init__(self, num_perm=None, seed=1):
+        self.num_perm = num_perm or DEDUP_CONFIG.get('num_perm', 64)
+        self._perms = []
+        for i in range(self.num_perm):
+            digest = hashlib.blake2b(f'{seed}:{i}'.encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], 'big') % (_PRIME - 1) + 1
+            b = int.from_bytes(digest[8:], 'big') % _PRIME
+            self._perms.append((a, b))
+
+    def signature(self, text):
+        """Signature du titre (liste de num_perm entiers 32 bits)"""
+        hashes = [_hash32(shingle) for shingle in shingles(text)]
+        if not hashes:
+            return [_MAX_HASH] * self.num_perm
+        return [min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in self._perms]
+
+
+_default_hasher = None
+
+
+def title_signature(title):
+    """Signature MinHash d'un titre avec les paramètres de DEDUP_CONFIG"""
+    global _default_hasher
+    if _default_hasher is None:
+        _default_hasher = MinHasher()
+    return _default_hasher.signature(title)
+
+
+def similarity(signature_a, signature_b):
+    """Similarité de Jaccard estimée entre deux signatures"""
+    if not signature_a or len(signature_a) != len(signature_b):
+        return 0.0
+    return sum(1 for x, y in zip(signature_a, signature_b) if x == y) / len(signature_a)
+
+
+def lsh_buckets(listing, signature, bands=None):
+    """Clés de seaux LSH: (commune, bande, valeurs de la bande)"""
+    bands = bands or DEDUP_CONFIG.get('bands', 16)
+    rows = max(1, len(signature) // bands)
+    commune = commune_key(listing.get('location'))
+    keys = []
+    for band in range(bands):
+        chunk = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(f'{commune}|{band}|{chunk}'.encode(), digest_size=8).hexdigest()
+        keys.append(digest)
+    return keys
+
+
+def _close(a, b, tolerance):
+    """Vrai si deux valeurs sont à `tolerance` (relative) près, ou si l'une manque"""
+    if not a or not b:
+        return True
+    return abs(a - b) <= tolerance * max(a, b)
+
+
+def is_duplicate(listing, candidate, signature, candidate_signature):
+    """Confirmer une paire candidate issue des seaux LSH (attributs d'abord, moins coûteux)"""
+    if listing.get('rooms') and candidate.get('rooms') and listing['rooms'] != candidate['rooms']:
+        return False
+    if not (_close(listing.get('surface'), candidate.get('surface'), DEDUP_CONFIG.get('surface_tolerance', 0.05))
+            and _close(listing.get('price'), candidate.get('price'), DEDUP_CONFIG.get('price_tolerance', 0.05))):
+        return False
+    return similarity(signature, candidate_signature) >= DEDUP_CONFIG.get('similarity', 0.5)
+
+
+def pack_signature(signature):
+    return array('I', signature).tobytes()
+
+
+def unpack_signature(blob):
+    signature = array('I')
+    signature.frombytes(blob or b'')
+    return list(signature)
@@ -0,0 +1,258 @@
+"""
+Import en flux des fichiers DVF "valeurs foncières"
+
+Les fichiers annuels publiés par la DGFiP (séparateur '|', plusieurs Go pour
+la France entière, éventuellement compressés en .gz ou .zip) ainsi que les
+fichiers geo-dvf d'Etalab (séparateur ',', avec coordonnées) sont lus par
+blocs de lignes: chaque bloc est analysé par le lecteur csv, filtré sur nos
+départements et inséré dans dvf_transactions dans une seule transaction, avec
+la position atteinte dans le fichier. La mémoire utilisée ne dépend pas de la
+taille du fichier et un import interrompu reprend au dernier bloc enregistré.
+
+Usage:
+    python dvf_import.py valeursfoncieres-2023.txt.zip [--departments 75,92,94] [--restart]
+"""
+import csv
+import gzip
+import io
+import logging
+import re
+import sys
+import time
+import zipfile
+from itertools import islice
+from pathlib import Path
+
+from communes import CODES_POSTAUX
+from config import DVF_IMPORT_CONFIG, SEARCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Champ de dvf_transactions -> noms de colonne possibles (en-tête normalisé)
+# DGFiP: "Date mutation", "Valeur fonciere"...; geo-dvf: date_mutation, nom_commune...
+FIELDS = {
+    'mutation_id': ('id_mutation',),
+    'date_mutation': ('date_mutation',),
+    'nature_mutation': ('nature_mutation',),
+    'valeur_fonciere': ('valeur_fonciere',),
+    'code_postal': ('code_postal',),
+    'commune': ('nom_commune', 'commune'),
+    'code_departement': ('code_departement',),
+    'code_commune': ('code_commune',),
+    'type_local': ('type_local',),
+    'surface_reelle_bati': ('surface_reelle_bati',),
+    'nombre_pieces': ('nombre_pieces_principales',),
+    'surface_terrain': ('surface_terrain',),
+    'longitude': ('longitude',),
+    'latitude': ('latitude',),
+}
+REQUIRED_FIELDS = ('date_mutation', 'valeur_fonciere', 'code_departement', 'code_commune', 'type_local')
+
+# "PARIS 15", "Paris 15e Arrondissement" -> "PARIS", "Paris" (comme les annonces)
+_ARRONDISSEMENT = re.compile(r'\s+\d+(?:er|e|eme|ème)?(?:\s+arrondissement)?$', re.IGNORECASE)
+
+
+def strip_arrondissement(commune):
+    """Nom de commune sans arrondissement ("Paris 15e Arrondissement" -> "Paris")"""
+    return _ARRONDISSEMENT.sub('', commune)
+
+
+def default_departments():
+    """Codes des départements de SEARCH_CONFIG['zones']"""
+    return {CODES_POSTAUX[zone] for zone in SEARCH_CONFIG.get('zones', []) if zone in CODES_POSTAUX}
+
+
+def open_dvf(path):
+    """Ouvrir un fichier DVF en binaire (texte brut, .gz ou premier fichier d'un .zip)"""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == b'\x1f\x8b':
+        return gzip.open(path, 'rb')
+    if magic == b'PK':
+        archive = zipfile.ZipFile(path)
+        return archive.open(archive.namelist()[0])
+    return open(path, 'rb')
+
+
+def column_indices(header):
+    """Position de chaque champ de FIELDS dans l'en-tête (None si absent)
+
+    Raises:
+        ValueError: si une colonne obligatoire manque
+    """
+    names = {name.strip().lower().replace(' ', '_'): i for i, name in enumerate(header)}
+    indices = {}
+    for field, aliases in FIELDS.items():
+        indices[field] = next((names[alias] for alias in aliases if alias in names), None)
+    missing = [field for field in REQUIRED_FIELDS if indices[field] is None]
+    if missing:
+        raise ValueError(f"Fichier DVF non reconnu, colonnes manquantes: {', '.join(missing)}")
+    return indices
+
+
+def _number(value):
+    # Décimales à la française dans les fichiers DGFiP ("185000,00")
+    if not value:
+        return None
+    try:
+        return float(value.replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def _iso_date(value):
+    # DGFiP: JJ/MM/AAAA; geo-dvf: déjà au format ISO
+    if '/' in value:
+        day, month, year = value.split('/')
+        return f'{year}-{month}-{day}'
+    return value or None
+
+
+def parse_records(records, indices, source_file, departments):
+    """Transactions à insérer (tuples dans l'ordre de DVF_COLUMNS)
+
+    Seules les lignes d'un département retenu, décrivant un local (type_local)
+    et ayant une valeur foncière sont gardées.
+    """
+    get = {field: index for field, index in indices.items() if index is not None}
+    department_index, type_index = get['code_departement'], get['type_local']
+    width = max(get.values()) + 1
+    rows = []
+    for record in records:
+        if len(record) < width:
+            continue
+        department = record[department_index]
+        if len(department) == 1:
+            department = '0' + department
+        if department not in departments or not record[type_index]:
+            continue
+        value = _number(record[get['valeur_fonciere']])
+        if value is None:
+            continue
+        date_mutation = _iso_date(record[get['date_mutation']])
+        code_commune = record[get['code_commune']]
+        if len(code_commune) <= 3:
+            # Code commune DGFiP sur 3 chiffres: code INSEE = département + commune
+            code_commune = department + code_commune.zfill(3)
+        mutation_id = record[get['mutation_id']] if 'mutation_id' in get else None
+        if not mutation_id:
+            # Pas d'identifiant dans les fichiers DGFiP: une mutation = même date, valeur et commune
+            mutation_id = f"{date_mutation}|{record[get['valeur_fonciere']]}|{code_commune}"
+        commune = record[get['commune']] if 'commune' in get else ''
+        rows.append((
+            source_file,
+            mutation_id,
+            date_mutation,
+            record[get['nature_mutation']] if 'nature_mutation' in get else None,
+            value,
+            record[get['code_postal']] or None if 'code_postal' in get else None,
+            strip_arrondissement(commune) or None,
+            department,
+            code_commune,
+            record[type_index],
+            _number(record[get['surface_reelle_bati']]) if 'surface_reelle_bati' in get else None,
+            int(_number(record[get['nombre_pieces']]) or 0) if 'nombre_pieces' in get else None,
+            _number(record[get['surface_terrain']]) if 'surface_terrain' in get else None,
+            _number(record[get['longitude']]) if 'longitude' in get else None,
+            _number(record[get['latitude']]) if 'latitude' in get else None,
+        ))
+    return rows
+
+
+def import_dvf(db, path, departments=None, restart=False, chunk_lines=None):
+    """Importer un fichier DVF dans dvf_transactions, en reprenant l'import précédent
+
+    Un fichier déjà importé entièrement n'est pas relu (sauf `restart`); un
+    fichier dont la taille a changé est réimporté depuis le début.
+
+    Args:
+        db: instance Database
+        departments: codes de département à garder (défaut: zones de SEARCH_CONFIG)
+        restart: supprimer les transactions déjà importées du fichier et recommencer
+
+    Returns:
+        dict: source_file, resumed_from, rows_read, rows_imported, completed, seconds
+    """
+    path = Path(path)
+    departments = set(departments or default_departments())
+    chunk_lines = chunk_lines or DVF_IMPORT_CONFIG.get('chunk_lines', 50000)
+    encoding = DVF_IMPORT_CONFIG.get('encoding', 'utf-8')
+    source_file = path.name
+    file_size = path.stat().st_size
+
+    state = db.get_dvf_import_state(source_file)
+    if restart or state is None or state['file_size'] != file_size:
+        db.reset_dvf_import(source_file, file_size)
+        state = db.get_dvf_import_state(source_file)
+    stats = {'source_file': source_file, 'resumed_from': state['byte_offset'],
+             'rows_read': 0, 'rows_imported': 0, 'completed': bool(state['completed'])}
+    if state['completed']:
+        logger.info(f"DVF {source_file}: déjà importé ({state['rows_imported']} transactions)")
+        return dict(stats, seconds=0.0)
+
+    started = time.monotonic()
+    with open_dvf(path) as f:
+        header_line = f.readline()
+        delimiter = '|' if b'|' in header_line else ','
+        header = next(csv.reader([header_line.decode(encoding, 'replace').lstrip('\ufeff')],
+                                 delimiter=delimiter))
+        indices = column_indices(header)
+        offset = max(state['byte_offset'], len(header_line))
+        if offset > len(header_line):
+            f.seek(offset)
+
+        while True:
+            lines = list(islice(f, chunk_lines))
+            offset += sum(map(len, lines))
+            completed = len(lines) < chunk_lines
+            text = b''.join(lines).decode(encoding, 'replace')
+            records = csv.reader(io.StringIO(text), delimiter=delimiter)
+            rows = parse_records(records, indices, source_file, departments)
+            db.add_dvf_chunk(source_file, rows, offset, len(lines), completed=completed)
+            stats['rows_read'] += len(lines)
+            stats['rows_imported'] += len(rows)
+            if completed:
+                break
+            logger.info(f"DVF {source_file}: {stats['rows_read']} lignes lues, "
+                        f"{stats['rows_imported']} transactions importées")
+
+    stats['completed'] = True
+    stats['seconds'] = round(time.monotonic() - started, 1)
+    logger.info(f"DVF {source_file}: import terminé, {stats['rows_imported']} transactions "
+                f"sur {stats['rows_read']} lignes en {stats['seconds']}s")
+    return stats
+
+
+def parse_args(args):
+    """Arguments de la commande: (fichiers, départements ou None, restart)"""
+    restart = '--restart' in args
+    args = [arg for arg in args if arg != '--restart']
+    departments = None
+    if '--departments' in args:
+        i = args.index('--departments')
+        departments = {code.strip() for code in args[i + 1].split(',') if code.strip()}
+        del args[i:i + 2]
+    return args, departments, restart
+
+
+def main(argv=None):
+    """Point d'entrée: python dvf_import.py FICHIER... [--departments 75,92] [--restart]"""
+    from database import Database
+    from logger import setup_logging
+
+    setup_logging()
+    paths, departments, restart = parse_args(list(sys.argv[1:] if argv is None else argv))
+    if not paths:
+        print(__doc__)
+        return 1
+
+    db = Database()
+    for path in paths:
+        stats = import_dvf(db, path, departments=departments, restart=restart)
+        print(f"✓ {stats['source_file']}: {stats['rows_imported']} transactions importées "
+              f"({stats['rows_read']} lignes lues en {stats['seconds']}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
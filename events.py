@@ -0,0 +1,221 @@
+"""
+Bus d'événements en mémoire et formatage Server-Sent Events (SSE)
+
+Le bus ne vit que dans le processus web: DatabaseWatcher y relaie ce que le
+CLI et scheduler.py écrivent dans la base et le fichier de log partagés.
+"""
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from config import EVENTS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Types d'événements publiés
+NEW_LISTING = 'new-listing'
+SCRAPE_PROGRESS = 'scrape-progress'
+SCHEDULER_STATE = 'scheduler-state'
+LOG_LINE = 'log'
+
+
+class Subscription:
+    """Abonnement d'un client (un onglet) au bus d'événements"""
+
+    def __init__(self, bus, types=None, maxsize=None):
+        self.bus = bus
+        self.types = set(types) if types else None
+        self.queue = queue.Queue(maxsize=maxsize or EVENTS_CONFIG.get('subscriber_queue_size', 500))
+        self.dropped = 0
+
+    def wants(self, event):
+        return self.types is None or event['type'] in self.types
+
+    def push(self, event):
+        """Ajouter un événement sans jamais bloquer le producteur"""
+        if not self.wants(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Client trop lent: on sacrifie l'événement le plus ancien
+            self.dropped += 1
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(event)
+            except (queue.Empty, queue.Full):
+                pass
+
+    def get(self, timeout=None):
+        """Prochain événement, ou None après `timeout` secondes"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Diffusion des événements à tous les abonnés du processus
+
+    Les derniers événements sont conservés pour que les clients qui se
+    reconnectent (en-tête Last-Event-ID) récupèrent ce qu'ils ont manqué.
+    """
+
+    def __init__(self, history_size=None):
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size or EVENTS_CONFIG.get('history_size', 200))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, data=None):
+        """Publier un événement; retourne son identifiant"""
+        with self._lock:
+            event = {
+                'id': next(self._ids),
+                'type': event_type,
+                'data': data if data is not None else {},
+                'timestamp': time.time()
+            }
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+        return event['id']
+
+    def subscribe(self, last_event_id=None, types=None):
+        """S'abonner (à utiliser avec `with`), en rejouant les événements manqués"""
+        subscription = Subscription(self, types)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._history:
+                    if event['id'] > last_event_id:
+                        subscription.push(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class DatabaseWatcher:
+    """Publier sur le bus les écritures de tous les processus
+
+    Le scraping tourne aussi dans le CLI et dans scheduler.py: seuls la base
+    et le fichier de log sont partagés. Un thread relit périodiquement les
+    nouvelles lignes de `properties` (rowid croissant), la fin du dernier
+    run (`scrape_state`) et la fin du fichier de log, puis publie les
+    événements new-listing, scheduler-state et log correspondants.
+    """
+
+    def __init__(self, bus, db, log_file=None, poll_seconds=None, format_last_run=None):
+        self.bus = bus
+        self.db = db
+        self.log_file = Path(log_file) if log_file else None
+        self.poll_seconds = poll_seconds or EVENTS_CONFIG.get('db_poll_seconds', 2)
+        self.format_last_run = format_last_run or (lambda value: value)
+        self._rowid = None
+        self._last_run = None
+        self._log_offset = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def prime(self):
+        """Partir de l'état actuel: seules les écritures suivantes sont publiées"""
+        self._rowid = self.db.get_last_property_rowid()
+        self._last_run = self.db.get_last_scrape_run()
+        self._log_offset = self._log_size()
+
+    def start(self):
+        """Démarrer le thread de surveillance (sans effet s'il tourne déjà)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.prime()
+            self._thread = threading.Thread(target=self._run, name='db-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Surveillance de la base interrompue: {e}")
+
+    def poll(self):
+        """Publier ce qui a changé depuis le passage précédent; retourne le nombre d'événements"""
+        published = 0
+        while True:
+            self._rowid, rows = self.db.get_properties_after(self._rowid)
+            for prop in rows:
+                self.bus.publish(NEW_LISTING, listing_event(prop))
+            published += len(rows)
+            if not rows:
+                break
+
+        last_run = self.db.get_last_scrape_run()
+        if last_run and last_run != self._last_run:
+            self._last_run = last_run
+            self.bus.publish(SCHEDULER_STATE, {'last_run': self.format_last_run(last_run)})
+            published += 1
+
+        for line in self._read_log_lines():
+            self.bus.publish(LOG_LINE, {'line': line})
+            published += 1
+        return published
+
+    def _log_size(self):
+        try:
+            return self.log_file.stat().st_size if self.log_file else 0
+        except OSError:
+            return 0
+
+    def _read_log_lines(self):
+        """Lignes complètes ajoutées au fichier de log depuis le dernier passage"""
+        size = self._log_size()
+        if size < self._log_offset:
+            # Rotation (RotatingFileHandler): reprendre au début du nouveau fichier
+            self._log_offset = 0
+        if size == self._log_offset:
+            return []
+        with open(self.log_file, 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read(size - self._log_offset)
+        # Une ligne en cours d'écriture sera lue au passage suivant
+        end = data.rfind(b'\n') + 1
+        self._log_offset += end
+        return data[:end].decode('utf-8', errors='replace').splitlines()
+
+
+def format_sse(event):
+    """Sérialiser un événement au format text/event-stream"""
+    payload = json.dumps(event['data'], ensure_ascii=False, default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+def listing_event(prop):
+    """Données légères d'une nouvelle annonce pour l'événement new-listing"""
+    return {key: prop.get(key) for key in ('id', 'title', 'price', 'dpe', 'location', 'source', 'url')}
+
+
+# Bus partagé par l'application
+event_bus = EventBus()
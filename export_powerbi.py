@@ -5,7 +5,8 @@ Génère des fichiers CSV et synthèse d'analyse
 import sqlite3
 import csv
 from datetime import datetime
-from collections import defaultdict
+
+from analytics import ListingArrays
 
 # Connexion à la base de données
 conn = sqlite3.connect('database/immobilier.db')
@@ -37,36 +38,27 @@ with open(csv_filename, 'w', newline='', encoding='utf-8') as f:
 print(f"Export CSV: {csv_filename}")
 print()
 
-# 3. Analyse par commune
-communes_data = defaultdict(lambda: {'count': 0, 'prices': [], 'surfaces': []})
-
-for prop in properties:
-    id_, source, location, price, surface, rooms, dpe, posted_date, url = prop
-    if price and location:
-        communes_data[location]['count'] += 1
-        communes_data[location]['prices'].append(price)
-        if surface:
-            communes_data[location]['surfaces'].append(surface)
+# 3. Analyse par commune (calcul vectorisé, voir analytics.py)
+arrays = ListingArrays.from_listings(
+    {'source': source, 'location': location, 'price': price, 'surface': surface, 'rooms': rooms, 'dpe': dpe}
+    for id_, source, location, price, surface, rooms, dpe, posted_date, url in properties
+    if price and location
+)
 
-# Calcul statistiques par commune
 commune_stats = []
-for commune, data in sorted(communes_data.items()):
-    if data['prices']:
-        avg_price = sum(data['prices']) / len(data['prices'])
-        min_price = min(data['prices'])
-        max_price = max(data['prices'])
-        avg_surface = sum(data['surfaces']) / len(data['surfaces']) if data['surfaces'] else 0
-        price_per_m2 = avg_price / avg_surface if avg_surface > 0 else 0
-        
-        commune_stats.append({
-            'commune': commune,
-            'count': data['count'],
-            'avg_price': avg_price,
-            'min_price': min_price,
-            'max_price': max_price,
-            'avg_surface': avg_surface,
-            'price_per_m2': price_per_m2
-        })
+for commune, stats in sorted(arrays.group_stats('location').items()):
+    avg_surface = stats['avg_surface'] or 0
+    commune_stats.append({
+        'commune': commune,
+        'count': stats['count'],
+        'avg_price': stats['avg_price'],
+        'median_price': stats['median_price'],
+        'min_price': stats['min_price'],
+        'max_price': stats['max_price'],
+        'avg_surface': avg_surface,
+        'price_per_m2': stats['avg_price'] / avg_surface if avg_surface > 0 else 0,
+        'median_price_per_m2': stats['median_price_per_sqm'] or 0
+    })
 
 # Trier par prix moyen
 commune_stats_sorted = sorted(commune_stats, key=lambda x: x['avg_price'])
@@ -75,7 +67,8 @@ commune_stats_sorted = sorted(commune_stats, key=lambda x: x['avg_price'])
 stats_filename = 'exports/analyse_communes.csv'
 with open(stats_filename, 'w', newline='', encoding='utf-8') as f:
     writer = csv.writer(f)
-    writer.writerow(['Commune', 'Nombre Annonces', 'Prix Moyen', 'Prix Min', 'Prix Max', 'Surface Moy', 'Prix/m2'])
+    writer.writerow(['Commune', 'Nombre Annonces', 'Prix Moyen', 'Prix Min', 'Prix Max', 'Surface Moy', 'Prix/m2',
+                     'Prix Median', 'Prix/m2 Median'])
     for stat in commune_stats_sorted:
         writer.writerow([
             stat['commune'],
@@ -84,7 +77,9 @@ with open(stats_filename, 'w', newline='', encoding='utf-8') as f:
             f"{stat['min_price']:.0f}",
             f"{stat['max_price']:.0f}",
             f"{stat['avg_surface']:.1f}",
-            f"{stat['price_per_m2']:.0f}"
+            f"{stat['price_per_m2']:.0f}",
+            f"{stat['median_price']:.0f}",
+            f"{stat['median_price_per_m2']:.0f}"
         ])
 
 print(f"Export Analyse: {stats_filename}")
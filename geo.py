@@ -0,0 +1,210 @@
+"""
+Coordonnées des annonces et recherches géographiques
+
+Les annonces n'ont qu'une localisation en texte libre: elles sont placées au
+centroïde de leur code postal, sinon de leur commune (table commune_centroids,
+alimentée par un fichier de centroïdes officiel ou par les coordonnées des
+transactions DVF). Les recherches par rayon ou par rectangle passent par des
+index R*Tree (properties_rtree, dvf_rtree): seul le rectangle englobant est
+parcouru, la distance exacte n'est calculée que pour ses lignes.
+"""
+import csv
+import io
+import logging
+import math
+import re
+import threading
+import time
+
+from config import GEO_CONFIG
+from dedup import commune_key, normalize_text
+from dvf_import import strip_arrondissement
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+_POSTAL_CODE = re.compile(r'\b(\d{5})\b')
+# "Paris 15e", "Lyon 3eme arrondissement" -> code postal de l'arrondissement
+_ARRONDISSEMENT = re.compile(r'^(paris|lyon|marseille) (\d{1,2})(?:er|e|eme)?\b')
+_ARRONDISSEMENT_POSTAL = {'paris': '750{:02d}', 'lyon': '6900{:d}', 'marseille': '130{:02d}'}
+
+# Noms de colonne possibles des fichiers de centroïdes (ex. communes de France, data.gouv.fr)
+CENTROID_FIELDS = {
+    'latitude': ('latitude', 'lat', 'centre_lat'),
+    'longitude': ('longitude', 'lon', 'lng', 'centre_lon'),
+    'code_postal': ('code_postal', 'codes_postaux', 'postal_code'),
+    'commune': ('nom_commune', 'nom_commune_complet', 'nom_standard', 'nom', 'commune', 'libelle'),
+    'code_departement': ('code_departement', 'dep_code', 'departement'),
+}
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Distance à vol d'oiseau en mètres (haversine), None si une coordonnée manque"""
+    if lat1 is None or lon1 is None or lat2 is None or lon2 is None:
+        return None
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_around(lat, lon, radius_m):
+    """Rectangle (south, west, north, east) contenant le cercle de rayon radius_m"""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlon = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return (lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+
+
+def parse_near(near):
+    """Valider un filtre de rayon {'lat', 'lon', 'radius_m'} -> (lat, lon, radius_m)
+
+    Raises:
+        ValueError: coordonnées ou rayon invalides
+    """
+    try:
+        lat, lon = float(near['lat']), float(near['lon'])
+        radius_m = float(near.get('radius_m') or GEO_CONFIG.get('default_radius_m', 1000))
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise ValueError("near attendu: {lat, lon, radius_m}") from e
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius_m <= 0:
+        raise ValueError("Coordonnées ou rayon hors limites")
+    return lat, lon, min(radius_m, GEO_CONFIG.get('max_radius_m', 50000))
+
+
+def parse_bbox(bbox):
+    """Valider un rectangle [south, west, north, east] -> tuple de floats
+
+    Raises:
+        ValueError: rectangle invalide
+    """
+    try:
+        south, west, north, east = (float(value) for value in bbox)
+    except (TypeError, ValueError) as e:
+        raise ValueError("bbox attendu: [south, west, north, east]") from e
+    if south > north or west > east:
+        raise ValueError("bbox invalide: south <= north et west <= east attendus")
+    return south, west, north, east
+
+
+def location_keys(location):
+    """Clés de commune_centroids à essayer pour une localisation, de la plus précise à la moins précise
+
+    Les arrondissements sans code postal ("Paris 15e") passent par le code
+    postal de l'arrondissement, puis par la commune ("paris"): les centroïdes
+    ne sont pas stockés par arrondissement.
+    """
+    keys = []
+    match = _POSTAL_CODE.search(location or '')
+    if match:
+        keys.append(('postal', match.group(1)))
+    arrondissement = _ARRONDISSEMENT.match(normalize_text(location))
+    if arrondissement:
+        city, number = arrondissement.group(1), int(arrondissement.group(2))
+        postal_code = _ARRONDISSEMENT_POSTAL[city].format(number)
+        if ('postal', postal_code) not in keys:
+            keys.append(('postal', postal_code))
+    for commune in (commune_key(location), commune_key(strip_arrondissement(location or ''))):
+        if commune and ('commune', commune) not in keys:
+            keys.append(('commune', commune))
+    return keys
+
+
+def read_centroids(path, departments=None):
+    """Lire un fichier CSV de centroïdes de communes (séparateur ',' ou ';')
+
+    Les communes homonymes d'autres départements sont écartées si
+    `departments` est donné et que le fichier indique le département.
+
+    Returns:
+        liste de tuples (kind, key, latitude, longitude), moyennés par clé
+    """
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        header_line = f.readline()
+        delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+        header = next(csv.reader(io.StringIO(header_line), delimiter=delimiter))
+        names = {name.strip().lower(): i for i, name in enumerate(header)}
+        columns = {field: next((names[alias] for alias in aliases if alias in names), None)
+                   for field, aliases in CENTROID_FIELDS.items()}
+        if columns['latitude'] is None or columns['longitude'] is None:
+            raise ValueError("Fichier de centroïdes sans colonnes latitude/longitude")
+
+        sums = {}
+        for record in csv.reader(f, delimiter=delimiter):
+            try:
+                lat = float(record[columns['latitude']].replace(',', '.'))
+                lon = float(record[columns['longitude']].replace(',', '.'))
+            except (IndexError, ValueError):
+                continue
+            department = record[columns['code_departement']] if columns['code_departement'] is not None else None
+            if departments and department and department.zfill(2) not in departments:
+                continue
+            keys = []
+            if columns['code_postal'] is not None:
+                keys += [('postal', code) for code in _POSTAL_CODE.findall(record[columns['code_postal']])]
+            commune = commune_key(strip_arrondissement(record[columns['commune']])) \
+                if columns['commune'] is not None else ''
+            if commune:
+                keys.append(('commune', commune))
+            for key in keys:
+                total = sums.setdefault(key, [0.0, 0.0, 0])
+                total[0] += lat
+                total[1] += lon
+                total[2] += 1
+    return [(kind, key, lat / n, lon / n) for (kind, key), (lat, lon, n) in sums.items()]
+
+
+class CentroidTable:
+    """Table commune_centroids en mémoire: {(kind, key): (latitude, longitude)}
+
+    Rechargée après une mise à jour dans le processus, ou au plus toutes les
+    GEO_CONFIG['refresh_seconds'] (mises à jour d'un autre processus).
+    """
+
+    def __init__(self, refresh_seconds=None):
+        self.refresh_seconds = (GEO_CONFIG.get('refresh_seconds', 300)
+                                if refresh_seconds is None else refresh_seconds)
+        self._centroids = {}
+        self._locations = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def due(self):
+        """Vrai si un rechargement depuis la base est nécessaire"""
+        return (self._loaded_at is None
+                or time.monotonic() - self._loaded_at >= self.refresh_seconds)
+
+    def load(self, conn):
+        """Charger la table commune_centroids"""
+        rows = conn.execute('SELECT kind, key, latitude, longitude FROM commune_centroids').fetchall()
+        centroids = {(row[0], row[1]): (row[2], row[3]) for row in rows}
+        with self._lock:
+            self._centroids = centroids
+            self._locations = {}
+            self._loaded_at = time.monotonic()
+
+    def reset(self):
+        """Oublier le contenu: rechargé au prochain accès"""
+        with self._lock:
+            self._centroids = {}
+            self._locations = {}
+            self._loaded_at = None
+
+    def __len__(self):
+        return len(self._centroids)
+
+    def lookup(self, location):
+        """Centroïde (latitude, longitude) du code postal ou de la commune, ou None"""
+        if location in self._locations:
+            return self._locations[location]
+        centroid = next((self._centroids[key] for key in location_keys(location)
+                         if key in self._centroids), None)
+        self._locations[location] = centroid
+        return centroid
+
+    def coordinates(self, listing):
+        """Coordonnées d'une annonce: les siennes si la source les donne, sinon le centroïde"""
+        if listing.get('latitude') is not None and listing.get('longitude') is not None:
+            return listing['latitude'], listing['longitude']
+        return self.lookup(listing.get('location')) or (None, None)
@@ -15,6 +15,7 @@ class HealthStatus:
         self.database_ok = False
         self.api_ok = False
         self.scrapers_ok = False
+        self.database_pool = {}
         self.last_check = None
     
     def to_dict(self):
@@ -23,6 +24,7 @@ class HealthStatus:
             'database': 'ok' if self.database_ok else 'error',
             'api': 'ok' if self.api_ok else 'error',
             'scrapers': 'ok' if self.scrapers_ok else 'error',
+            'database_pool': self.database_pool,
             'timestamp': self.last_check
         }
     
@@ -38,11 +40,10 @@ def check_health(db, scraper_manager):
     try:
         # Check database
         try:
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM properties')
-            conn.close()
+            with db.connection() as conn:
+                conn.execute('SELECT COUNT(*) FROM properties')
             health_status.database_ok = True
+            health_status.database_pool = db.pool_stats()
         except Exception as e:
             logger.error(f"Database health check failed: {e}")
             health_status.database_ok = False
@@ -0,0 +1,214 @@
+"""
+Exécution asynchrone des scrapings: file bornée de jobs et suivi de progression
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import JOBS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# États d'un job
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    """Trop de jobs en attente: la requête doit être réessayée plus tard"""
+
+
+class Job:
+    """Un scraping lancé en arrière-plan, avec progression par source"""
+
+    def __init__(self, kind, params, key):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.key = key
+        self.status = QUEUED
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.sources = OrderedDict()
+        self.result = {}
+        self.error = None
+        self.coalesced = 0
+        self._started = None
+        self._finished = None
+        self._lock = threading.Lock()
+
+    def source_started(self, name):
+        """Marquer une source comme en cours de scraping"""
+        with self._lock:
+            self.sources[name] = {
+                'status': RUNNING, 'count': 0, 'error': None,
+                'started_at': datetime.now().isoformat(), 'duration': None,
+                '_t0': time.monotonic()
+            }
+
+    def source_done(self, name, count, error=None):
+        """Enregistrer le résultat d'une source (nombre d'annonces ou erreur)"""
+        with self._lock:
+            entry = self.sources.setdefault(name, {'started_at': None, '_t0': None})
+            t0 = entry.get('_t0')
+            entry.update({
+                'status': FAILED if error else DONE,
+                'count': count,
+                'error': error,
+                'duration': round(time.monotonic() - t0, 3) if t0 else None
+            })
+
+    def to_dict(self):
+        """Représentation JSON de l'état du job"""
+        with self._lock:
+            sources = {
+                name: {k: v for k, v in entry.items() if not k.startswith('_')}
+                for name, entry in self.sources.items()
+            }
+            duration = None
+            if self._started is not None:
+                end = self._finished if self.finished_at else time.monotonic()
+                duration = round(end - self._started, 3)
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'params': self.params,
+                'status': self.status,
+                'created_at': self.created_at.isoformat(),
+                'started_at': self.started_at.isoformat() if self.started_at else None,
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+                'duration': duration,
+                'sources': sources,
+                'result': dict(self.result),
+                'error': self.error,
+                'coalesced': self.coalesced
+            }
+
+    def _start(self):
+        with self._lock:
+            self.status = RUNNING
+            self.started_at = datetime.now()
+            self._started = time.monotonic()
+
+    def _finish(self, error=None):
+        with self._lock:
+            self.status = FAILED if error else DONE
+            self.error = error
+            self.finished_at = datetime.now()
+            self._finished = time.monotonic()
+
+
+class JobManager:
+    """File de jobs bornée exécutée par un pool de threads
+
+    Une soumission identique (même type et mêmes paramètres) à un job encore
+    en attente ou en cours est fusionnée avec lui au lieu d'en créer un autre.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, history_size=None, listener=None):
+        self.max_workers = max_workers or JOBS_CONFIG.get('max_workers', 2)
+        self.max_pending = max_pending if max_pending is not None else JOBS_CONFIG.get('max_pending', 10)
+        self.history_size = history_size or JOBS_CONFIG.get('history_size', 100)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='scrape-job')
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+        # Appelé avec l'état du job à son démarrage et à sa fin
+        self.listener = listener
+
+    @staticmethod
+    def job_key(kind, params):
+        """Clé de fusion des soumissions identiques"""
+        return f"{kind}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    def submit(self, kind, params, func):
+        """Mettre en file `func(job)`; retourne (job, fusionné)
+
+        Lève JobQueueFull si la file est pleine.
+        """
+        key = self.job_key(kind, params)
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id is not None:
+                job = self._jobs[active_id]
+                job.coalesced += 1
+                return job, True
+
+            if len(self._active) >= self.max_workers + self.max_pending:
+                raise JobQueueFull(f"{len(self._active)} jobs déjà en cours ou en attente")
+
+            job = Job(kind, params, key)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+            self._prune()
+
+        self._executor.submit(self._run, job, func)
+        return job, False
+
+    def _run(self, job, func):
+        job._start()
+        self._notify(job)
+        error = None
+        try:
+            result = func(job)
+            if result:
+                job.result.update(result)
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) en échec: {e}")
+            error = str(e)
+        finally:
+            # Libérer la clé avant de publier l'état final: une nouvelle
+            # soumission après la fin du job en relance un
+            with self._lock:
+                self._active.pop(job.key, None)
+            job._finish(error)
+            self._notify(job)
+
+    def _notify(self, job):
+        if self.listener:
+            try:
+                self.listener(job.to_dict())
+            except Exception as e:
+                logger.warning(f"Notification du job {job.id} impossible: {e}")
+
+    def _prune(self):
+        """Oublier les jobs terminés les plus anciens au-delà de l'historique"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """État d'un job, ou None s'il est inconnu"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def list_jobs(self):
+        """États des jobs connus, du plus récent au plus ancien"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def stats(self):
+        """Occupation de la file"""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'queued': statuses.count(QUEUED),
+                'running': statuses.count(RUNNING),
+                'tracked': len(statuses)
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
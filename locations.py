@@ -0,0 +1,141 @@
+"""
+Dimension des localisations (table locations)
+
+Une ligne par commune (ou arrondissement de Paris): nom, code INSEE, code
+postal, département et centroïde. Chaque annonce y est rattachée une seule
+fois, à l'insertion (properties.location_id), par un dictionnaire en mémoire:
+les filtres par département ou par commune deviennent des égalités indexées
+au lieu de LIKE sur la localisation en texte libre.
+
+La table est initialisée depuis communes.py; les communes absentes sont
+ajoutées à la volée, les codes INSEE et centroïdes complétés depuis DVF.
+"""
+import re
+import threading
+
+from communes import CODES_POSTAUX, COMMUNES_PAR_DEPARTEMENT
+from dedup import commune_key
+
+_POSTAL_CODE = re.compile(r'\b(\d{5})\b')
+_PARIS_ARRONDISSEMENT = re.compile(r'^Paris (\d+)(?:er|e)$')
+
+DEPARTMENT_NAMES = {code: name for name, code in CODES_POSTAUX.items()}
+
+
+def department_code(value):
+    """Code département ('92') depuis un code, un nom ('Hauts-de-Seine') ou un code postal"""
+    value = str(value or '').strip()
+    if value in CODES_POSTAUX:
+        return CODES_POSTAUX[value]
+    if value.isdigit() and len(value) in (1, 2, 5):
+        return value.zfill(2)[:2]
+    if value[:2].upper() in ('2A', '2B'):
+        return value[:2].upper()
+    return None
+
+
+def seed_locations():
+    """Communes de communes.py: dicts (commune, commune_key, insee_code, postal_code, department)"""
+    locations = []
+    for department_name, communes in COMMUNES_PAR_DEPARTEMENT.items():
+        department = CODES_POSTAUX[department_name]
+        for commune in communes:
+            insee_code = postal_code = None
+            match = _PARIS_ARRONDISSEMENT.match(commune)
+            if match:
+                arrondissement = int(match.group(1))
+                insee_code, postal_code = f'751{arrondissement:02d}', f'750{arrondissement:02d}'
+            locations.append({
+                'commune': commune,
+                'commune_key': commune_key(commune),
+                'insee_code': insee_code,
+                'postal_code': postal_code,
+                'department': department,
+            })
+    return locations
+
+
+def new_location(listing):
+    """Localisation d'une annonce absente de la table (None si rien d'exploitable)"""
+    text = listing.get('location') or ''
+    key = commune_key(text)
+    if not key:
+        return None
+    match = _POSTAL_CODE.search(text)
+    postal_code = match.group(1) if match else None
+    department = department_code(listing.get('department')) or department_code(postal_code) or ''
+    return {
+        'commune': _POSTAL_CODE.sub('', text).strip(' ,-'),
+        'commune_key': key,
+        'insee_code': None,
+        'postal_code': postal_code,
+        'department': department,
+    }
+
+
+class LocationTable:
+    """Table locations en mémoire: identifiant par code postal et par (commune, département)
+
+    Les lignes ne changent pas une fois créées: le contenu n'est rechargé
+    que s'il n'a jamais été chargé ou après reset().
+    """
+
+    def __init__(self):
+        self._by_postal = {}
+        self._by_key = {}
+        self._locations = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def due(self):
+        """Vrai si un chargement depuis la base est nécessaire"""
+        return not self._loaded
+
+    def load(self, conn):
+        """Charger la table locations"""
+        rows = conn.execute('SELECT id, commune_key, postal_code, department FROM locations').fetchall()
+        with self._lock:
+            self._by_postal, self._by_key, self._locations = {}, {}, {}
+            for row in rows:
+                self._add(*row)
+            self._loaded = True
+
+    def reset(self):
+        """Oublier le contenu: rechargé au prochain accès"""
+        with self._lock:
+            self._by_postal, self._by_key, self._locations = {}, {}, {}
+            self._loaded = False
+
+    def add(self, location_id, location):
+        """Enregistrer une ligne créée dans locations"""
+        with self._lock:
+            self._add(location_id, location['commune_key'], location['postal_code'], location['department'])
+
+    def _add(self, location_id, key, postal_code, department):
+        if postal_code:
+            self._by_postal.setdefault(postal_code, location_id)
+        self._by_key.setdefault(key, {})[department] = location_id
+        self._locations.clear()
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._by_key.values())
+
+    def lookup(self, listing):
+        """Identifiant de la localisation d'une annonce, ou None
+
+        Code postal d'abord, sinon nom de commune dans le département de
+        l'annonce (n'importe lequel si l'annonce n'en indique pas).
+        """
+        text = listing.get('location')
+        cache_key = (text, listing.get('department'))
+        if cache_key in self._locations:
+            return self._locations[cache_key]
+        match = _POSTAL_CODE.search(text or '')
+        postal_code = match.group(1) if match else None
+        location_id = self._by_postal.get(postal_code)
+        ids = self._by_key.get(commune_key(text))
+        if location_id is None and ids:
+            department = department_code(listing.get('department')) or department_code(postal_code)
+            location_id = ids.get(department) if department else next(iter(ids.values()))
+        self._locations[cache_key] = location_id
+        return location_id
@@ -3,6 +3,7 @@ Script principal de scraping immobilier
 """
 import logging
 import sys
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
@@ -40,31 +41,27 @@ def main():
         logger.info(f"  - Zones: {', '.join(SEARCH_CONFIG['zones'])}")
         logger.info(f"  - DPE max: {SEARCH_CONFIG['dpe_max']}")
         
-        properties = manager.scrape_all()
-        logger.info(f"Total: {len(properties)} propriétés scrapées")
-        
-        # Ajouter à la base de données
-        new_count = 0
-        duplicate_count = 0
-        
-        for prop in properties:
-            if db.property_exists(prop.get('url')):
-                duplicate_count += 1
-                logger.debug(f"Annonce déjà en base: {prop.get('title')}")
-            else:
-                db.add_property(prop)
-                new_count += 1
-                logger.debug(f"Annonce ajoutée: {prop.get('title')} - {prop.get('price')} €")
+        # Scraper et ajouter à la base en flux (un lot par transaction)
+        new_properties = []
+        counts = Counter(manager.ingest(
+            db,
+            on_batch=lambda outcomes: new_properties.extend(
+                p for p, outcome in outcomes if outcome == 'inserted'
+            )
+        ))
+        new_count = len(new_properties)
+        logger.info(f"Total: {counts['scraped']} propriétés scrapées ({counts['rejected']} rejetées)")
         
         logger.info(f"Résultats:")
         logger.info(f"  - Nouvelles annonces: {new_count}")
-        logger.info(f"  - Doublons: {duplicate_count}")
+        logger.info(f"  - Prix modifiés: {counts['price_changed']}")
+        logger.info(f"  - Doublons: {counts['unchanged']}")
+        logger.info(f"  - Ignorées: {counts['skipped']}")
         
         # Envoyer les alertes pour les nouvelles annonces
         if new_count > 0:
             logger.info(f"Envoi des alertes pour {new_count} nouvelles propriétés...")
             notifier = EmailNotifier()
-            new_properties = [p for p in properties if not db.property_exists(p.get('url'))]
             
             if notifier.send_alert(new_properties):
                 logger.info("Alerte email envoyée avec succès")
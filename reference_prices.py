@@ -0,0 +1,176 @@
+"""
+Prix de référence au m² par commune et type de bien
+
+La table commune_reference contient la médiane et l'écart interquartile (IQR)
+du prix au m² des annonces récentes (fenêtre glissante, DVF compris), par
+commune et type de bien. Elle est recalculée par un job planifié; les communes
+sans données suffisantes reçoivent une estimation tirée de PRIX_PAR_M2.
+
+Chargée en mémoire (dict), elle sert à noter chaque annonce dès son insertion:
+deal_score = (médiane - prix/m²) / IQR, positif sous le prix du marché local.
+"""
+import logging
+import statistics
+import threading
+import time
+
+from config import REFERENCE_CONFIG
+from dedup import commune_key, normalize_text
+from prix_realistes import PRIX_PAR_M2
+
+logger = logging.getLogger(__name__)
+
+# Type de bien '' = tous types confondus (repli quand le type est inconnu)
+ALL_TYPES = ''
+
+
+def property_type_key(property_type):
+    """Type de bien normalisé ('' si inconnu)"""
+    return normalize_text(property_type or '')
+
+
+def compute_references(rows, min_sample=None):
+    """Médiane et quartiles du prix/m² par (commune, type de bien)
+
+    Chaque commune reçoit aussi une ligne tous types confondus (ALL_TYPES).
+
+    Args:
+        rows: tuples (location, property_type, price, surface)
+        min_sample: nombre minimal d'annonces par groupe
+
+    Returns:
+        liste de dicts (commune, property_type, median_price_per_sqm, q1, q3, sample_size)
+    """
+    min_sample = max(2, min_sample or REFERENCE_CONFIG.get('min_sample', 5))
+    groups = {}
+    communes = {}
+    for location, property_type, price, surface in rows:
+        if not price or not surface or price <= 0 or surface <= 0:
+            continue
+        commune = communes.get(location)
+        if commune is None:
+            commune = communes[location] = commune_key(location)
+        if not commune:
+            continue
+        price_per_sqm = price / surface
+        groups.setdefault((commune, ALL_TYPES), []).append(price_per_sqm)
+        type_key = property_type_key(property_type)
+        if type_key:
+            groups.setdefault((commune, type_key), []).append(price_per_sqm)
+
+    references = []
+    for (commune, type_key), values in groups.items():
+        if len(values) < min_sample:
+            continue
+        q1, median, q3 = statistics.quantiles(values, n=4, method='inclusive')
+        references.append({
+            'commune': commune,
+            'property_type': type_key,
+            'median_price_per_sqm': round(median, 2),
+            'q1': round(q1, 2),
+            'q3': round(q3, 2),
+            'sample_size': len(values)
+        })
+    return references
+
+
+def seed_references():
+    """Références estimées (PRIX_PAR_M2) pour les communes sans annonces
+
+    L'IQR est supposé de 2 x seed_spread autour de la valeur de la table.
+    """
+    spread = REFERENCE_CONFIG.get('seed_spread', 0.1)
+    references = []
+    for commune, price_per_sqm in PRIX_PAR_M2.items():
+        references.append({
+            'commune': commune_key(commune),
+            'property_type': ALL_TYPES,
+            'median_price_per_sqm': float(price_per_sqm),
+            'q1': round(price_per_sqm * (1 - spread), 2),
+            'q3': round(price_per_sqm * (1 + spread), 2),
+            'sample_size': 0
+        })
+    return references
+
+
+def deal_score(price, surface, reference):
+    """Écart du prix/m² à la médiane locale, en IQR (positif = moins cher)
+
+    Returns:
+        float arrondi à 2 décimales, ou None sans prix, surface ou référence
+    """
+    if not reference or not price or not surface or surface <= 0:
+        return None
+    median = reference['median_price_per_sqm']
+    iqr = reference['q3'] - reference['q1']
+    if iqr <= 0:
+        # Groupe homogène: IQR minimal pour ne pas diviser par zéro
+        iqr = median * 2 * REFERENCE_CONFIG.get('seed_spread', 0.1)
+    if not iqr:
+        return None
+    return round((median - price / surface) / iqr, 2)
+
+
+class ReferenceTable:
+    """Table commune_reference en mémoire: {(commune, type): référence}
+
+    Rechargée entièrement (quelques centaines de lignes) après un recalcul
+    dans le processus, ou au plus toutes les REFERENCE_CONFIG['refresh_seconds']
+    pour suivre les recalculs faits par le planificateur.
+    """
+
+    def __init__(self, refresh_seconds=None):
+        self.refresh_seconds = (REFERENCE_CONFIG.get('refresh_seconds', 300)
+                                if refresh_seconds is None else refresh_seconds)
+        self._references = {}
+        self._communes = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def due(self):
+        """Vrai si un rechargement depuis la base est nécessaire"""
+        return (self._loaded_at is None
+                or time.monotonic() - self._loaded_at >= self.refresh_seconds)
+
+    def load(self, conn):
+        """Charger la table commune_reference"""
+        rows = conn.execute('''
+            SELECT commune, property_type, median_price_per_sqm, q1, q3, sample_size
+            FROM commune_reference
+        ''').fetchall()
+        references = {
+            (row[0], row[1]): {
+                'median_price_per_sqm': row[2], 'q1': row[3], 'q3': row[4], 'sample_size': row[5]
+            }
+            for row in rows
+        }
+        with self._lock:
+            self._references = references
+            self._loaded_at = time.monotonic()
+
+    def reset(self):
+        """Oublier le contenu: rechargé au prochain accès"""
+        with self._lock:
+            self._references = {}
+            self._loaded_at = None
+
+    def __len__(self):
+        return len(self._references)
+
+    def lookup(self, location, property_type=None):
+        """Référence de la commune pour ce type de bien, sinon tous types confondus"""
+        commune = self._communes.get(location)
+        if commune is None:
+            commune = self._communes[location] = commune_key(location)
+        references = self._references
+        type_key = property_type_key(property_type)
+        if type_key:
+            reference = references.get((commune, type_key))
+            if reference is not None:
+                return reference
+        return references.get((commune, ALL_TYPES))
+
+    def score(self, listing):
+        """deal_score d'une annonce (dict), None sans référence pour sa commune"""
+        return deal_score(listing.get('price'), listing.get('surface'),
+                          self.lookup(listing.get('location'), listing.get('property_type')))
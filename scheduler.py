@@ -15,7 +15,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from logger import setup_logging
 from main import main as scrape_main
-from config import SCHEDULER_CONFIG, NOTIFICATION_CONFIG
+from config import SCHEDULER_CONFIG, NOTIFICATION_CONFIG, REFERENCE_CONFIG
 from database import Database
 from notifier import EmailNotifier
 
@@ -45,20 +45,28 @@ class ImmobilierScheduler:
             notifier = EmailNotifier()
             
             # Obtenir les propriétés des dernières 24 heures
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM properties
-                WHERE created_at >= datetime('now', '-1 day')
-                ORDER BY created_at DESC
-            ''')
-            recent_properties = cursor.fetchall()
+            with self.db.connection() as conn:
+                recent_properties = conn.execute('''
+                    SELECT * FROM properties
+                    WHERE created_at >= datetime('now', '-1 day')
+                    ORDER BY created_at DESC
+                ''').fetchall()
             
             notifier.send_daily_report(stats, recent_properties)
             logger.info("Rapport quotidien envoyé avec succès")
         except Exception as e:
             logger.error(f"Erreur lors du job de rapport: {e}", exc_info=True)
     
+    def reference_job(self):
+        """Job de recalcul des prix de référence par commune"""
+        logger.info(f"Job prix de référence lancé - {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+        try:
+            result = self.db.refresh_commune_reference()
+            logger.info(f"Prix de référence recalculés: {result['references']} commune(s)/type(s), "
+                        f"{result['rescored']} annonce(s) renotée(s)")
+        except Exception as e:
+            logger.error(f"Erreur lors du job prix de référence: {e}", exc_info=True)
+    
     def add_jobs(self):
         """Ajouter les jobs au planificateur"""
         # Job de scraping à intervalle régulier
@@ -83,6 +91,18 @@ class ImmobilierScheduler:
             replace_existing=True
         )
         logger.info(f"Job rapport quotidien ajouté - heure: {send_time}")
+        
+        # Job de recalcul des prix de référence (lancé aussi au démarrage)
+        refresh_hours = REFERENCE_CONFIG['refresh_hours']
+        self.scheduler.add_job(
+            self.reference_job,
+            IntervalTrigger(hours=refresh_hours),
+            id='immobilier_commune_reference',
+            name=f'Prix de référence par commune (toutes les {refresh_hours} heures)',
+            next_run_time=datetime.now(),
+            replace_existing=True
+        )
+        logger.info(f"Job prix de référence ajouté - intervalle: {refresh_hours}h")
     
     def start(self):
         """Démarrer le planificateur"""
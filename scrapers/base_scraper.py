@@ -4,14 +4,24 @@ Scraper de base abstraite pour les différentes plateformes
 import logging
 from abc import ABC, abstractmethod
 from datetime import datetime
-import time
 import requests
 from bs4 import BeautifulSoup
 from retrying import retry
+from config import HTTP_CONFIG
+from .rate_limiter import limiter_for_url
+from .http_cache import CacheMiss, get_response_cache
+from .worker_pool import is_throttle_error
 
 logger = logging.getLogger(__name__)
 
 
+def is_retryable_error(error):
+    """Vrai pour les erreurs réseau, 429 et 5xx; les autres (404, CacheMiss...) remontent"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return is_throttle_error(error)
+
+
 class BaseScraper(ABC):
     """Classe de base abstraite pour les scrapers"""
     
@@ -20,28 +30,73 @@ class BaseScraper(ABC):
         self.config = config
         self.session = requests.Session()
         self.session.headers.update(config.get('headers', {}))
-        self.delay = config.get('delay_between_requests', 1)
-        self.last_request_time = 0
     
-    @retry(stop_max_attempt_number=3, wait_fixed=2000)
+    def rate_limiter(self, url):
+        """Limiteur partagé de l'hôte de `url` (débit et concurrence par site)"""
+        return limiter_for_url(url, self.config)
+    
+    def _cache_lookup(self, url, params):
+        """Consulter le cache HTTP avant une requête
+        
+        Returns:
+            (cache, clé, entrée, corps): `corps` est renseigné si la réponse
+            en cache peut être servie sans requête
+        
+        Raises:
+            CacheMiss: en mode replay si la réponse n'est pas en cache
+        """
+        cache = get_response_cache()
+        if not cache.enabled:
+            return None, None, None, None
+        key = cache.key(url, params)
+        entry = cache.lookup(key)
+        if entry and (cache.replay or cache.is_fresh(entry, self.config.get('cache_ttl'))):
+            body = cache.read(entry)
+            if body is not None:
+                return cache, key, entry, body
+        if cache.replay:
+            raise CacheMiss(f"{url} absent du cache (mode replay)")
+        cache.miss()
+        return cache, key, entry, None
+    
+    def _cache_store(self, cache, key, url, body, headers):
+        if cache is not None:
+            cache.store(key, url, body, etag=headers.get('ETag'),
+                        last_modified=headers.get('Last-Modified'), source=self.name)
+        return body
+    
+    @retry(stop_max_attempt_number=HTTP_CONFIG.get('max_retries', 3),
+           wait_exponential_multiplier=HTTP_CONFIG.get('retry_backoff', 1.0) * 1000,
+           wait_exponential_max=HTTP_CONFIG.get('retry_backoff_max', 30.0) * 1000,
+           wait_jitter_max=HTTP_CONFIG.get('retry_jitter', 1.0) * 1000,
+           retry_on_exception=is_retryable_error)
     def fetch_page(self, url, params=None):
-        """Récupérer le contenu d'une page avec retry et délai"""
-        # Appliquer un délai avant la requête
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.delay:
-            time.sleep(self.delay - elapsed)
+        """Récupérer le contenu d'une page avec retry et limitation de débit
         
+        Les réponses passent par le cache disque: une entrée fraîche est servie
+        sans requête, une entrée périmée est revalidée (304 Not Modified).
+        Seules les erreurs réseau, 429 et 5xx sont retentées, avec un backoff
+        exponentiel et une gigue aléatoire (HTTP_CONFIG).
+        """
+        cache, key, entry, body = self._cache_lookup(url, params)
+        if body is not None:
+            return body
         try:
             logger.debug(f"Requesting {url} with params {params}")
-            response = self.session.get(
-                url,
-                params=params,
-                timeout=self.config.get('timeout', 30),
-                allow_redirects=True
-            )
-            self.last_request_time = time.time()
+            with self.rate_limiter(url).acquire():
+                response = self.session.get(
+                    url,
+                    params=params,
+                    headers=cache.conditional_headers(entry) if cache else None,
+                    timeout=self.config.get('timeout', 30),
+                    allow_redirects=True
+                )
+            if response.status_code == 304 and entry:
+                body = cache.read(entry, revalidated=True)
+                if body is not None:
+                    return body
             response.raise_for_status()
-            return response.text
+            return self._cache_store(cache, key, url, response.text, response.headers)
         except requests.RequestException as e:
             logger.error(f"Erreur lors de la récupération de {url}: {e}")
             raise
@@ -51,6 +106,26 @@ class BaseScraper(ABC):
         """Effectuer une recherche - à implémenter dans les sous-classes"""
         pass
     
+    def work_units(self, zones):
+        """Unités de travail (zone, page) de ce scraper pour le ScraperManager"""
+        pages = self.config.get('max_pages', 1)
+        return [(zone, page) for zone in zones for page in range(1, pages + 1)]
+    
+    def search_zone(self, zone, budget_min, budget_max, dpe_max, page=1):
+        """Scraper une page de résultats d'une zone
+        
+        Par défaut, search() limité à la zone (une seule page); les scrapers
+        paginés la surchargent.
+        """
+        if page > 1:
+            return []
+        return self.search(budget_min, budget_max, dpe_max, [zone])
+    
+    def iter_search(self, budget_min, budget_max, dpe_max, zones):
+        """Version en flux de search(): rend les annonces unité par unité"""
+        for zone, page in self.work_units(zones):
+            yield from self.search_zone(zone, budget_min, budget_max, dpe_max, page)
+    
     @abstractmethod
     def parse_property(self, property_html):
         """Parser une annonce - à implémenter dans les sous-classes"""
@@ -2,8 +2,8 @@
 DVF Scraper - Utilise les données publiques de DVF
 Base de données officielle gratuite du gouvernement français
 """
+import json
 import logging
-import requests
 from datetime import datetime, timedelta
 from .base_scraper import BaseScraper
 
@@ -16,7 +16,8 @@ class DVFOpenDataScraper(BaseScraper):
     def __init__(self, config):
         super().__init__('DVF Open Data', config)
         self.base_url = 'https://data.opendatasoft.com/api/v2/catalog/datasets'
-        self.dvf_dataset = 'dvf-data/records'
+        self.dvf_dataset = config.get('dataset', 'dvf-data')
+        self.page_size = config.get('page_size', 100)
     
     def search(self, budget_min, budget_max, dpe_max, zones):
         """Rechercher les données DVF publiques"""
@@ -37,42 +38,52 @@ class DVFOpenDataScraper(BaseScraper):
         
         return results
     
-    def _search_dvf_zone(self, zone, budget_min, budget_max):
-        """Rechercher les transactions DVF pour une zone donnée"""
+    def _zone_request(self, zone, budget_min, budget_max, page=1):
+        """URL et paramètres de la requête OpenData Soft (DVF) pour une page d'une zone"""
+        url = f"{self.base_url}/{self.dvf_dataset}/records"
+        
+        # Filtres de recherche
+        filters = f"valeur_fonciere >= {budget_min} AND valeur_fonciere <= {budget_max} AND commune_name ILIKE '{zone}'"
+        
+        params = {
+            'limit': self.page_size,
+            'offset': (page - 1) * self.page_size,
+            'where': filters,
+            'order_by': 'date_mutation desc'
+        }
+        return url, params
+    
+    def _convert_dvf_records(self, data, zone, budget_min, budget_max):
+        """Convertir la réponse de l'API en propriétés"""
         properties = []
+        for record in data.get('records', []):
+            prop = self._convert_dvf_record(record, zone, budget_min, budget_max)
+            if prop:
+                properties.append(prop)
+        return properties
+    
+    def search_zone(self, zone, budget_min, budget_max, dpe_max, page=1):
+        """Une page de transactions d'une zone, les plus récentes d'abord
         
+        Unité de travail du ScraperManager (pages limitées par `max_pages`):
+        les erreurs HTTP remontent pour que le pool adaptatif ralentisse sur
+        429/5xx, et une page vide termine la zone.
+        """
+        properties = self._fetch_dvf_page(zone, budget_min, budget_max, page)
+        return [prop for prop in properties if self._is_valid_property(prop, dpe_max)]
+    
+    def _fetch_dvf_page(self, zone, budget_min, budget_max, page=1):
+        url, params = self._zone_request(zone, budget_min, budget_max, page)
+        text = self.fetch_page(url, params)
+        return self._convert_dvf_records(json.loads(text), zone, budget_min, budget_max)
+    
+    def _search_dvf_zone(self, zone, budget_min, budget_max):
+        """Rechercher les transactions DVF pour une zone donnée (première page)"""
         try:
-            # Requête vers l'API OpenData Soft (DVF)
-            url = f"https://data.opendatasoft.com/api/v2/catalog/datasets/{self.dvf_dataset}/records"
-            
-            # Filtres de recherche
-            filters = f"valeur_fonciere >= {budget_min} AND valeur_fonciere <= {budget_max} AND commune_name ILIKE '{zone}'"
-            
-            params = {
-                'limit': 100,
-                'offset': 0,
-                'where': filters,
-                'order_by': 'date_mutation desc'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                records = data.get('records', [])
-                
-                for record in records:
-                    prop = self._convert_dvf_record(record, zone, budget_min, budget_max)
-                    if prop:
-                        properties.append(prop)
-            
-            else:
-                logger.warning(f"DVF API returned {response.status_code}")
-        
+            return self._fetch_dvf_page(zone, budget_min, budget_max)
         except Exception as e:
             logger.error(f"DVF API error: {e}")
-        
-        return properties
+            return []
     
     def _convert_dvf_record(self, record, zone, budget_min, budget_max):
         """Convertir un enregistrement DVF en propriété standardisée"""
@@ -0,0 +1,233 @@
+"""
+Cache disque des réponses HTTP des scrapers
+
+Les corps de réponse sont stockés par empreinte de contenu (SHA-256) et
+indexés dans une petite base SQLite: URL, ETag / Last-Modified, date de
+récupération et dernier accès (éviction LRU au-delà de la taille maximale).
+
+Modes:
+    normal  - servir les réponses fraîches, revalider les autres (304)
+    replay  - hors ligne: uniquement le cache, CacheMiss sinon (tests de parsers)
+    off     - cache désactivé
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from config import HTTP_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+NORMAL = 'normal'
+REPLAY = 'replay'
+OFF = 'off'
+
+
+class CacheMiss(Exception):
+    """Réponse absente du cache en mode replay"""
+
+
+class ResponseCache:
+    """Index SQLite + corps adressés par contenu, avec éviction LRU"""
+
+    def __init__(self, cache_dir=None, max_size_mb=None, default_ttl=None, mode=None):
+        self.cache_dir = Path(cache_dir or HTTP_CACHE_CONFIG['dir'])
+        self.max_bytes = int((max_size_mb or HTTP_CACHE_CONFIG.get('max_size_mb', 200)) * 1024 * 1024)
+        self.default_ttl = default_ttl if default_ttl is not None else HTTP_CACHE_CONFIG.get('default_ttl_seconds', 3600)
+        self.mode = mode or HTTP_CACHE_CONFIG.get('mode', NORMAL)
+        self._bodies = self.cache_dir / 'bodies'
+        self._bodies.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_dir / 'index.db'), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                source TEXT,
+                body_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_body ON responses(body_hash)')
+        self._conn.commit()
+        # Taille des corps indexés, tenue à jour à chaque écriture / suppression
+        self._total_bytes = self._total_size()
+        self._stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+    @property
+    def enabled(self):
+        return self.mode != OFF
+
+    @property
+    def replay(self):
+        return self.mode == REPLAY
+
+    @staticmethod
+    def key(url, params=None):
+        """Clé stable d'une requête GET (URL + paramètres triés)"""
+        query = urlencode(sorted((params or {}).items()), doseq=True)
+        return hashlib.sha256(f"GET {url}?{query}".encode()).hexdigest()
+
+    def _body_path(self, body_hash):
+        return self._bodies / body_hash[:2] / body_hash
+
+    def lookup(self, key):
+        """Entrée d'index (dict) ou None; une entrée sans corps sur disque est oubliée"""
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM responses WHERE key = ?', (key,)).fetchone()
+            if row and not self._body_path(row['body_hash']).exists():
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                self._drop_body_if_unused(row['body_hash'], row['size'])
+                row = None
+        return dict(row) if row else None
+
+    def is_fresh(self, entry, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        return time.time() - entry['fetched_at'] < ttl
+
+    def conditional_headers(self, entry):
+        """En-têtes If-None-Match / If-Modified-Since pour revalider une entrée"""
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, entry, revalidated=False):
+        """Corps d'une entrée (marque l'accès pour le LRU)"""
+        try:
+            body = self._body_path(entry['body_hash']).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                # 304: le contenu est inchangé, la fraîcheur repart de zéro
+                self._conn.execute('UPDATE responses SET last_access = ?, fetched_at = ? WHERE key = ?',
+                                   (now, now, entry['key']))
+                self._stats['revalidated'] += 1
+            else:
+                self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, entry['key']))
+                self._stats['hits'] += 1
+            self._conn.commit()
+        return body
+
+    def miss(self):
+        with self._lock:
+            self._stats['misses'] += 1
+
+    def store(self, key, url, body, etag=None, last_modified=None, source=None):
+        """Enregistrer une réponse 200 puis évincer si la taille max est dépassée"""
+        data = body.encode('utf-8')
+        body_hash = hashlib.sha256(data).hexdigest()
+        path = self._body_path(body_hash)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix('.tmp')
+            tmp.write_bytes(data)
+            tmp.replace(path)
+
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute('SELECT body_hash, size FROM responses WHERE key = ?', (key,)).fetchone()
+            known = self._conn.execute('SELECT 1 FROM responses WHERE body_hash = ? LIMIT 1',
+                                       (body_hash,)).fetchone()
+            self._conn.execute('''
+                INSERT OR REPLACE INTO responses
+                (key, url, source, body_hash, size, etag, last_modified, fetched_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, url, source, body_hash, len(data), etag, last_modified, now, now))
+            self._conn.commit()
+            self._stats['stored'] += 1
+            if not known:
+                self._total_bytes += len(data)
+            if previous and previous['body_hash'] != body_hash:
+                self._drop_body_if_unused(previous['body_hash'], previous['size'])
+            self._evict()
+
+    def _drop_body_if_unused(self, body_hash, size):
+        # Un corps partagé par plusieurs URL n'est supprimé (et décompté) qu'avec sa dernière entrée
+        used = self._conn.execute('SELECT 1 FROM responses WHERE body_hash = ? LIMIT 1', (body_hash,)).fetchone()
+        if not used:
+            self._body_path(body_hash).unlink(missing_ok=True)
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Supprimer les entrées les moins récemment utilisées au-delà de max_bytes"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            'SELECT key, body_hash, size FROM responses ORDER BY last_access'
+        ).fetchall()
+        for row in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (row['key'],))
+            self._drop_body_if_unused(row['body_hash'], row['size'])
+            self._stats['evicted'] += 1
+        self._conn.commit()
+
+    def _total_size(self):
+        # Taille réelle sur disque: un corps partagé par plusieurs URL compte une fois
+        row = self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM responses GROUP BY body_hash)'
+        ).fetchone()
+        return row[0]
+
+    def clear(self):
+        """Vider le cache (index et corps)"""
+        with self._lock:
+            hashes = [row[0] for row in self._conn.execute('SELECT DISTINCT body_hash FROM responses')]
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+            self._total_bytes = 0
+        for body_hash in hashes:
+            self._body_path(body_hash).unlink(missing_ok=True)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            row = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()
+            stats['entries'] = row[0]
+            stats['size_bytes'] = self._total_bytes
+        stats['max_bytes'] = self.max_bytes
+        stats['mode'] = self.mode
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Cache partagé du processus (créé au premier appel)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def set_response_cache(cache):
+    """Remplacer le cache partagé (tests, mode replay); retourne l'ancien"""
+    global _cache
+    with _cache_lock:
+        previous, _cache = _cache, cache
+        return previous
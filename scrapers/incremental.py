@@ -0,0 +1,138 @@
+"""
+Scraping incrémental: arrêt anticipé sur les annonces déjà connues
+
+Chaque (source, zone) garde en base un point de reprise (annonce la plus
+récente vue). Les pages d'une zone sont abandonnées dès qu'une page ne
+contient que des annonces connues: les pages d'une zone sont donc demandées
+l'une après l'autre, les zones restant parallèles. Un run complet
+(resynchronisation) reste possible et est forcé périodiquement.
+
+Seuls les scrapers paginés en profitent: ceux dont `max_pages` dépasse 1 et
+dont search_zone() tient compte de la page (DVF Open Data). Pour les autres,
+une seule page par zone: le run enregistre les points de reprise sans rien
+ignorer.
+"""
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from config import PIPELINE_CONFIG
+from utils import PropertyUtils
+from .worker_pool import WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalCrawl:
+    """État d'un run incrémental, partagé par les unités (source, zone, page)
+
+    Args:
+        db: instance Database (existing_urls, get/save_scrape_states)
+        full_resync: parcourir toutes les pages sans arrêt anticipé
+    """
+
+    def __init__(self, db, full_resync=False, full_resync_hours=None):
+        self.db = db
+        self.full_resync = full_resync
+        self.full_resync_hours = (PIPELINE_CONFIG.get('full_resync_hours')
+                                  if full_resync_hours is None else full_resync_hours)
+        self.states = db.get_scrape_states()
+        self._marks = {}
+        self._stopped = set()
+        self._done = set()
+        self._lock = threading.Lock()
+        self.stats = Counter(skipped_pages=0, stopped_zones=0)
+
+    def is_full(self, source, zone):
+        """Vrai si la zone doit être parcourue entièrement lors de ce run"""
+        if self.full_resync:
+            return True
+        state = self.states.get((source, zone))
+        if not state:
+            return True  # Première visite
+        if self.full_resync_hours:
+            last_full = state.get('last_full_run_at')
+            if not last_full:
+                return True
+            # CURRENT_TIMESTAMP de SQLite: UTC
+            last_full = datetime.strptime(last_full, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+            elapsed = datetime.now(timezone.utc) - last_full
+            return elapsed >= timedelta(hours=self.full_resync_hours)
+        return False
+
+    def schedule(self, units):
+        """Ordonner les unités pour le pool (AdaptiveWorkerPool)
+
+        Dans une zone incrémentale, la page p n'est rendue qu'une fois la page
+        p - 1 traitée par page_done(); WAIT sinon.
+        """
+        pending = list(units)
+        while pending:
+            for i, unit in enumerate(pending):
+                if self._ready(unit):
+                    yield pending.pop(i)
+                    break
+            else:
+                yield WAIT
+
+    def _ready(self, unit):
+        source, zone, page = unit
+        if page == 1 or self.is_full(source, zone):
+            return True
+        with self._lock:
+            return (source, zone) in self._stopped or (source, zone, page - 1) in self._done
+
+    def should_skip(self, unit):
+        """Vrai si une page suivante d'une zone déjà épuisée n'a plus à être demandée"""
+        source, zone, page = unit
+        with self._lock:
+            skip = page > 1 and (source, zone) in self._stopped
+            if skip:
+                self.stats['skipped_pages'] += 1
+        return skip
+
+    def page_done(self, unit, results, error=None):
+        """Mettre à jour le point de reprise et décider de l'arrêt de la zone
+
+        À appeler pour chaque unité terminée, avant d'écrire ses annonces en base.
+        """
+        source, zone, page = unit
+        if error:
+            with self._lock:
+                self._done.add(unit)
+            return
+        listings = [PropertyUtils.normalize_property(prop) for prop in results]
+        newest = max(listings, key=lambda prop: prop.get('posted_date') or '', default=None)
+
+        stop = not listings  # Page vide: fin des résultats
+        if listings and not self.is_full(source, zone):
+            stop = self._all_known(source, zone, listings)
+
+        with self._lock:
+            mark = self._marks.setdefault((source, zone), {'last_listing_id': None, 'last_posted_date': None})
+            if newest and (newest.get('posted_date') or '') >= (mark['last_posted_date'] or ''):
+                mark['last_listing_id'] = newest.get('id')
+                mark['last_posted_date'] = newest.get('posted_date')
+            self._done.add(unit)
+            if stop and (source, zone) not in self._stopped:
+                self._stopped.add((source, zone))
+                self.stats['stopped_zones'] += 1
+        if stop and listings:
+            logger.info(f"{source} ({zone}): page {page} déjà connue, pages suivantes ignorées")
+
+    def _all_known(self, source, zone, listings):
+        """Vrai si chaque URL est en base ou l'annonce antérieure au point de reprise"""
+        known = self.db.existing_urls(prop['url'] for prop in listings if prop.get('url'))
+        mark = (self.states.get((source, zone)) or {}).get('last_posted_date')
+        return all(
+            prop.get('url') in known
+            or (mark and prop.get('posted_date') and prop['posted_date'] < mark)
+            for prop in listings
+        )
+
+    def save(self):
+        """Enregistrer les points de reprise (run terminé)"""
+        self.db.save_scrape_states({
+            key: dict(mark, full=self.is_full(*key)) for key, mark in self._marks.items()
+        })
@@ -2,13 +2,16 @@
 Gestionnaire de scrapers
 """
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from config import SCRAPERS_CONFIG, SEARCH_CONFIG, ALWAYS_ALLOW_SCRAPERS
+from config import SCRAPERS_CONFIG, SEARCH_CONFIG, ALWAYS_ALLOW_SCRAPERS, PIPELINE_CONFIG
+from .worker_pool import AdaptiveWorkerPool
+from .pipeline import IngestPipeline
+from .incremental import IncrementalCrawl
 from .seloger_scraper import SeLogerScraper
 from .pap_scraper import PAPScraper
 from .leboncoin_scraper import LeBonCoinScraper
 from .bienici_scraper import BienIciScraper
 from .dvf_scraper import DVFScraper
+from .dvf_opendata_scraper import DVFOpenDataScraper
 from .test_scraper import TestScraper
 
 logger = logging.getLogger(__name__)
@@ -27,6 +30,10 @@ class ScraperManager:
         if SCRAPERS_CONFIG.get('dvf', {}).get('enabled', True):
             self.scrapers['dvf'] = DVFScraper(SCRAPERS_CONFIG.get('dvf', {'name': 'DVF', 'timeout': 30}))
         
+        # DVF Open Data (API paginée, vraies requêtes réseau): flag individuel uniquement
+        if SCRAPERS_CONFIG.get('dvf_opendata', {}).get('enabled', False):
+            self.scrapers['dvf_opendata'] = DVFOpenDataScraper(SCRAPERS_CONFIG['dvf_opendata'])
+        
         # Respecter le flag individuel ou activer si ALWAYS_ALLOW_SCRAPERS
         if ALWAYS_ALLOW_SCRAPERS or SCRAPERS_CONFIG.get('seloger', {}).get('enabled', False):
             try:
@@ -60,51 +67,171 @@ class ScraperManager:
         self.scrapers = {}
         self._init_scrapers()
     
-    def scrape_all(self, budget_min=None, budget_max=None, dpe_max=None, zones=None):
-        """Scraper toutes les plateformes en parallèle"""
-        budget_min = budget_min or SEARCH_CONFIG['budget_min']
-        budget_max = budget_max or SEARCH_CONFIG['budget_max']
-        dpe_max = dpe_max or SEARCH_CONFIG['dpe_max']
-        zones = zones or SEARCH_CONFIG['zones']
+    def work_units(self, zones, sources=None):
+        """Unités de travail (source, zone, page) pour les scrapers actifs
         
-        all_results = []
+        Triées par page: toutes les premières pages partent avant les suivantes,
+        ce qui laisse au scraping incrémental le temps d'arrêter une zone.
+        """
+        names = list(self.scrapers) if sources is None else sources
+        units = [
+            (name, zone, page)
+            for name in names
+            for zone, page in self.scrapers[name].work_units(zones)
+        ]
+        return sorted(units, key=lambda unit: unit[2])
+    
+    def iter_units(self, budget_min, budget_max, dpe_max, zones, sources=None, pool=None, crawl=None):
+        """Scraper les unités sur le pool adaptatif et les rendre dès leur fin
+        
+        Args:
+            crawl: IncrementalCrawl optionnel; il ordonne les pages de chaque
+                   zone et celles d'une zone arrêtée ne sont pas demandées
+                   (résultat vide). Le consommateur appelle crawl.page_done().
         
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = {}
-            
-            for name, scraper in self.scrapers.items():
-                future = executor.submit(
-                    scraper.search,
-                    budget_min, budget_max, dpe_max, zones
-                )
-                futures[future] = name
-            
-            for future in as_completed(futures):
-                scraper_name = futures[future]
-                try:
-                    results = future.result()
-                    all_results.extend(results)
-                    logger.info(f"{scraper_name}: {len(results)} propriétés scrapées")
-                except Exception as e:
-                    logger.error(f"Erreur lors du scraping de {scraper_name}: {e}")
+        Yields:
+            ((source, zone, page), résultats, erreur ou None)
+        """
+        pool = pool or AdaptiveWorkerPool()
         
+        def run(unit):
+            name, zone, page = unit
+            if crawl and crawl.should_skip(unit):
+                return []
+            return self.scrapers[name].search_zone(zone, budget_min, budget_max, dpe_max, page)
+        
+        units = self.work_units(zones, sources)
+        if crawl:
+            units = crawl.schedule(units)
+        for unit, results, error, duration in pool.imap_unordered(run, units):
+            self._log_unit(unit, results, error, duration)
+            yield unit, results or [], error
+    
+    def _log_unit(self, unit, results, error, duration):
+        name, zone, page = unit
+        if error:
+            logger.error(f"Erreur lors du scraping de {name} ({zone}, page {page}): {error}")
+        else:
+            logger.debug(f"{name} ({zone}, page {page}): {len(results)} propriétés en {duration:.1f}s")
+    
+    def _criteria(self, budget_min, budget_max, dpe_max, zones):
+        return (budget_min or SEARCH_CONFIG['budget_min'],
+                budget_max or SEARCH_CONFIG['budget_max'],
+                dpe_max or SEARCH_CONFIG['dpe_max'],
+                zones or SEARCH_CONFIG['zones'])
+    
+    def _produce(self, emit, budget_min, budget_max, dpe_max, zones, sources=None, on_progress=None,
+                 crawl=None):
+        """Scraper toutes les unités et passer les résultats de chacune à emit()
+        
+        Avec `crawl`, chaque page est comparée à la base avant d'être émise
+        (arrêt anticipé).
+        """
+        if sources is not None:
+            for name in sources:
+                if name not in self.scrapers:
+                    logger.error(f"Scraper {name} non trouvé")
+                    if on_progress:
+                        on_progress(name, 0, 'Scraper non trouvé ou désactivé')
+            sources = [name for name in sources if name in self.scrapers]
+        
+        tracker = _SourceTracker(self.work_units(zones, sources), on_progress)
+        
+        for unit, results, error in self.iter_units(budget_min, budget_max, dpe_max, zones,
+                                                    sources, crawl=crawl):
+            if crawl:
+                crawl.page_done(unit, results, error)
+            emit(results)
+            tracker.unit_done(unit, len(results), error)
+    
+    def iter_search(self, budget_min=None, budget_max=None, dpe_max=None, zones=None, sources=None):
+        """Rendre les annonces au fil de l'eau, dès que chaque unité se termine"""
+        budget_min, budget_max, dpe_max, zones = self._criteria(budget_min, budget_max, dpe_max, zones)
+        for unit, results, error in self.iter_units(budget_min, budget_max, dpe_max, zones, sources):
+            yield from results
+    
+    def ingest(self, db, budget_min=None, budget_max=None, dpe_max=None, zones=None,
+               sources=None, on_progress=None, on_batch=None, full_resync=False):
+        """Scraper et enregistrer en flux: scraping → normalisation → validation → base
+        
+        Les étapes sont reliées par des files bornées; chaque lot validé est
+        écrit avec db.add_properties_bulk dès qu'il est plein (ou après
+        PIPELINE_CONFIG['flush_seconds']).
+        
+        Args:
+            db: instance Database
+            on_progress: callback (nom, nombre de résultats, erreur) par source
+            on_batch: callback appelé avec [(annonce, outcome)] de chaque lot écrit
+            full_resync: parcourir toutes les pages, sans arrêt anticipé sur les
+                         annonces connues (PIPELINE_CONFIG['incremental'])
+        
+        Returns:
+            compteurs de IngestPipeline.run (scraped, valid, rejected, inserted...),
+            plus skipped_pages et stopped_zones en mode incrémental
+        """
+        budget_min, budget_max, dpe_max, zones = self._criteria(budget_min, budget_max, dpe_max, zones)
+        crawl = None
+        if PIPELINE_CONFIG.get('incremental', True) or full_resync:
+            crawl = IncrementalCrawl(db, full_resync=full_resync)
+        pipeline = IngestPipeline(db.add_properties_bulk, on_batch=on_batch)
+        stats = pipeline.run(lambda emit: self._produce(
+            emit, budget_min, budget_max, dpe_max, zones, sources, on_progress, crawl
+        ))
+        if crawl:
+            # Toutes les annonces sont écrites: les points de reprise peuvent avancer
+            crawl.save()
+            stats.update(crawl.stats)
+        return stats
+    
+    def scrape_all(self, budget_min=None, budget_max=None, dpe_max=None, zones=None,
+                   on_progress=None, sources=None):
+        """Scraper toutes les plateformes en parallèle
+        
+        Chaque (source, zone, page) est une unité de travail distincte: la
+        durée totale suit l'unité la plus lente, pas la somme des zones.
+        Pour enregistrer en base au fil de l'eau, préférer ingest().
+        
+        Args:
+            on_progress: callback optionnel appelé à la fin de chaque source
+                         avec (nom, nombre de résultats, erreur ou None)
+            sources: restreindre à certains scrapers (tous par défaut)
+        """
+        budget_min, budget_max, dpe_max, zones = self._criteria(budget_min, budget_max, dpe_max, zones)
+        all_results = []
+        self._produce(all_results.extend, budget_min, budget_max, dpe_max, zones, sources, on_progress)
         return all_results
     
     def scrape_single(self, scraper_name, budget_min=None, budget_max=None, 
-                     dpe_max=None, zones=None):
+                     dpe_max=None, zones=None, on_progress=None):
         """Scraper une seule plateforme"""
-        budget_min = budget_min or SEARCH_CONFIG['budget_min']
-        budget_max = budget_max or SEARCH_CONFIG['budget_max']
-        dpe_max = dpe_max or SEARCH_CONFIG['dpe_max']
-        zones = zones or SEARCH_CONFIG['zones']
-        
-        scraper = self.scrapers.get(scraper_name)
-        if not scraper:
-            logger.error(f"Scraper {scraper_name} non trouvé")
-            return []
-        
-        try:
-            return scraper.search(budget_min, budget_max, dpe_max, zones)
-        except Exception as e:
-            logger.error(f"Erreur lors du scraping de {scraper_name}: {e}")
-            return []
+        return self.scrape_all(budget_min, budget_max, dpe_max, zones,
+                               on_progress=on_progress, sources=[scraper_name])
+
+
+class _SourceTracker:
+    """Regrouper les unités terminées par source pour le callback on_progress"""
+    
+    def __init__(self, units, on_progress=None):
+        self.on_progress = on_progress
+        self.sources = {}
+        for name, _, _ in units:
+            entry = self.sources.setdefault(name, {'remaining': 0, 'units': 0, 'count': 0, 'errors': []})
+            entry['remaining'] += 1
+            entry['units'] += 1
+    
+    def unit_done(self, unit, count, error=None):
+        entry = self.sources[unit[0]]
+        entry['remaining'] -= 1
+        entry['count'] += count
+        if error:
+            entry['errors'].append(str(error))
+        if entry['remaining'] == 0:
+            self._source_done(unit[0], entry)
+    
+    def _source_done(self, name, entry):
+        logger.info(f"{name}: {entry['count']} propriétés scrapées "
+                    f"({entry['units']} unités, {len(entry['errors'])} en échec)")
+        # La source n'est en échec que si aucune unité n'a abouti
+        error = entry['errors'][0] if len(entry['errors']) == entry['units'] else None
+        if self.on_progress:
+            self.on_progress(name, entry['count'], error)
@@ -0,0 +1,194 @@
+"""
+Pipeline en flux: scraping → normalisation → validation → écriture en base
+
+Chaque étape tourne dans son propre thread et communique par des files
+bornées: la mémoire reste constante et les premières annonces sont écrites
+dès que la première unité de scraping se termine.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+
+from config import PIPELINE_CONFIG
+from utils import PropertyUtils
+from validators import validate_property
+
+logger = logging.getLogger(__name__)
+
+# Marqueur de fin de flux entre deux étapes
+_END = object()
+
+
+class PipelineAborted(Exception):
+    """Une étape aval a échoué: l'étape amont doit s'arrêter"""
+
+
+def prepare_listing(prop):
+    """Normaliser puis valider une annonce brute; None si elle est rejetée
+
+    Les champs validés remplacent ceux de l'annonce normalisée: les champs
+    absents de PropertyModel (rooms, description, ges...) sont conservés.
+    """
+    try:
+        listing = PropertyUtils.normalize_property(prop)
+        listing.update(validate_property(listing))
+        return listing
+    except Exception as e:
+        logger.warning(f"Propriété ignorée (validation): {e}")
+        return None
+
+
+class IngestPipeline:
+    """Ingestion en flux des annonces scrapées
+
+    Args:
+        write_batch: fonction recevant une liste d'annonces validées et
+                     retournant [(annonce, outcome)] (Database.add_properties_bulk)
+        on_batch: callback optionnel appelé avec le résultat de chaque lot écrit
+    """
+
+    def __init__(self, write_batch, on_batch=None, batch_size=None, queue_size=None,
+                 flush_seconds=None, prepare=prepare_listing):
+        self.write_batch = write_batch
+        self.on_batch = on_batch
+        self.prepare = prepare
+        self.batch_size = batch_size or PIPELINE_CONFIG.get('batch_size', 200)
+        self.flush_seconds = flush_seconds or PIPELINE_CONFIG.get('flush_seconds', 1.0)
+        size = queue_size or PIPELINE_CONFIG.get('queue_size', 1000)
+        self._raw = queue.Queue(maxsize=size)
+        self._valid = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._errors = []
+        self.stats = Counter(scraped=0, valid=0, rejected=0, batches=0)
+        self._started = None
+
+    def _put(self, q, item):
+        """Ajouter à une file bornée (attente = contre-pression) sauf si arrêt"""
+        while True:
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._stop.is_set():
+                    raise PipelineAborted()
+
+    def _get(self, q):
+        """Lire une file; après un arrêt, PipelineAborted une fois la file vidée"""
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    raise PipelineAborted()
+
+    def emit(self, listings):
+        """Envoyer des annonces brutes dans le pipeline (appelé par le producteur)"""
+        for prop in listings:
+            self.stats['scraped'] += 1
+            self._put(self._raw, prop)
+
+    def run(self, produce):
+        """Exécuter le pipeline; `produce(emit)` scrape et appelle emit(annonces)
+
+        Returns:
+            compteurs: scraped, valid, rejected, batches, outcomes par type
+            ('inserted', 'price_changed', ...) et first_write_seconds
+        """
+        self._started = time.monotonic()
+        stages = [
+            threading.Thread(target=self._produce, args=(produce,), name='pipeline-scrape', daemon=True),
+            threading.Thread(target=self._transform, name='pipeline-validate', daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+        try:
+            self._write()
+        except BaseException:
+            self._stop.set()
+            raise
+        finally:
+            for stage in stages:
+                stage.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return dict(self.stats)
+
+    def _produce(self, produce):
+        try:
+            produce(self.emit)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            logger.error(f"Erreur du scraping en flux: {e}")
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._put_end(self._raw)
+
+    def _transform(self):
+        try:
+            while True:
+                prop = self._get(self._raw)
+                if prop is _END:
+                    break
+                validated = self.prepare(prop)
+                if validated is None:
+                    self.stats['rejected'] += 1
+                    continue
+                self.stats['valid'] += 1
+                self._put(self._valid, validated)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            logger.error(f"Erreur de validation en flux: {e}")
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._put_end(self._valid)
+
+    def _put_end(self, q):
+        # La fin de flux doit passer même si l'aval est plein: on attend
+        # tant que le pipeline n'est pas arrêté
+        try:
+            self._put(q, _END)
+        except PipelineAborted:
+            pass
+
+    def _write(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._valid.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+                if self._stop.is_set():
+                    # Étape amont en échec: écrire ce qui a déjà été validé
+                    self._flush(batch)
+                    return
+
+            if item is _END:
+                self._flush(batch)
+                return
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or (batch and time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_seconds
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        outcomes = self.write_batch(batch)
+        self.stats['batches'] += 1
+        self.stats.update(outcome for _, outcome in outcomes)
+        if 'first_write_seconds' not in self.stats:
+            self.stats['first_write_seconds'] = round(time.monotonic() - self._started, 3)
+        if self.on_batch:
+            self.on_batch(outcomes)
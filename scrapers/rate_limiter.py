@@ -0,0 +1,121 @@
+"""
+Limiteur de débit global par hôte (token bucket + plafond de concurrence)
+
+Partagé par tous les scrapers, threads et jobs du processus:
+recharger les scrapers ou lancer plusieurs jobs en parallèle ne permet jamais
+de dépasser le budget de requêtes d'un site.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class HostRateLimiter:
+    """Token bucket (débit + rafale) et nombre maximal de requêtes simultanées"""
+
+    def __init__(self, host, requests_per_second=1.0, burst=1, max_concurrent=2):
+        self.host = host
+        self.rate = float(requests_per_second) if requests_per_second else None
+        self.burst = max(1, int(burst))
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._stats = {'requests': 0, 'throttled': 0, 'wait_seconds': 0.0}
+
+    def _reserve(self):
+        """Réserver un jeton; retourne le délai à attendre avant d'envoyer
+
+        Le solde peut devenir négatif: chaque appelant réserve sa place dans
+        la file sans garder le verrou pendant l'attente.
+        """
+        with self._lock:
+            self._stats['requests'] += 1
+            if self.rate is None:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            wait = -self._tokens / self.rate
+            self._stats['throttled'] += 1
+            self._stats['wait_seconds'] += wait
+            return wait
+
+    @contextmanager
+    def acquire(self):
+        """Attendre un jeton et une place libre (code synchrone / Selenium)"""
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+        self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'host': self.host,
+            'requests_per_second': self.rate,
+            'burst': self.burst,
+            'max_concurrent': self.max_concurrent
+        })
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        return stats
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limit_settings(config):
+    """Paramètres du limiteur pour la configuration d'un scraper
+
+    Sans clé `rate_limit`, le débit découle de `delay_between_requests`.
+    """
+    settings = dict(config.get('rate_limit') or {})
+    if 'requests_per_second' not in settings:
+        delay = config.get('delay_between_requests', 1)
+        settings['requests_per_second'] = 1.0 / delay if delay else None
+    return settings
+
+
+def get_rate_limiter(host, settings=None):
+    """Limiteur partagé d'un hôte (créé avec `settings` au premier appel)"""
+    host = (host or '').lower()
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = HostRateLimiter(host, **(settings or {}))
+            _limiters[host] = limiter
+            logger.debug(f"Limiteur {host}: {limiter.rate} req/s, rafale {limiter.burst}, "
+                         f"{limiter.max_concurrent} simultanées")
+        return limiter
+
+
+def limiter_for_url(url, config):
+    """Limiteur de l'hôte de `url`, configuré depuis SCRAPERS_CONFIG[...]"""
+    return get_rate_limiter(urlparse(url).hostname, rate_limit_settings(config))
+
+
+def rate_limiter_stats():
+    """Statistiques de tous les limiteurs actifs"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.stats() for limiter in limiters]
+
+
+def reset_rate_limiters():
+    """Oublier les limiteurs (après modification de la configuration)"""
+    with _limiters_lock:
+        _limiters.clear()
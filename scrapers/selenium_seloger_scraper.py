@@ -63,7 +63,8 @@ class SeleniumSeLogerScraper(BaseScraper):
             url = f"{self.base_url}?budgetMin={budget_min}&budgetMax={budget_max}"
             logger.info(f"Scraping: {url}")
             
-            self.driver.get(url)
+            with self.rate_limiter(url).acquire():
+                self.driver.get(url)
             # Attendre que les annonces se chargent
             WebDriverWait(self.driver, 10).until(
                 EC.presence_of_all_elements_located((By.CLASS_NAME, "se_listing"))
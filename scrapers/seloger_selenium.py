@@ -63,7 +63,8 @@ class SeLogerSeleniumScraper(BaseScraper):
             url = f"https://www.seloger.com/acheter/paris_75,hauts-de-seine_92,val-de-marne_94/achat/appartement,maison/?budgetMin={budget_min}&budgetMax={budget_max}"
             
             logger.info(f"Accès à: {url[:80]}...")
-            driver.get(url)
+            with self.rate_limiter(url).acquire():
+                driver.get(url)
             
             # Attendre le chargement initial
             time.sleep(5)
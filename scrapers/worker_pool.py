@@ -0,0 +1,116 @@
+"""
+Pool de workers adaptatif pour les unités de scraping (source, zone, page)
+
+La concurrence suit un schéma AIMD: elle augmente d'un worker tant que les
+sources répondent vite et se divise par deux sur 429/5xx.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config import SCHEDULER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Rendu par un itérateur d'unités: aucune unité prête tant qu'une unité en
+# cours ne s'est pas terminée (pages successives d'une même zone)
+WAIT = object()
+
+
+def is_throttle_error(error):
+    """Vrai pour les réponses 429 / 5xx (requests.HTTPError)"""
+    if error is None:
+        return False
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class AdaptiveConcurrency:
+    """Limite de concurrence ajustée selon la latence et les erreurs observées"""
+
+    def __init__(self, min_workers=None, max_workers=None, initial_workers=None, target_latency=None):
+        self.max_workers = max(1, max_workers or SCHEDULER_CONFIG.get('max_workers', 3))
+        self.min_workers = max(1, min(min_workers or SCHEDULER_CONFIG.get('min_workers', 1), self.max_workers))
+        initial = initial_workers or SCHEDULER_CONFIG.get('initial_workers', self.min_workers)
+        self.limit = max(self.min_workers, min(initial, self.max_workers))
+        self.target_latency = target_latency or SCHEDULER_CONFIG.get('target_latency_seconds', 5)
+        self._successes = 0
+        self._lock = threading.Lock()
+        self._stats = {'units': 0, 'errors': 0, 'throttled': 0, 'peak': self.limit}
+
+    def record(self, latency, error=None):
+        """Ajuster la limite après une unité terminée"""
+        with self._lock:
+            self._stats['units'] += 1
+            if is_throttle_error(error):
+                self._stats['throttled'] += 1
+                self._successes = 0
+                self.limit = max(self.min_workers, self.limit // 2)
+                logger.info(f"Limitation détectée: concurrence réduite à {self.limit}")
+            elif error is not None:
+                self._stats['errors'] += 1
+            elif latency > self.target_latency:
+                self._successes = 0
+                self.limit = max(self.min_workers, self.limit - 1)
+            else:
+                # Augmentation additive: +1 après une « fenêtre » de succès rapides
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_workers:
+                    self.limit += 1
+                    self._successes = 0
+                    self._stats['peak'] = max(self._stats['peak'], self.limit)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({'limit': self.limit, 'min_workers': self.min_workers, 'max_workers': self.max_workers})
+        return stats
+
+
+class AdaptiveWorkerPool:
+    """Exécuter des unités de travail en parallèle et les rendre dès leur fin"""
+
+    def __init__(self, controller=None, **kwargs):
+        self.controller = controller or AdaptiveConcurrency(**kwargs)
+
+    def imap_unordered(self, func, units):
+        """Générateur de (unité, résultat, erreur, durée) dans l'ordre de fin
+        
+        `units` est consulté à nouveau après chaque unité rendue: il peut
+        rendre WAIT pour différer la suite jusqu'à la fin d'une unité en cours.
+        """
+        units = iter(units)
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=self.controller.max_workers,
+                                      thread_name_prefix='scrape-unit')
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < self.controller.limit:
+                    unit = next(units, None)
+                    if unit is None:
+                        exhausted = True
+                        break
+                    if unit is WAIT:
+                        if not pending:
+                            raise RuntimeError("Aucune unité prête ni en cours")
+                        break
+                    pending[executor.submit(func, unit)] = (unit, time.monotonic())
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit, started = pending.pop(future)
+                    yield self._finished(unit, started, future.result, future.exception)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, unit, started, result, exception):
+        duration = time.monotonic() - started
+        error = exception()
+        self.controller.record(duration, error)
+        return unit, (None if error else result()), error, duration
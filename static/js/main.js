@@ -33,6 +33,81 @@ function showNotification(message, type = 'info') {
     }, 3000);
 }
 
+// Flux d'événements serveur (remplace le polling)
+function subscribeEvents(handlers) {
+    if (!window.EventSource) return null;
+    
+    const types = Object.keys(handlers);
+    const source = new EventSource('/api/stream/events?types=' + encodeURIComponent(types.join(',')));
+    
+    // EventSource se reconnecte seul et renvoie Last-Event-ID
+    types.forEach(type => {
+        source.addEventListener(type, e => handlers[type](JSON.parse(e.data)));
+    });
+    return source;
+}
+
+// Attendre la fin d'un job de scraping (/api/scrape répond avant la fin)
+function waitForJob(jobId) {
+    return new Promise((resolve, reject) => {
+        const checkJob = () => fetch('/api/jobs/' + jobId)
+            .then(r => r.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.error);
+                if (data.job.status === 'done' || data.job.status === 'failed') {
+                    if (source) source.close();
+                    resolve(data.job);
+                }
+            })
+            .catch(e => {
+                if (source) source.close();
+                reject(e);
+            });
+        
+        const source = subscribeEvents({
+            'scrape-progress': event => {
+                if (event.job_id === jobId && event.stage === 'finished') checkJob();
+            }
+        });
+        // Le job a pu se terminer avant l'ouverture du flux
+        if (source) {
+            source.addEventListener('open', checkJob);
+        } else {
+            checkJob();
+        }
+    });
+}
+
+function jobSummary(job) {
+    if (job.status === 'failed') return 'Erreur: ' + job.error;
+    return `${job.result.total} annonce(s) trouvée(s), ${job.result.new} nouvelle(s)`;
+}
+
+function renderSchedulerState(state) {
+    if (state.frequency) document.getElementById('frequency').textContent = state.frequency;
+    if (state.last_run) document.getElementById('lastRun').textContent = state.last_run;
+}
+
+// Mêmes règles que les filtres SQL: filtre vide ignoré, DPE inconnu exclu
+const DPE_ORDER = 'ABCDEFG';
+
+function matchesFilters(listing, filters) {
+    if (filters.price_min && !(listing.price >= filters.price_min)) return false;
+    if (filters.price_max && !(listing.price <= filters.price_max)) return false;
+    if (filters.dpe_max) {
+        // DPE inconnu compté comme G, comme DPE_MAPPING.get(dpe, 6) côté base
+        const index = listing.dpe ? DPE_ORDER.indexOf(listing.dpe) : -1;
+        const dpe = index < 0 ? DPE_ORDER.length - 1 : index;
+        if (dpe > DPE_ORDER.indexOf(filters.dpe_max)) return false;
+    }
+    return true;
+}
+
+function incrementCounter(id) {
+    const el = document.getElementById(id);
+    if (el) el.textContent = (parseInt(el.textContent) || 0) + 1;
+}
+
 // Formatage
 function formatPrice(price) {
     return new Intl.NumberFormat('fr-FR', {
@@ -52,13 +127,18 @@ async function scrapeAll() {
     button.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Scraping...';
     
     const result = await apiCall('/api/scrape', 'POST', {source: 'all'});
+    const job = result && result.success ? await waitForJob(result.job_id).catch(() => null) : null;
     
     button.disabled = false;
     button.innerHTML = '<i class="fas fa-search"></i> Scraper Maintenant';
     
-    if (result && result.success) {
-        showNotification(`${result.new} nouvelle(s) propriété(s) trouvée(s)`, 'success');
+    if (job && job.status === 'done') {
+        showNotification(`${job.result.new} nouvelle(s) propriété(s) trouvée(s)`, 'success');
         setTimeout(() => location.reload(), 1000);
+    } else if (job) {
+        showNotification(jobSummary(job), 'error');
+    } else if (result && result.error) {
+        showNotification(result.error, 'error');
     }
 }
 
@@ -242,10 +322,7 @@ async function updateSchedulerStatus() {
     const result = await apiCall('/api/scheduler/status');
     
     if (result) {
-        document.getElementById('runningStatus').textContent = 
-            result.running ? 'En cours' : 'Arrêté';
-        document.getElementById('lastRun').textContent = result.last_run;
-        document.getElementById('nextRun').textContent = result.next_run;
+        renderSchedulerState(result);
     }
 }
 
@@ -266,12 +343,15 @@ async function runNow() {
     button.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Scraping...';
     
     const result = await apiCall('/api/scrape', 'POST', {source: 'all'});
+    const job = result && result.success ? await waitForJob(result.job_id).catch(() => null) : null;
     
     button.disabled = false;
     button.innerHTML = '<i class="fas fa-flash"></i> Scraper Maintenant';
     
-    if (result && result.success) {
-        showNotification(result.message, 'success');
+    if (job) {
+        showNotification(jobSummary(job), job.status === 'done' ? 'success' : 'error');
+    } else if (result && result.error) {
+        showNotification(result.error, 'error');
     }
 }
 
@@ -290,12 +370,24 @@ document.addEventListener('DOMContentLoaded', function() {
     // Mettre à jour le statut du planificateur si sur la page scheduler
     if (document.getElementById('schedulerStatus')) {
         updateSchedulerStatus();
-        setInterval(updateSchedulerStatus, 30000); // Toutes les 30s
+        subscribeEvents({'scheduler-state': renderSchedulerState});
     }
     
     // Charger les stats si sur le dashboard
-    if (document.querySelector('.dashboard')) {
+    const dashboard = document.querySelector('.dashboard');
+    if (dashboard) {
         loadStats();
+        const filters = JSON.parse(dashboard.dataset.filters || '{}');
+        subscribeEvents({
+            'new-listing': listing => {
+                // Les compteurs du dashboard ne portent que sur les annonces filtrées
+                if (matchesFilters(listing, filters)) {
+                    incrementCounter('total-properties');
+                    incrementCounter('new-24h');
+                }
+                showNotification(`Nouvelle annonce: ${listing.title} (${formatPrice(listing.price)})`, 'success');
+            }
+        });
     }
 });
 
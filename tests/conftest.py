@@ -0,0 +1,46 @@
+"""
+Fixtures communes des tests: base SQLite temporaire, client Flask et annonces de test
+"""
+import pytest
+
+from config import DATABASE_CONFIG
+from database.db import Database
+
+
+@pytest.fixture
+def tmp_db(tmp_path, monkeypatch):
+    """Base de données isolée dans un répertoire temporaire"""
+    monkeypatch.setitem(DATABASE_CONFIG, 'path', tmp_path / 'test.db')
+    monkeypatch.setitem(DATABASE_CONFIG, 'backup_dir', tmp_path / 'backups')
+    return Database()
+
+
+@pytest.fixture
+def app_client(tmp_db, monkeypatch):
+    """Client de test Flask (app.py) branché sur la base temporaire, sans serveur"""
+    # Importé après tmp_db: le Database() du module vise déjà le répertoire temporaire
+    import app as app_module
+    from cache import TTLCache
+    from comparables import ComparablesIndex
+
+    monkeypatch.setattr(app_module, 'db', tmp_db)
+    monkeypatch.setattr(app_module, 'comparables', ComparablesIndex(tmp_db))
+    monkeypatch.setattr(app_module, 'stats_cache', TTLCache(generation=lambda: tmp_db.generation))
+    app_module.app.config['TESTING'] = True
+    return app_module.app.test_client()
+
+
+def make_listing(n, **overrides):
+    """Annonce de test numéro `n`; `overrides` remplace les champs par défaut"""
+    listing = {
+        'id': f'prop_{n}',
+        'source': 'test',
+        'url': f'https://test.com/prop{n}',
+        'title': f'Appartement {n}',
+        'location': 'Paris',
+        'price': 200000.0 + n * 1000,
+        'surface': 40.0 + n,
+        'dpe': 'C',
+    }
+    listing.update(overrides)
+    return listing
@@ -0,0 +1,86 @@
+"""
+Tests des statistiques vectorisées (analytics.py)
+"""
+import statistics
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from analytics import ListingArrays
+from analyzer import PropertyComparator
+
+
+def listing(price, surface, location='Paris', source='pap', dpe='C', rooms=None):
+    return {'price': price, 'surface': surface, 'location': location, 'source': source,
+            'dpe': dpe, 'rooms': rooms, 'status': 'disponible'}
+
+
+LISTINGS = [
+    listing(200000.0, 40.0, rooms=2),
+    listing(300000.0, 50.0, rooms=3),
+    listing(250000.0, None),
+    listing(None, 30.0, source='seloger'),
+    listing(150000.0, 60.0, location='Lyon', source='seloger', dpe='E'),
+    listing(180000.0, 45.0, location='Lyon', dpe='E', rooms=2),
+]
+
+
+# ============ GROUPES ============
+
+def test_group_stats_match_python():
+    stats = ListingArrays.from_listings(LISTINGS).group_stats('location')
+    assert list(stats) == ['Paris', 'Lyon']
+
+    paris = stats['Paris']
+    assert paris['count'] == 4
+    assert paris['avg_price'] == pytest.approx(250000.0)
+    assert paris['median_price'] == 250000.0
+    assert (paris['min_price'], paris['max_price']) == (200000.0, 300000.0)
+    assert paris['price_percentiles']['p25'] == 225000.0
+    assert paris['avg_surface'] == pytest.approx(40.0)
+    assert paris['avg_rooms'] == pytest.approx(2.5)
+    assert paris['median_price_per_sqm'] == pytest.approx(statistics.median([5000.0, 6000.0]))
+
+    lyon = stats['Lyon']
+    assert lyon['median_price'] == 165000.0
+    assert lyon['avg_price_per_sqm'] == pytest.approx((2500.0 + 4000.0) / 2)
+
+
+def test_summary_and_empty_groups():
+    arrays = ListingArrays.from_listings(LISTINGS)
+    summary = arrays.summary()
+    assert summary['count'] == 6
+    assert summary['median_price'] == 200000.0
+    assert summary['price_percentiles']['p90'] == pytest.approx(statistics.quantiles(
+        [200000.0, 300000.0, 250000.0, 150000.0, 180000.0], n=10, method='inclusive')[-1])
+
+    assert arrays.group_stats('source')['seloger']['avg_price'] == 150000.0
+    assert set(arrays.group_stats('dpe')) == {'C', 'E'}
+    with pytest.raises(ValueError):
+        arrays.group_stats('price')
+
+    empty = ListingArrays([]).summary()
+    assert empty['count'] == 0
+    assert empty['median_price'] is None
+
+
+def test_from_database(tmp_db):
+    tmp_db.add_properties_bulk([dict(prop, id=f'p{n}', url=f'https://test.com/{n}', title=f'Annonce {n}')
+                            for n, prop in enumerate(LISTINGS) if prop['price']])
+
+    stats = ListingArrays.from_database(tmp_db, filters={'price_max': 210000}).group_stats('location')
+    assert {commune: group['count'] for commune, group in stats.items()} == {'Paris': 1, 'Lyon': 2}
+
+
+# ============ COMPARATEUR ============
+
+def test_compare_properties():
+    props = [dict(prop, id=n) for n, prop in enumerate(LISTINGS)]
+    comparison = PropertyComparator.compare_properties(props)
+    assert comparison['price'] == {'min': 150000.0, 'max': 300000.0,
+                                   'avg': pytest.approx(1080000.0 / 6)}
+    assert comparison['surface'] == {'min': 30.0, 'max': 60.0}
+    assert comparison['best_value'] == 4
+    assert comparison['most_expensive'] == 1
+    assert comparison['largest'] == 4
@@ -0,0 +1,61 @@
+"""
+Tests unitaires du cache TTL/LRU
+"""
+import time
+
+from cache import TTLCache, cache_key
+
+
+def test_cache_hit_and_miss():
+    """Deuxième lecture servie par le cache"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    calls = []
+    compute = lambda: calls.append(1) or 42
+
+    assert cache.get_or_compute('k', compute) == 42
+    assert cache.get_or_compute('k', compute) == 42
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_cache_generation_invalidates():
+    """Une écriture (nouvelle génération) invalide les entrées"""
+    generation = [0]
+    cache = TTLCache(maxsize=10, ttl=60, generation=lambda: generation[0])
+    cache.set('k', 'old')
+    generation[0] += 1
+    assert cache.get('k') == (False, None)
+    assert cache.stats()['invalidated'] == 1
+
+
+def test_cache_ttl_expires():
+    """Les entrées expirent après le TTL"""
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set('k', 'v')
+    time.sleep(0.02)
+    assert cache.get('k') == (False, None)
+
+
+def test_cache_lru_eviction():
+    """L'entrée la moins récemment utilisée est évincée"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_key_ignores_filter_order():
+    """La clé ne dépend pas de l'ordre des filtres"""
+    assert cache_key('stats', {'a': 1, 'b': 2}) == cache_key('stats', {'b': 2, 'a': 1})
+
+
+def test_cache_key_accepts_list_filters():
+    """Filtres à plusieurs valeurs (départements, zone) utilisables comme clé"""
+    key = cache_key('count', {'department': ['92', '75'], 'near': (48.8, 2.3, 500)})
+    assert hash(key) == hash(cache_key('count', {'near': (48.8, 2.3, 500), 'department': ['92', '75']}))
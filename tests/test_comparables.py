@@ -0,0 +1,84 @@
+"""
+Tests de l'index des annonces comparables (arbre k-d par commune)
+"""
+import random
+
+import pytest
+
+from comparables import ComparablesIndex, KDTree, _distance, feature_vector
+from config import COMPARABLES_CONFIG
+from conftest import make_listing
+
+
+# ============ ARBRE K-D ============
+
+def test_kdtree_matches_brute_force():
+    rng = random.Random(7)
+    points = [(rng.uniform(0, 10), rng.randint(1, 5), rng.randint(0, 6), rng.uniform(0, 3))
+              for _ in range(2000)]
+    items = [(seq + 1, f'p{seq}') for seq in range(len(points))]
+    tree = KDTree(points, items, (0, 1, 2, 3), leaf_size=8)
+
+    for _ in range(20):
+        query = (rng.uniform(0, 10), rng.randint(1, 5), rng.randint(0, 6), rng.uniform(0, 3))
+        heap = []
+        tree.nearest(query, 5, lambda item: True, heap)
+        found = sorted(-distance for distance, _, _ in heap)
+        expected = sorted(_distance(query, point, (0, 1, 2, 3)) for point in points)[:5]
+        assert found == pytest.approx(expected)
+
+
+def test_feature_vector():
+    assert feature_vector({'surface': None, 'price': 100000}) is None
+    assert feature_vector({'surface': 60.0})[1:] == (None, None, None)
+    point = feature_vector({'surface': 60.0}, impute=True)
+    assert point[1] == 3 / COMPARABLES_CONFIG['scales']['rooms']  # 60 m² / 20 m² par pièce
+    assert point[3] is None
+
+
+# ============ INDEX ============
+
+def test_nearest_same_commune_only(tmp_db):
+    tmp_db.add_properties_bulk([
+        make_listing(1, surface=50.0),
+        make_listing(2, surface=52.0),
+        make_listing(3, surface=120.0, price=900000.0),
+        make_listing(4, location='Lyon', surface=50.0),
+        make_listing(5, surface=None),
+    ])
+    index = ComparablesIndex(tmp_db)
+
+    nearest = index.nearest(dict(tmp_db.get_property('prop_1')), k=2)
+    assert [c['id'] for c in nearest] == ['prop_2', 'prop_3']
+    assert nearest[0]['price_per_sqm'] == round(202000.0 / 52.0, 2)
+    assert len(index) == 4
+
+
+def test_estimate_hypothetical(tmp_db):
+    tmp_db.add_properties_bulk([make_listing(n, surface=40.0 + n, price=(40.0 + n) * 5000)
+                                for n in range(20)])
+    estimate = ComparablesIndex(tmp_db).estimate({'location': 'Paris', 'surface': 45.0, 'dpe': 'C'}, k=5)
+    assert estimate['count'] == 5
+    assert estimate['median_price_per_sqm'] == 5000.0
+    assert estimate['estimated_price'] == 225000
+    assert all(abs(c['surface'] - 45.0) <= 3 for c in estimate['comparables'])
+
+
+def test_incremental_updates(tmp_db, monkeypatch):
+    monkeypatch.setitem(COMPARABLES_CONFIG, 'min_rebuild', 2)
+    tmp_db.add_properties_bulk([make_listing(n, surface=30.0 + 10 * n) for n in range(10)])
+    index = ComparablesIndex(tmp_db, refresh_seconds=0)
+    query = {'location': 'Paris', 'surface': 61.0}
+    assert index.nearest(query, k=1, use_price=False)[0]['id'] == 'prop_3'
+
+    # Nouvelle annonce (tampon) et changement de prix (ancienne version écartée)
+    tmp_db.add_properties_bulk([make_listing(20, surface=61.0), make_listing(3, price=1.0)])
+    nearest = index.nearest(query, k=2, use_price=False)
+    assert [c['id'] for c in nearest] == ['prop_20', 'prop_3']
+    assert nearest[1]['price'] == 1.0
+
+    # Reconstruction après le seuil: mêmes résultats
+    tmp_db.add_properties_bulk([make_listing(n, surface=200.0 + n) for n in range(30, 40)])
+    assert [c['id'] for c in index.nearest(query, k=2, use_price=False)] == ['prop_20', 'prop_3']
+    assert sum(len(partition.buffer) for partition in index._partitions.values()) == 0
+    assert (0,) in index._partitions['paris'].trees
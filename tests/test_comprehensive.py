@@ -5,8 +5,11 @@ Tests cover: database, API routes, configuration, scraping, email, and edge case
 import pytest
 import requests
 import json
+import time
 from pathlib import Path
+from conftest import make_listing
 from database.db import Database
+from scrapers.base_scraper import BaseScraper
 from scrapers.manager import ScraperManager
 from config import SEARCH_CONFIG, SCRAPERS_CONFIG
 from utils import PropertyUtils
@@ -83,6 +86,38 @@ def client():
     return requests
 
 
+class FakeScraper(BaseScraper):
+    """Scraper synthétique: trois annonces par zone demandée, sans réseau"""
+
+    def __init__(self):
+        super().__init__('fake', {'delay_between_requests': 0})
+
+    def search(self, budget_min, budget_max, dpe_max, zones):
+        return []
+
+    def parse_property(self, element):
+        pass
+
+    def search_zone(self, zone, budget_min, budget_max, dpe_max, page=1):
+        return [make_listing(n, source='fake', location=zone, price=budget_min + n * 1000)
+                for n in range(3)] if page == 1 else []
+
+
+def app_scraper_manager():
+    import app as app_module
+    return app_module.scraper_manager
+
+
+def wait_for_job(app_client, job_id, timeout=30):
+    """Attendre la fin d'un job de scraping (exécuté dans un thread du JobManager)"""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = app_client.get(f'/api/jobs/{job_id}').get_json()['job']
+        if job['status'] in ('done', 'failed') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
 def test_api_dashboard(client):
     """Test dashboard endpoint"""
     r = client.get(f'{BASE_URL}/')
@@ -111,6 +146,43 @@ def test_api_property_detail(client, db):
         assert r.status_code == 200
 
 
+def test_api_property_history(app_client, tmp_db):
+    """Test price history endpoint"""
+    tmp_db.add_properties_bulk([make_listing(1, price=300000.0)])
+    tmp_db.add_properties_bulk([make_listing(1, price=285000.0)])
+
+    r = app_client.get('/api/property/prop_1/history')
+    assert r.status_code == 200
+    data = r.get_json()
+    assert data['current_price'] == 285000.0
+    assert data['history'][-1]['change'] == -15000.0
+    assert data['series'][-1]['price'] == 285000.0
+
+    r = app_client.get('/api/property/unknown_prop/history')
+    assert r.status_code == 404
+
+
+def test_api_property_comparables(app_client, tmp_db):
+    """Test comparables endpoints"""
+    tmp_db.add_properties_bulk([make_listing(n, location='Montreuil', price=200000.0 + n * 10000,
+                                             surface=40.0 + n * 5) for n in range(4)])
+
+    r = app_client.get('/api/property/prop_0/comparables?k=2')
+    assert r.status_code == 200
+    data = r.get_json()
+    assert [c['id'] for c in data['comparables']] == ['prop_1', 'prop_2']
+    assert data['median_price_per_sqm'] is not None
+
+    r = app_client.post('/api/comparables', json={'location': 'Montreuil', 'surface': 50})
+    assert r.status_code == 200
+    assert r.get_json()['estimated_price'] is not None
+
+    r = app_client.post('/api/comparables', json={'location': 'Montreuil'})
+    assert r.status_code == 400
+    r = app_client.get('/api/property/unknown_prop/comparables')
+    assert r.status_code == 404
+
+
 def test_api_search_empty(client):
     """Test search API with empty filters"""
     r = client.post(f'{BASE_URL}/api/search', json={}, timeout=5)
@@ -119,6 +191,20 @@ def test_api_search_empty(client):
     assert data.get('success') is True or 'properties' in data
 
 
+def test_api_search_counts_only_first_page(app_client, tmp_db):
+    """Le total n'est recalculé ni à chaque page ni à chaque appel"""
+    tmp_db.add_properties_bulk([make_listing(n) for n in range(5)])
+
+    first = app_client.post('/api/search', json={'limit': 2}).get_json()
+    assert first['count'] == 5
+    second = app_client.post('/api/search', json={'limit': 2, 'cursor': first['next_cursor']}).get_json()
+    assert 'count' not in second
+    assert len(second['properties']) == 2
+    forced = app_client.post('/api/search', json={'limit': 2, 'cursor': first['next_cursor'],
+                                                  'with_count': True}).get_json()
+    assert forced['count'] == 5
+
+
 def test_api_search_with_filters(client):
     """Test search API with filters"""
     filters = {
@@ -130,6 +216,43 @@ def test_api_search_with_filters(client):
     assert r.status_code == 200
 
 
+def test_api_search_full_text(app_client, tmp_db):
+    """Test full-text search with relevance pagination"""
+    tmp_db.add_properties_bulk([make_listing(n) for n in range(3)] +
+                               [make_listing(9, title='Maison avec jardin')])
+
+    data = app_client.post('/api/search', json={'q': 'appartement', 'limit': 2}).get_json()
+    assert data['success'] is True
+    assert data['count'] == 3
+    assert len(data['properties']) == 2
+
+    data = app_client.post('/api/search', json={'q': 'appartement', 'limit': 2,
+                                                'cursor': data['next_cursor']}).get_json()
+    assert len(data['properties']) == 1
+    assert data['next_cursor'] is None
+
+
+def test_api_search_near(app_client, tmp_db):
+    """Test radius search sorted by distance"""
+    tmp_db.add_properties_bulk([
+        make_listing(1, latitude=48.90, longitude=2.35),    # ~5 km
+        make_listing(2, latitude=48.86, longitude=2.35),    # quelques centaines de mètres
+        make_listing(3, latitude=45.76, longitude=4.84),    # Lyon, hors rayon
+    ])
+    near = {'lat': 48.8566, 'lon': 2.3522, 'radius_m': 20000}
+    r = app_client.post('/api/search', json={'near': near, 'include_dvf': True})
+    assert r.status_code == 200
+    data = r.get_json()
+    assert [p['id'] for p in data['properties']] == ['prop_2', 'prop_1']
+    distances = [p['distance_m'] for p in data['properties']]
+    assert distances == sorted(distances)
+    assert all(d <= 20000 for d in distances)
+    assert data['dvf_transactions'] == []
+
+    r = app_client.post('/api/search', json={'near': {'lat': 'x'}})
+    assert r.status_code == 400
+
+
 def test_api_stats(client):
     """Test statistics endpoint"""
     r = client.get(f'{BASE_URL}/api/stats')
@@ -146,12 +269,19 @@ def test_api_properties_json(client):
     assert 'properties' in data or 'count' in data
 
 
-def test_api_scrape(client):
+def test_api_scrape(app_client, monkeypatch):
     """Test scraping endpoint"""
-    r = client.post(f'{BASE_URL}/api/scrape', json={'source': 'all'}, timeout=60)
+    monkeypatch.setattr(app_scraper_manager(), 'scrapers', {'fake': FakeScraper()})
+    r = app_client.post('/api/scrape', json={'source': 'all'})
+    assert r.status_code == 202
+    data = r.get_json()
+    assert data['success'] is True
+    assert data['job_id']
+
+    r = app_client.get(f"/api/jobs/{data['job_id']}")
     assert r.status_code == 200
-    data = r.json()
-    assert 'success' in data
+    assert r.get_json()['job']['status'] in ('queued', 'running', 'done', 'failed')
+    assert wait_for_job(app_client, data['job_id'])['status'] == 'done'
 
 
 # ============================================================================
@@ -324,20 +454,22 @@ def test_search_with_invalid_filters(client):
 # INTEGRATION TESTS
 # ============================================================================
 
-def test_end_to_end_scrape_and_search(client, db):
+def test_end_to_end_scrape_and_search(app_client, tmp_db, monkeypatch):
     """Test full flow: scrape, save, search"""
-    # Get initial count
-    stats_before = db.get_statistics()
-    count_before = stats_before.get('total_properties', 0)
+    monkeypatch.setattr(app_scraper_manager(), 'scrapers', {'fake': FakeScraper()})
+    assert tmp_db.get_statistics()['total_properties'] == 0
     
-    # Scrape
-    r = client.post(f'{BASE_URL}/api/scrape', json={'source': 'dvf'}, timeout=60)
-    assert r.status_code == 200
+    # Scrape (job en arrière-plan)
+    r = app_client.post('/api/scrape', json={'source': 'fake'})
+    assert r.status_code == 202
+    job = wait_for_job(app_client, r.get_json()['job_id'])
+    assert job['status'] == 'done'
+    assert job['result']['new'] == 3
     
-    # Check count increased or stayed same
-    stats_after = db.get_statistics()
-    count_after = stats_after.get('total_properties', 0)
-    assert count_after >= count_before
+    # Les annonces scrapées sont en base et trouvées par la recherche
+    assert tmp_db.get_statistics()['total_properties'] == 3
+    data = app_client.post('/api/search', json={'q': 'appartement'}).get_json()
+    assert data['count'] == 3
 
 
 def test_configuration_persistence(client):
@@ -0,0 +1,387 @@
+"""
+Tests unitaires de la couche base de données (SQLite temporaire)
+"""
+import threading
+
+import pytest
+
+from config import DATABASE_CONFIG
+from conftest import make_listing
+
+
+# ============================================================================
+# POOL DE CONNEXIONS
+# ============================================================================
+
+def test_pool_pragmas(tmp_db):
+    """Les connexions du pool sont en WAL / synchronous=NORMAL"""
+    with tmp_db.connection() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == DATABASE_CONFIG['busy_timeout_ms']
+
+
+def test_pool_reuses_connections(tmp_db):
+    """Les emprunts successifs réutilisent la même connexion"""
+    tmp_db.add_property(make_listing(1))
+    tmp_db.property_exists('https://test.com/prop1')
+    tmp_db.get_statistics()
+    stats = tmp_db.pool_stats()
+    assert stats['open_connections'] == 1
+    assert stats['in_use'] == 0
+    assert stats['hits'] >= 3
+
+
+def test_pool_nested_borrow_same_connection(tmp_db):
+    """Un emprunt imbriqué dans le même thread partage la connexion"""
+    with tmp_db.connection() as outer:
+        with tmp_db.connection() as inner:
+            assert inner is outer
+    assert tmp_db.pool_stats()['in_use'] == 0
+
+
+def test_pool_concurrent_threads(tmp_db):
+    """Plusieurs threads écrivent sans dépasser la taille du pool"""
+    def worker(start):
+        for n in range(start, start + 10):
+            tmp_db.add_property(make_listing(n))
+
+    threads = [threading.Thread(target=worker, args=(i * 10,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert tmp_db.get_statistics()['total_properties'] == 40
+    stats = tmp_db.pool_stats()
+    assert stats['open_connections'] <= stats['max_size']
+    assert stats['in_use'] == 0
+
+
+# ============================================================================
+# INSERTION EN LOT
+# ============================================================================
+
+def test_bulk_insert_outcomes(tmp_db):
+    """Insertion en lot: nouvelles annonces, inchangées, prix modifiés"""
+    outcomes = tmp_db.add_properties_bulk([make_listing(n) for n in range(3)])
+    assert [o for _, o in outcomes] == ['inserted'] * 3
+
+    batch = [
+        make_listing(0),
+        make_listing(1, price=150000.0),
+        make_listing(3),
+        make_listing(4, price=None),
+    ]
+    outcomes = tmp_db.add_properties_bulk(batch)
+    assert [o for _, o in outcomes] == ['unchanged', 'price_changed', 'inserted', 'skipped']
+
+    prop = tmp_db.get_property('prop_1')
+    assert prop['price'] == 150000.0
+    assert tmp_db.get_statistics()['total_properties'] == 4
+
+
+def test_price_changes_are_recorded(tmp_db):
+    """Un re-scraping à un autre prix écrit une ligne d'historique"""
+    tmp_db.add_properties_bulk([make_listing(1), make_listing(2)])
+    tmp_db.add_properties_bulk([make_listing(1, price=190000.0), make_listing(2)])
+    tmp_db.add_properties_bulk([make_listing(1, price=185000.0)])
+
+    history = tmp_db.get_price_history('prop_1')
+    assert [(row['old_price'], row['new_price']) for row in history] == [
+        (201000.0, 190000.0), (190000.0, 185000.0)
+    ]
+    assert tmp_db.get_price_history('prop_2') == []
+    assert tmp_db.get_property('prop_1')['price'] == 185000.0
+
+    with tmp_db.connection() as conn:
+        plan = conn.execute('EXPLAIN QUERY PLAN SELECT * FROM property_history '
+                            'WHERE property_id = ? ORDER BY changed_at', ('prop_1',)).fetchall()
+    assert any('idx_history_property_changed' in row[3] for row in plan)
+
+
+def test_bulk_insert_duplicates_in_batch(tmp_db):
+    """Un doublon dans le même lot n'est inséré qu'une fois"""
+    outcomes = tmp_db.add_properties_bulk([make_listing(1), make_listing(1)])
+    assert [o for _, o in outcomes] == ['inserted', 'skipped']
+
+
+# ============================================================================
+# DOUBLONS ENTRE SOURCES
+# ============================================================================
+
+def test_cross_source_duplicates_are_clustered(tmp_db):
+    tmp_db.add_properties_bulk([
+        make_listing(1, source='seloger', title='Appartement 3 pièces avec balcon - Paris 15',
+                      location='Paris 75015', price=350000.0, surface=65.0),
+        make_listing(2, source='leboncoin', title='Maison familiale avec jardin',
+                      location='Paris 75015', price=350000.0, surface=65.0),
+    ])
+    tmp_db.add_properties_bulk([
+        make_listing(3, source='pap', title='APPARTEMENT 3 PIECES AVEC BALCON, PARIS 15',
+                      location='Paris', price=352000.0, surface=65.0),
+        make_listing(4, source='bienici', title='Appartement 3 pièces avec balcon - Paris 15',
+                      location='Lyon', price=350000.0, surface=65.0),
+        make_listing(5, source='bienici', title='Appartement 3 pièces avec balcon',
+                      location='Paris 75015', price=520000.0, surface=65.0),
+    ])
+
+    assert [row['id'] for row in tmp_db.get_duplicates('prop_3')] == ['prop_1']
+    assert tmp_db.get_duplicates('prop_4') == []
+    assert tmp_db.get_duplicates('prop_5') == []
+    assert tmp_db.duplicate_stats() == {'clusters': 1, 'duplicates': 1}
+
+    unique = {row['id'] for row in tmp_db.get_properties({'unique': True})}
+    assert unique == {'prop_1', 'prop_2', 'prop_4', 'prop_5'}
+    assert tmp_db.count_properties({'unique': True}) == 4
+
+
+def test_cleanup_duplicates(tmp_db):
+    """Les doublons exacts (même URL) sont supprimés, les anciennes annonces regroupées"""
+    tmp_db.add_properties_bulk([make_listing(1, title='Loft rue Oberkampf'),
+                                make_listing(2, title='Studio Montmartre')])
+    with tmp_db.connection() as conn:
+        conn.execute("INSERT INTO properties (id, source, url, title, location, price, surface) "
+                     "VALUES ('copie', 'test', 'https://test.com/prop1', 'Loft rue Oberkampf', 'Paris', 201000, 41)")
+        conn.execute('DELETE FROM listing_clusters')
+        conn.commit()
+
+    assert tmp_db.cleanup_duplicates() == 1
+    assert tmp_db.get_property('copie') is None
+    assert tmp_db.get_duplicates('prop_1') == []
+    with tmp_db.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM listing_clusters').fetchone()[0] == 2
+
+
+# ============================================================================
+# URL CONNUES
+# ============================================================================
+
+def test_url_index_exists(tmp_db):
+    with tmp_db.connection() as conn:
+        plan = conn.execute('EXPLAIN QUERY PLAN SELECT id FROM properties WHERE url = ?', ('x',)).fetchall()
+    assert any('idx_url' in row[3] for row in plan)
+
+
+def test_existing_urls_without_queries(tmp_db):
+    """Les tests d'existence sont servis par l'ensemble en mémoire"""
+    tmp_db.add_properties_bulk([make_listing(n) for n in range(3)])
+    tmp_db.add_property(make_listing(10))
+    hits = tmp_db.pool_stats()['hits']
+
+    urls = [f'https://test.com/prop{n}' for n in (0, 2, 5, 10)]
+    assert tmp_db.existing_urls(urls) == {'https://test.com/prop0', 'https://test.com/prop2',
+                                          'https://test.com/prop10'}
+    assert tmp_db.property_exists('https://test.com/prop1')
+    assert not tmp_db.property_exists('https://test.com/absente')
+    assert tmp_db.pool_stats()['hits'] == hits
+
+
+def test_url_set_catches_up_with_other_writers(tmp_db):
+    """Les insertions d'un autre processus sont vues après le délai de rattrapage"""
+    tmp_db.add_property(make_listing(1))
+    conn = tmp_db.get_connection()
+    conn.execute("INSERT INTO properties (id, source, url, title, location, price) "
+                 "VALUES ('ext', 'test', 'https://test.com/ext', 'Ext', 'Paris', 1)")
+    conn.commit()
+    conn.close()
+
+    tmp_db.pool.urls.refresh_seconds = 0
+    assert tmp_db.property_exists('https://test.com/ext')
+    assert tmp_db.property_exists('https://test.com/prop1')
+
+
+# ============================================================================
+# RECHERCHE PLEIN TEXTE
+# ============================================================================
+
+def test_full_text_search_ignores_accents(tmp_db):
+    tmp_db.add_properties_bulk([
+        make_listing(1, title='Appartement lumineux', description='Proche école et métro'),
+        make_listing(2, title='Maison avec jardin', description='Quartier calme', location='Hauts-de-Seine'),
+        make_listing(3, title='Studio', description='Appartement rénové, ECOLE à 5 minutes'),
+    ])
+
+    assert {row['id'] for row in tmp_db.search_properties('ecole')} == {'prop_1', 'prop_3'}
+    assert [row['id'] for row in tmp_db.search_properties('jardin calme')] == ['prop_2']
+    assert tmp_db.search_properties('piscine') == []
+
+
+def test_full_text_ranking_and_filters(tmp_db):
+    tmp_db.add_properties_bulk([
+        make_listing(1, title='Studio', description='Ancien appartement de gardien'),
+        make_listing(2, title='Appartement familial', description='Trois chambres'),
+        make_listing(3, title='Appartement terrasse', price=900000.0),
+    ])
+
+    # Le titre pèse plus que la description; préfixe « appart »
+    rows = tmp_db.search_properties('appart', {'price_max': 500000})
+    assert [row['id'] for row in rows] == ['prop_2', 'prop_1']
+    assert tmp_db.count_properties({'q': 'appartement'}) == 3
+
+
+def test_full_text_index_follows_updates(tmp_db):
+    tmp_db.add_property(make_listing(1, title='Loft'))
+    with tmp_db.connection() as conn:
+        conn.execute("UPDATE properties SET title = 'Duplex' WHERE id = 'prop_1'")
+        conn.commit()
+    assert tmp_db.search_properties('loft') == []
+    assert [row['id'] for row in tmp_db.search_properties('duplex')] == ['prop_1']
+
+
+def test_location_filter_uses_full_text_index(tmp_db):
+    tmp_db.add_properties_bulk([
+        make_listing(1, location='Hauts-de-Seine'),
+        make_listing(2, location='Paris 75015'),
+    ])
+    assert [row['id'] for row in tmp_db.get_properties({'location': 'hauts de seine'})] == ['prop_1']
+    assert [row['id'] for row in tmp_db.get_properties({'location': '75'})] == ['prop_2']
+
+
+# ============================================================================
+# TRI ET PAGINATION
+# ============================================================================
+
+def test_get_properties_sort_and_paginate(tmp_db):
+    """Tri et pagination faits en SQL"""
+    tmp_db.add_properties_bulk([make_listing(n) for n in range(10)])
+
+    page = tmp_db.get_properties(sort='price_desc', limit=3, offset=3)
+    assert [p['id'] for p in page] == ['prop_6', 'prop_5', 'prop_4']
+
+    page = tmp_db.get_properties(sort='price_asc', limit=2)
+    assert [p['price'] for p in page] == [200000.0, 201000.0]
+
+
+def test_count_properties(tmp_db):
+    """Comptage avec les mêmes filtres que get_properties"""
+    tmp_db.add_properties_bulk([make_listing(n) for n in range(10)])
+    filters = {'price_min': 203000, 'price_max': 206000, 'dpe_max': 'D'}
+    assert tmp_db.count_properties(filters) == 4
+    assert tmp_db.count_properties({'dpe_max': 'B'}) == 0
+    assert len(tmp_db.get_properties(filters, sort='date_desc', limit=20)) == 4
+
+
+def test_keyset_pagination_walks_all_rows(tmp_db):
+    """Les pages successives couvrent toutes les lignes sans doublon"""
+    tmp_db.add_properties_bulk([make_listing(n, price=200000.0 + (n % 4)) for n in range(11)])
+
+    seen = []
+    cursor = None
+    while True:
+        rows, cursor = tmp_db.get_properties_page(sort='price_asc', cursor=cursor, limit=4)
+        seen.extend((r['price'], r['id']) for r in rows)
+        if cursor is None:
+            break
+
+    assert len(seen) == 11
+    assert seen == sorted(seen)
+
+
+def test_keyset_rejects_foreign_cursor(tmp_db):
+    """Un curseur d'un autre tri est refusé"""
+    tmp_db.add_properties_bulk([make_listing(n) for n in range(3)])
+    _, cursor = tmp_db.get_properties_page(sort='price_desc', limit=1)
+    with pytest.raises(ValueError):
+        tmp_db.get_properties_page(sort='date_desc', cursor=cursor, limit=1)
+    with pytest.raises(ValueError):
+        tmp_db.get_properties_page(cursor='pas-un-curseur', limit=1)
+
+
+# ============================================================================
+# STATISTIQUES
+# ============================================================================
+
+def test_statistics_single_pass(tmp_db):
+    """Les agrégats reconstitués correspondent aux valeurs attendues"""
+    props = [make_listing(n, source='pap' if n % 2 else 'seloger') for n in range(6)]
+    tmp_db.add_properties_bulk(props)
+    tmp_db.update_property_status('prop_0', 'contacté')
+
+    stats = tmp_db.get_statistics()
+    assert stats['total_properties'] == 6
+    assert stats['by_source'] == {'pap': 3, 'seloger': 3}
+    assert stats['by_status'] == {'disponible': 5, 'contacté': 1}
+    assert stats['min_price'] == 200000.0
+    assert stats['max_price'] == 205000.0
+    assert stats['avg_price'] == pytest.approx(202500.0)
+
+    by_date = tmp_db.get_statistics_by_date('2000-01-01', '2999-01-01')
+    assert by_date['total_properties'] == 6
+    assert by_date['avg_surface'] == pytest.approx(42.5)
+
+    empty = tmp_db.get_statistics({'price_min': 999999})
+    assert empty['total_properties'] == 0
+    assert empty['avg_price'] is None
+
+
+def test_rollup_matches_full_scan(tmp_db):
+    """property_stats reste cohérente avec properties après écritures"""
+    props = [make_listing(n, price=95000.0 + n * 7300, dpe='BCDEFG'[n % 6],
+                           source='pap' if n % 3 else 'bienici', department='Paris')
+             for n in range(40)]
+    tmp_db.add_properties_bulk(props)
+    tmp_db.add_properties_bulk([make_listing(5, price=131000.0), make_listing(7, price=400000.0)])
+    tmp_db.update_property_status('prop_3', 'contacté')
+    with tmp_db.connection() as conn:
+        conn.execute("DELETE FROM properties WHERE id IN ('prop_0', 'prop_12')")
+        conn.commit()
+
+    for filters in [None,
+                    {'price_min': 100000, 'price_max': 250000, 'dpe_max': 'D'},
+                    {'price_min': 123456, 'price_max': 301000},
+                    {'price_min': 110000, 'price_max': 119000},
+                    {'status': 'contacté'}]:
+        rollup = tmp_db.get_statistics(filters)
+        full = tmp_db.compute_statistics(filters)
+        for key in ('total_properties', 'by_source', 'by_status', 'min_price', 'max_price'):
+            assert rollup[key] == full[key], (filters, key)
+        assert rollup['avg_price'] == pytest.approx(full['avg_price'])
+
+
+def test_rollup_by_day_matches_full_scan(tmp_db):
+    """Statistiques par date: jours complets dans property_stats, bornes sur properties"""
+    tmp_db.add_properties_bulk([make_listing(n, price=95000.0 + n * 7300) for n in range(30)])
+    with tmp_db.connection() as conn:
+        # Une annonce toutes les 9 heures à partir du 1er mai
+        conn.execute("UPDATE properties SET created_at = datetime('2024-05-01 03:00:00', "
+                     "'+' || (CAST(substr(id, 6) AS INTEGER) * 9) || ' hours')")
+        conn.commit()
+
+    for start, end in [('2024-05-01', '2024-05-12'),
+                       ('2024-05-02 10:00:00', '2024-05-06 23:59:59'),
+                       ('2024-05-02 10:00:00', '2024-05-05 08:00:00'),
+                       ('2024-05-03', '2024-05-03 20:00:00')]:
+        by_date = tmp_db.get_statistics_by_date(start, end)
+        full = tmp_db.compute_statistics(date_range=(start, end))
+        assert by_date['total_properties'] == full['total_properties'], (start, end)
+        assert by_date['min_price'] == full['min_price'], (start, end)
+        assert by_date['max_price'] == full['max_price'], (start, end)
+        assert by_date['avg_surface'] == pytest.approx(full['avg_surface']), (start, end)
+
+    # Filtres de prix et plage de dates combinés
+    filters = {'price_min': 123456, 'price_max': 250000}
+    rollup = tmp_db._rollup_statistics(filters, date_range=('2024-05-02 10:00:00', '2024-05-08'))
+    full = tmp_db.compute_statistics(filters, date_range=('2024-05-02 10:00:00', '2024-05-08'))
+    assert rollup['total_properties'] == full['total_properties']
+    assert rollup['avg_price'] == pytest.approx(full['avg_price'])
+
+
+def test_rebuild_property_stats(tmp_db):
+    """La reconstruction redonne les mêmes agrégats"""
+    tmp_db.add_properties_bulk([make_listing(n) for n in range(5)])
+    with tmp_db.connection() as conn:
+        before = conn.execute('SELECT * FROM property_stats ORDER BY 1, 2, 3, 4, 5, 6').fetchall()
+    assert tmp_db.rebuild_property_stats() == len(before)
+    with tmp_db.connection() as conn:
+        after = conn.execute('SELECT * FROM property_stats ORDER BY 1, 2, 3, 4, 5, 6').fetchall()
+    assert [tuple(r) for r in before] == [tuple(r) for r in after]
+
+
+def test_writes_bump_generation(tmp_db):
+    """Chaque écriture incrémente le compteur de génération"""
+    generation = tmp_db.generation
+    tmp_db.add_properties_bulk([make_listing(1)])
+    tmp_db.mark_as_favorite('prop_1')
+    tmp_db.update_property_status('prop_1', 'visité')
+    assert tmp_db.generation == generation + 3
@@ -0,0 +1,48 @@
+"""
+Tests de la détection des doublons entre sources (MinHash + LSH)
+"""
+from dedup import (MinHasher, commune_key, is_duplicate, lsh_buckets, normalize_text,
+                   pack_signature, similarity, unpack_signature)
+
+
+# ============ SIGNATURES ============
+
+def test_normalize_text():
+    assert normalize_text('  Appartement 3 PIÈCES, balcon !') == 'appartement 3 pieces balcon'
+    assert commune_key('Paris 75015') == 'paris'
+    assert commune_key(None) == ''
+
+
+def test_signature_similarity():
+    hasher = MinHasher(num_perm=128)
+    a = hasher.signature('Appartement 3 pièces avec balcon - Paris 15')
+    b = hasher.signature('APPARTEMENT 3 PIECES AVEC BALCON, PARIS 15')
+    c = hasher.signature('Maison familiale avec jardin et garage')
+
+    assert hasher.signature('Appartement 3 pièces avec balcon - Paris 15') == a
+    assert similarity(a, b) == 1.0
+    assert similarity(a, c) < 0.3
+    assert unpack_signature(pack_signature(a)) == a
+
+
+def test_lsh_buckets_are_per_commune():
+    hasher = MinHasher()
+    signature = hasher.signature('Studio Montmartre')
+    paris = lsh_buckets({'location': 'Paris 75018'}, signature)
+    assert paris == lsh_buckets({'location': 'Paris'}, signature)
+    assert not set(paris) & set(lsh_buckets({'location': 'Lyon'}, signature))
+
+
+# ============ CONFIRMATION ============
+
+def test_is_duplicate_checks_attributes():
+    hasher = MinHasher()
+    signature = hasher.signature('Appartement 3 pièces avec balcon')
+    listing = {'price': 350000, 'surface': 65, 'rooms': 3}
+
+    assert is_duplicate(listing, {'price': 355000, 'surface': 64, 'rooms': None}, signature, signature)
+    assert not is_duplicate(listing, {'price': 420000, 'surface': 65}, signature, signature)
+    assert not is_duplicate(listing, {'price': 350000, 'surface': 80}, signature, signature)
+    assert not is_duplicate(listing, {'price': 350000, 'surface': 65, 'rooms': 4}, signature, signature)
+    other = hasher.signature('Maison familiale avec jardin')
+    assert not is_duplicate(listing, dict(listing), signature, other)
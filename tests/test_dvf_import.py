@@ -0,0 +1,113 @@
+"""
+Tests de l'import en flux des fichiers DVF (dvf_import.py)
+"""
+import gzip
+from datetime import date, timedelta
+
+import pytest
+
+from dvf_import import import_dvf
+
+DGFIP_HEADER = ('Identifiant de document|No disposition|Date mutation|Nature mutation|Valeur fonciere|'
+                'Code postal|Commune|Code departement|Code commune|Type local|Surface reelle bati|'
+                'Nombre pieces principales|Surface terrain')
+
+
+def dgfip_line(n, department='92', commune='NANTERRE', type_local='Appartement',
+               value=None, surface=50, day='15/03/2024'):
+    value = f'{value if value is not None else 250000 + n},00' if value != '' else ''
+    return (f'|1|{day}|Vente|{value}|{department}000|{commune}|{department}|{50 + n % 3}|'
+            f'{type_local}|{surface}|2|')
+
+
+def write_dgfip(path, lines):
+    path.write_text('\n'.join([DGFIP_HEADER] + lines) + '\n', encoding='utf-8')
+    return path
+
+
+def transactions(db):
+    with db.connection() as conn:
+        return [dict(row) for row in conn.execute('SELECT * FROM dvf_transactions ORDER BY id')]
+
+
+# ============ LECTURE ============
+
+def test_import_dgfip_filters_departments(tmp_db, tmp_path):
+    path = write_dgfip(tmp_path / 'valeursfoncieres-2024.txt', [
+        dgfip_line(1),
+        dgfip_line(2, department='75', commune='PARIS 15'),
+        dgfip_line(3, department='13', commune='MARSEILLE 1ER'),  # Hors départements
+        dgfip_line(4, type_local=''),                              # Terrain sans local
+        dgfip_line(5, value=''),                                   # Sans valeur foncière
+    ])
+
+    stats = import_dvf(tmp_db, path, departments={'75', '92'})
+    assert (stats['rows_read'], stats['rows_imported'], stats['completed']) == (5, 2, True)
+
+    nanterre, paris = transactions(tmp_db)
+    assert nanterre['date_mutation'] == '2024-03-15'
+    assert nanterre['valeur_fonciere'] == 250001.0
+    assert nanterre['code_commune'] == '92051'
+    assert nanterre['mutation_id'] == '2024-03-15|250001,00|92051'
+    assert paris['commune'] == 'PARIS'
+
+
+def test_import_geo_dvf_gzip(tmp_db, tmp_path):
+    path = tmp_path / 'full.csv.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write('id_mutation,date_mutation,nature_mutation,valeur_fonciere,code_postal,nom_commune,'
+                'code_departement,code_commune,type_local,surface_reelle_bati,'
+                'nombre_pieces_principales,surface_terrain,longitude,latitude\n')
+        f.write('2024-1,2024-02-01,Vente,320000,75015,Paris 15e Arrondissement,75,75115,'
+                'Appartement,40,2,,2.29,48.84\n')
+
+    import_dvf(tmp_db, path, departments={'75'})
+    [row] = transactions(tmp_db)
+    assert (row['mutation_id'], row['commune'], row['code_commune']) == ('2024-1', 'Paris', '75115')
+    assert (row['longitude'], row['latitude']) == (2.29, 48.84)
+
+
+# ============ REPRISE ============
+
+def test_resume_after_interruption(tmp_db, tmp_path, monkeypatch):
+    path = write_dgfip(tmp_path / 'vf.txt', [dgfip_line(n) for n in range(25)])
+    add_chunk = tmp_db.add_dvf_chunk
+    calls = []
+
+    def failing_add_chunk(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return add_chunk(*args, **kwargs)
+
+    monkeypatch.setattr(tmp_db, 'add_dvf_chunk', failing_add_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        import_dvf(tmp_db, path, departments={'92'}, chunk_lines=10)
+    assert len(transactions(tmp_db)) == 20
+    monkeypatch.undo()
+
+    stats = import_dvf(tmp_db, path, departments={'92'}, chunk_lines=10)
+    assert stats['resumed_from'] > 0
+    assert stats['rows_read'] == 5
+    assert [row['valeur_fonciere'] for row in transactions(tmp_db)] == [250000.0 + n for n in range(25)]
+
+    # Fichier déjà importé: rien à relire; --restart réimporte sans doublon
+    assert import_dvf(tmp_db, path, departments={'92'})['rows_read'] == 0
+    assert import_dvf(tmp_db, path, departments={'92'}, restart=True)['rows_imported'] == 25
+    assert len(transactions(tmp_db)) == 25
+    assert tmp_db.get_dvf_import_state('vf.txt')['rows_imported'] == 25
+
+
+# ============ PRIX DE RÉFÉRENCE ============
+
+def test_reference_prices_use_dvf_sales(tmp_db, tmp_path):
+    day = (date.today() - timedelta(days=100)).strftime('%d/%m/%Y')
+    lines = [dgfip_line(n, commune='COLOMBES', value=200000 + 10000 * n, day=day) for n in range(5)]
+    # Mutation de deux locaux (même date, valeur, commune): valeur globale écartée
+    lines += [dgfip_line(9, commune='COLOMBES', value=9000000, day=day)] * 2
+    import_dvf(tmp_db, write_dgfip(tmp_path / 'vf.txt', lines), departments={'92'})
+
+    tmp_db.refresh_commune_reference()
+    reference = tmp_db.deal_reference('Colombes', 'Appartement')
+    assert reference['sample_size'] == 5
+    assert reference['median_price_per_sqm'] == 4400.0
@@ -0,0 +1,124 @@
+"""
+Tests du bus d'événements SSE
+"""
+import json
+
+from conftest import make_listing
+from events import EventBus, DatabaseWatcher, format_sse, NEW_LISTING, LOG_LINE, SCHEDULER_STATE
+
+
+# ============================================================================
+# Publication / abonnement
+# ============================================================================
+
+def test_publish_reaches_subscriber():
+    bus = EventBus()
+    with bus.subscribe() as subscription:
+        bus.publish(NEW_LISTING, {'id': 'a1'})
+        event = subscription.get(timeout=1)
+    assert event['type'] == NEW_LISTING
+    assert event['data'] == {'id': 'a1'}
+    assert bus.subscriber_count() == 0
+
+
+def test_subscription_filters_types():
+    bus = EventBus()
+    subscription = bus.subscribe(types=[LOG_LINE])
+    bus.publish(NEW_LISTING, {'id': 'a1'})
+    bus.publish(LOG_LINE, {'line': 'ok'})
+    assert subscription.get(timeout=1)['type'] == LOG_LINE
+    assert subscription.get(timeout=0.01) is None
+
+
+def test_last_event_id_replays_missed_events():
+    bus = EventBus(history_size=10)
+    first = bus.publish(NEW_LISTING, {'id': 1})
+    bus.publish(NEW_LISTING, {'id': 2})
+    bus.publish(NEW_LISTING, {'id': 3})
+
+    subscription = bus.subscribe(last_event_id=first)
+    replayed = [subscription.get(timeout=0.01)['data']['id'] for _ in range(2)]
+    assert replayed == [2, 3]
+    assert subscription.get(timeout=0.01) is None
+
+
+def test_slow_subscriber_drops_oldest():
+    bus = EventBus()
+    subscription = bus.subscribe()
+    subscription.queue.maxsize = 2
+    for i in range(4):
+        bus.publish(NEW_LISTING, {'id': i})
+    assert subscription.dropped == 2
+    assert [subscription.get(timeout=0.01)['data']['id'] for _ in range(2)] == [2, 3]
+
+
+# ============================================================================
+# Format et journalisation
+# ============================================================================
+
+def test_format_sse():
+    bus = EventBus()
+    with bus.subscribe() as subscription:
+        event_id = bus.publish(NEW_LISTING, {'title': 'Maison à Brest'})
+        text = format_sse(subscription.get(timeout=1))
+    lines = text.rstrip('\n').split('\n')
+    assert lines[0] == f'id: {event_id}'
+    assert lines[1] == f'event: {NEW_LISTING}'
+    assert json.loads(lines[2][len('data: '):]) == {'title': 'Maison à Brest'}
+    assert text.endswith('\n\n')
+
+
+# ============================================================================
+# Relais des écritures des autres processus (base, log)
+# ============================================================================
+
+def drain(subscription):
+    events = []
+    while (event := subscription.get(timeout=0.01)) is not None:
+        events.append(event)
+    return events
+
+
+def test_watcher_publishes_listings_written_after_start(tmp_db):
+    tmp_db.add_properties_bulk([make_listing(1)])
+    bus = EventBus()
+    watcher = DatabaseWatcher(bus, tmp_db)
+    watcher.prime()
+
+    # Écritures d'un autre processus: seule la base est commune
+    tmp_db.add_properties_bulk([make_listing(2), make_listing(3), make_listing(1, price=1.0)])
+    with bus.subscribe(types=[NEW_LISTING]) as subscription:
+        assert watcher.poll() == 2
+        assert [event['data']['id'] for event in drain(subscription)] == ['prop_2', 'prop_3']
+        assert watcher.poll() == 0
+
+
+def test_watcher_publishes_scrape_runs(tmp_db):
+    bus = EventBus()
+    watcher = DatabaseWatcher(bus, tmp_db, format_last_run=lambda value: f'run {value}')
+    watcher.prime()
+
+    tmp_db.save_scrape_states({('dvf', 'Paris'): {'last_listing_id': 'a', 'last_posted_date': '2024-07-01'}})
+    with bus.subscribe(types=[SCHEDULER_STATE]) as subscription:
+        watcher.poll()
+        events = drain(subscription)
+    assert events[0]['data'] == {'last_run': f'run {tmp_db.get_last_scrape_run()}'}
+
+
+def test_watcher_tails_log_file(tmp_db, tmp_path):
+    log_file = tmp_path / 'app.log'
+    log_file.write_text('ancienne ligne\n', encoding='utf-8')
+    bus = EventBus()
+    watcher = DatabaseWatcher(bus, tmp_db, log_file=log_file)
+    watcher.prime()
+
+    with bus.subscribe(types=[LOG_LINE]) as subscription:
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write('scraping terminé\nligne en cours')
+        watcher.poll()
+        assert [event['data']['line'] for event in drain(subscription)] == ['scraping terminé']
+
+        # Rotation: le fichier repart de zéro
+        log_file.write_text('nouveau fichier\n', encoding='utf-8')
+        watcher.poll()
+        assert [event['data']['line'] for event in drain(subscription)] == ['nouveau fichier']
@@ -0,0 +1,145 @@
+"""
+Tests des coordonnées des annonces et des recherches géographiques (geo.py)
+"""
+import random
+
+import pytest
+
+from conftest import make_listing
+from dvf_import import import_dvf
+from geo import bbox_around, distance_m, parse_bbox, parse_near, read_centroids
+
+PARIS = (48.8566, 2.3522)
+
+
+# ============ CALCULS ============
+
+def test_distance_and_bbox():
+    # Paris - Versailles: environ 18 km
+    assert 17500 < distance_m(*PARIS, 48.8049, 2.1204) < 18500
+    assert distance_m(*PARIS, None, 2.0) is None
+
+    south, west, north, east = bbox_around(*PARIS, 1000)
+    for bearing in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        lat = PARIS[0] + bearing[0] * (north - PARIS[0])
+        lon = PARIS[1] + bearing[1] * (east - PARIS[1])
+        assert distance_m(*PARIS, lat, lon) == pytest.approx(1000, rel=1e-3)
+
+
+def test_parse_near_and_bbox():
+    assert parse_near({'lat': '48.85', 'lon': 2.35, 'radius_m': 500}) == (48.85, 2.35, 500.0)
+    assert parse_near({'lat': 48.85, 'lon': 2.35, 'radius_m': 10 ** 9})[2] == 50000
+    with pytest.raises(ValueError):
+        parse_near({'lat': 120, 'lon': 2.35})
+    with pytest.raises(ValueError):
+        parse_bbox([48.9, 2.2, 48.8, 2.4])
+
+
+def test_read_centroids(tmp_path):
+    path = tmp_path / 'communes.csv'
+    path.write_text(
+        'code_departement;nom_commune;codes_postaux;latitude;longitude\n'
+        '92;Nanterre;92000;48,89;2,20\n'
+        '75;Paris 15e Arrondissement;75015;48.84;2.29\n'
+        '75;Paris 16e Arrondissement;75016 75116;48.86;2.27\n'
+        '13;Marseille;13001;43.30;5.37\n',
+        encoding='utf-8')
+
+    centroids = {(kind, key): (lat, lon) for kind, key, lat, lon in read_centroids(path, {'75', '92'})}
+    assert centroids[('postal', '92000')] == (48.89, 2.20)
+    assert centroids[('postal', '75116')] == (48.86, 2.27)
+    assert centroids[('commune', 'paris')] == pytest.approx((48.85, 2.28))
+    assert ('postal', '13001') not in centroids
+
+
+# ============ BASE DE DONNÉES ============
+
+def test_listings_placed_at_centroids(tmp_db):
+    tmp_db.add_property(make_listing(1, location='Paris 75015'))
+    assert tmp_db.get_property('prop_1')['latitude'] is None
+
+    geocoded = tmp_db.import_commune_centroids([
+        ('postal', '75015', 48.84, 2.29),
+        ('commune', 'paris', 48.8566, 2.3522),
+    ])
+    assert geocoded == 1
+    assert tuple(tmp_db.get_property('prop_1')[c] for c in ('latitude', 'longitude')) == (48.84, 2.29)
+
+    # Nouvelles annonces: code postal d'abord, sinon commune, sinon coordonnées de la source
+    tmp_db.add_properties_bulk([
+        make_listing(2, location='Paris'),
+        make_listing(3, location='Lyon'),
+        make_listing(4, location='Lyon', latitude=45.76, longitude=4.84),
+    ])
+    assert tmp_db.get_property('prop_2')['latitude'] == 48.8566
+    assert tmp_db.get_property('prop_3')['latitude'] is None
+    assert tmp_db.get_property('prop_4')['latitude'] == 45.76
+
+
+def test_paris_arrondissements_use_postal_or_city_centroid(tmp_db):
+    # Noms de communes.py ("Paris 15e"), sans code postal
+    tmp_db.add_properties_bulk([make_listing(1, location='Paris 15e'), make_listing(2, location='Paris 1er')])
+    tmp_db.import_commune_centroids([
+        ('postal', '75015', 48.84, 2.29),
+        ('commune', 'paris', 48.8566, 2.3522),
+    ])
+    assert tmp_db.get_property('prop_1')['latitude'] == 48.84
+    assert tmp_db.get_property('prop_2')['latitude'] == 48.8566
+    assert {row['id'] for row in tmp_db.properties_near(48.84, 2.29, 500)} == {'prop_1'}
+
+
+def test_radius_and_bbox_queries_match_brute_force(tmp_db):
+    rng = random.Random(7)
+    listings = [make_listing(n, location=f'Commune {n}',
+                             latitude=PARIS[0] + rng.uniform(-0.2, 0.2),
+                             longitude=PARIS[1] + rng.uniform(-0.3, 0.3))
+                for n in range(300)]
+    tmp_db.add_properties_bulk(listings)
+
+    near = (48.87, 2.33, 5000)
+    expected = sorted((distance_m(*near[:2], p['latitude'], p['longitude']), p['id'])
+                      for p in listings if distance_m(*near[:2], p['latitude'], p['longitude']) <= 5000)
+    rows = tmp_db.properties_near(*near, limit=1000)
+    assert [row['id'] for row in rows] == [property_id for _, property_id in expected]
+    assert rows[0]['distance_m'] == pytest.approx(expected[0][0])
+    assert tmp_db.count_properties({'near': near}) == len(expected)
+
+    bbox = (48.80, 2.30, 48.90, 2.40)
+    expected = {p['id'] for p in listings
+                if bbox[0] <= p['latitude'] <= bbox[2] and bbox[1] <= p['longitude'] <= bbox[3]}
+    page, _ = tmp_db.get_properties_page({'bbox': bbox}, limit=1000)
+    assert {row['id'] for row in page} == expected
+
+    # L'index suit les changements de coordonnées
+    with tmp_db.connection() as conn:
+        conn.execute('UPDATE properties SET latitude = 0 WHERE id = ?', (rows[0]['id'],))
+        conn.commit()
+    assert rows[0]['id'] not in {row['id'] for row in tmp_db.properties_near(*near, limit=1000)}
+
+
+def test_dvf_near_and_centroids(tmp_db, tmp_path):
+    path = tmp_path / 'geo-dvf.csv'
+    path.write_text(
+        'id_mutation,date_mutation,nature_mutation,valeur_fonciere,code_postal,nom_commune,'
+        'code_departement,code_commune,type_local,surface_reelle_bati,'
+        'nombre_pieces_principales,surface_terrain,longitude,latitude\n'
+        '2024-1,2024-02-01,Vente,320000,75015,Paris 15e Arrondissement,75,75115,Appartement,40,2,,2.29,48.84\n'
+        '2024-2,2024-03-01,Vente,410000,75015,Paris 15e Arrondissement,75,75115,Appartement,50,2,,2.30,48.85\n'
+        '2024-3,2024-04-01,Vente,250000,92000,Nanterre,92,92050,Appartement,45,2,,2.20,48.89\n',
+        encoding='utf-8')
+    import_dvf(tmp_db, path, departments={'75', '92'})
+
+    near = tmp_db.get_dvf_transactions(near=(48.84, 2.29, 2000))
+    assert [row['mutation_id'] for row in near] == ['2024-1', '2024-2']
+    assert near[0]['distance_m'] == pytest.approx(0, abs=1)
+    inside = tmp_db.get_dvf_transactions(bbox=(48.80, 2.10, 48.95, 2.25))
+    assert [row['mutation_id'] for row in inside] == ['2024-3']
+
+    # Centroïdes DVF, sans écraser un centroïde importé
+    tmp_db.import_commune_centroids([('commune', 'nanterre', 48.8924, 2.2071)])
+    tmp_db.add_property(make_listing(1, location='Paris 75015'))
+    tmp_db.add_property(make_listing(2, location='Nanterre'))
+    assert tmp_db.refresh_commune_centroids() == 1
+    paris = tmp_db.get_property('prop_1')
+    assert (paris['latitude'], paris['longitude']) == pytest.approx((48.845, 2.295))
+    assert tmp_db.get_property('prop_2')['latitude'] == 48.8924
@@ -0,0 +1,180 @@
+"""
+Tests du cache disque des réponses HTTP
+"""
+import time
+
+import pytest
+
+requests = pytest.importorskip('requests')
+pytest.importorskip('bs4')
+pytest.importorskip('retrying')
+
+from scrapers.base_scraper import BaseScraper
+from scrapers.http_cache import CacheMiss, ResponseCache, set_response_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(tmp_path / 'http_cache', max_size_mb=1, default_ttl=60)
+    previous = set_response_cache(cache)
+    yield cache
+    set_response_cache(previous)
+    cache.close()
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code}', response=self)
+
+
+class FakeScraper(BaseScraper):
+    """Scraper dont la session renvoie des réponses préparées"""
+
+    def __init__(self, responses, cache_ttl=60):
+        super().__init__('Fake', {'name': 'Fake', 'cache_ttl': cache_ttl, 'rate_limit': {'requests_per_second': None}})
+        self.responses = list(responses)
+        self.requests = []
+        self.session.get = self._get
+
+    def _get(self, url, params=None, headers=None, **kwargs):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+    def search(self, budget_min, budget_max, dpe_max, zones):
+        return []
+
+    def parse_property(self, element):
+        return None
+
+
+# ============ STOCKAGE ============
+
+def test_store_and_lookup(cache):
+    key = cache.key('https://example.com/list', {'page': 1, 'zone': 'Paris'})
+    assert key == cache.key('https://example.com/list', {'zone': 'Paris', 'page': 1})
+    assert cache.lookup(key) is None
+
+    cache.store(key, 'https://example.com/list', '<html>1</html>', etag='"v1"', source='fake')
+    entry = cache.lookup(key)
+    assert entry['etag'] == '"v1"'
+    assert cache.read(entry) == '<html>1</html>'
+    assert cache.conditional_headers(entry) == {'If-None-Match': '"v1"'}
+
+
+def test_identical_bodies_are_stored_once(cache, tmp_path):
+    cache.store(cache.key('https://example.com/a'), 'https://example.com/a', 'même contenu')
+    cache.store(cache.key('https://example.com/b'), 'https://example.com/b', 'même contenu')
+    bodies = [p for p in (tmp_path / 'http_cache' / 'bodies').rglob('*') if p.is_file()]
+    assert len(bodies) == 1
+    assert cache.stats()['entries'] == 2
+
+
+def test_freshness(cache):
+    key = cache.key('https://example.com/')
+    cache.store(key, 'https://example.com/', 'x')
+    entry = cache.lookup(key)
+    assert cache.is_fresh(entry)
+    entry['fetched_at'] -= 120
+    assert not cache.is_fresh(entry)
+    assert cache.is_fresh(entry, ttl=3600)
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(tmp_path / 'lru', max_size_mb=0.001, default_ttl=60)  # ~1 Ko
+    try:
+        for name in ('a', 'b', 'c'):
+            cache.store(cache.key(name), name, name * 300)
+            time.sleep(0.01)
+        # 'a' est lu: 'b' devient la moins récemment utilisée
+        cache.read(cache.lookup(cache.key('a')))
+        cache.store(cache.key('d'), 'd', 'd' * 300)
+
+        assert cache.lookup(cache.key('b')) is None
+        assert cache.lookup(cache.key('a')) is not None
+        assert cache.stats()['size_bytes'] <= cache.max_bytes
+        assert cache.stats()['evicted'] >= 1
+    finally:
+        cache.close()
+
+
+def test_running_size_matches_index(cache, tmp_path):
+    url = 'https://example.com/'
+    cache.store(cache.key(url), url, 'a' * 100)
+    cache.store(cache.key(url + 'b'), url + 'b', 'a' * 100)   # Corps partagé
+    cache.store(cache.key(url), url, 'c' * 50)                # Remplacement
+    assert cache.stats()['size_bytes'] == cache._total_size() == 150
+
+    for body in (tmp_path / 'http_cache' / 'bodies').rglob('*'):
+        if body.is_file():
+            body.unlink()
+    assert cache.lookup(cache.key(url)) is None               # Corps disparu: entrée oubliée
+    assert cache.stats()['size_bytes'] == cache._total_size() == 100
+
+
+# ============ SCRAPERS ============
+
+def test_fetch_page_serves_fresh_entry_without_request(cache):
+    scraper = FakeScraper([FakeResponse(200, '<html>ok</html>', {'ETag': '"v1"'})])
+    assert scraper.fetch_page('https://example.com/list', {'page': 1}) == '<html>ok</html>'
+    assert scraper.fetch_page('https://example.com/list', {'page': 1}) == '<html>ok</html>'
+    assert len(scraper.requests) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_fetch_page_revalidates_stale_entry(cache):
+    scraper = FakeScraper([
+        FakeResponse(200, '<html>ok</html>', {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}),
+        FakeResponse(304),
+    ], cache_ttl=0)
+    scraper.fetch_page('https://example.com/list')
+    assert scraper.fetch_page('https://example.com/list') == '<html>ok</html>'
+    assert scraper.requests[1] == {'If-None-Match': '"v1"',
+                                   'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    assert cache.stats()['revalidated'] == 1
+
+
+def test_replay_mode_is_offline(cache):
+    FakeScraper([FakeResponse(200, 'archivé')]).fetch_page('https://example.com/a')
+
+    cache.mode = 'replay'
+    scraper = FakeScraper([], cache_ttl=0)
+    assert scraper.fetch_page('https://example.com/a') == 'archivé'
+    with pytest.raises(CacheMiss):
+        scraper.fetch_page('https://example.com/inconnue')
+    assert scraper.requests == []
+
+
+def test_cache_off(cache):
+    cache.mode = 'off'
+    scraper = FakeScraper([FakeResponse(200, 'a'), FakeResponse(200, 'b')])
+    assert scraper.fetch_page('https://example.com/') == 'a'
+    assert scraper.fetch_page('https://example.com/') == 'b'
+    assert cache.stats()['entries'] == 0
+
+
+# ============ NOUVELLES TENTATIVES ============
+
+def test_fetch_page_retries_throttling_with_backoff(cache, monkeypatch):
+    waits = []
+    monkeypatch.setattr('retrying.time.sleep', waits.append)
+    scraper = FakeScraper([FakeResponse(503), FakeResponse(429), FakeResponse(200, 'ok')])
+
+    assert scraper.fetch_page('https://example.com/occupe') == 'ok'
+    # Backoff exponentiel (2 s puis 4 s) plus une gigue d'au plus 1 s
+    assert len(waits) == 2
+    assert 2 <= waits[0] <= 3 and 4 <= waits[1] <= 5
+
+
+def test_fetch_page_does_not_retry_client_errors(cache, monkeypatch):
+    monkeypatch.setattr('retrying.time.sleep', lambda seconds: None)
+    scraper = FakeScraper([FakeResponse(404)])
+
+    with pytest.raises(requests.HTTPError):
+        scraper.fetch_page('https://example.com/absente')
+    assert len(scraper.requests) == 1
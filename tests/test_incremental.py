@@ -0,0 +1,191 @@
+"""
+Tests du scraping incrémental (points de reprise et arrêt anticipé)
+"""
+import json
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('bs4')
+pytest.importorskip('retrying')
+
+from config import SCRAPERS_CONFIG
+from scrapers.base_scraper import BaseScraper
+from scrapers.dvf_opendata_scraper import DVFOpenDataScraper
+from scrapers.http_cache import ResponseCache, set_response_cache
+from scrapers.manager import ScraperManager
+
+
+class PagedScraper(BaseScraper):
+    """Résultats paginés du plus récent au plus ancien; `fresh` annonces nouvelles en tête"""
+
+    def __init__(self, pages=4, per_page=5):
+        super().__init__('paged', {'delay_between_requests': 0, 'max_pages': pages})
+        self.per_page = per_page
+        self.fresh = 0
+        self.requests = []
+
+    def search(self, budget_min, budget_max, dpe_max, zones):
+        return []
+
+    def parse_property(self, element):
+        pass
+
+    def listing(self, zone, rank):
+        # rang négatif = publiée après le premier run
+        return {
+            'id': f'paged-{zone}-{rank}', 'source': 'paged', 'title': 'Appartement',
+            'url': f'https://example.com/{zone}/{rank}', 'location': zone,
+            'price': 250000, 'surface': 45,
+            'posted_date': f'2024-06-{30 - rank - self.fresh:02d}T12:00:00' if rank >= 0 else
+                           f'2024-07-{-rank:02d}T12:00:00',
+        }
+
+    def search_zone(self, zone, budget_min, budget_max, dpe_max, page=1):
+        self.requests.append((zone, page))
+        start = (page - 1) * self.per_page - self.fresh
+        return [self.listing(zone, rank) for rank in range(start, start + self.per_page)]
+
+
+def make_manager(scraper):
+    manager = ScraperManager.__new__(ScraperManager)
+    manager.scrapers = {scraper.name: scraper}
+    return manager
+
+
+# ============ ARRÊT ANTICIPÉ ============
+
+def test_second_run_stops_after_first_known_page(tmp_db):
+    scraper = PagedScraper(pages=4)
+    manager = make_manager(scraper)
+
+    first = manager.ingest(tmp_db, zones=['Paris'])
+    assert first['inserted'] == 20
+    assert len(scraper.requests) == 4
+
+    scraper.requests.clear()
+    second = manager.ingest(tmp_db, zones=['Paris'])
+    assert scraper.requests == [('Paris', 1)]
+    assert second['skipped_pages'] == 3
+    assert second['stopped_zones'] == 1
+
+
+def test_new_listings_keep_crawling_until_known_page(tmp_db):
+    scraper = PagedScraper(pages=4)
+    manager = make_manager(scraper)
+    manager.ingest(tmp_db, zones=['Paris'])
+
+    # 5 nouvelles annonces: la page 1 est nouvelle, la page 2 déjà connue
+    scraper.fresh = 5
+    scraper.requests.clear()
+    stats = manager.ingest(tmp_db, zones=['Paris'])
+
+    assert stats['inserted'] == 5
+    assert ('Paris', 2) in scraper.requests
+    assert ('Paris', 4) not in scraper.requests
+
+
+def test_full_resync_walks_every_page(tmp_db):
+    scraper = PagedScraper(pages=3)
+    manager = make_manager(scraper)
+    manager.ingest(tmp_db, zones=['Paris'])
+
+    scraper.requests.clear()
+    stats = manager.ingest(tmp_db, zones=['Paris'], full_resync=True)
+    assert len(scraper.requests) == 3
+    assert stats['skipped_pages'] == 0
+
+
+# ============ SOURCE PAGINÉE (DVF OPEN DATA) ============
+
+class FakeDVFResponse:
+    def __init__(self, records):
+        self.status_code = 200
+        self.text = json.dumps({'records': records})
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def no_http_cache(tmp_path):
+    previous = set_response_cache(ResponseCache(tmp_path / 'http_cache', mode='off'))
+    yield
+    set_response_cache(previous)
+
+
+def make_dvf_scraper(total=12, page_size=5):
+    """Scraper DVF Open Data dont l'API sert `total` mutations, les plus récentes d'abord"""
+    scraper = DVFOpenDataScraper({'page_size': page_size, 'max_pages': 4,
+                                  'delay_between_requests': 0, 'rate_limit': {'requests_per_second': None}})
+    scraper.offsets = []
+
+    def get(url, params=None, **kwargs):
+        scraper.offsets.append(params['offset'])
+        records = [{'record': {'id_mutation': f'2024-{rank}', 'valeur_fonciere': 120000,
+                               'surface_reelle_bati': 45, 'type_local': 'Appartement',
+                               'date_mutation': f'2024-06-{30 - rank:02d}'}}
+                   for rank in range(params['offset'], min(params['offset'] + params['limit'], total))]
+        return FakeDVFResponse(records)
+
+    scraper.session.get = get
+    return scraper
+
+
+def test_dvf_opendata_requests_one_page_per_offset(no_http_cache):
+    scraper = make_dvf_scraper()
+    page = scraper.search_zone('Paris', 100000, 150000, 'E', page=2)
+
+    assert scraper.offsets == [5]
+    assert [prop['id'] for prop in page] == [f'dvf_2024-{rank}' for rank in range(5, 10)]
+    url, params = scraper._zone_request('Paris', 100000, 150000, page=3)
+    assert url.endswith('/dvf-data/records')
+    assert (params['limit'], params['offset']) == (5, 10)
+
+
+def test_dvf_opendata_second_run_stops_after_first_page(tmp_db, no_http_cache):
+    scraper = make_dvf_scraper()
+    manager = make_manager(scraper)
+
+    first = manager.ingest(tmp_db, zones=['Paris'])
+    assert first['inserted'] == 12
+    assert scraper.offsets == [0, 5, 10, 15]
+
+    scraper.offsets.clear()
+    second = manager.ingest(tmp_db, zones=['Paris'])
+    assert scraper.offsets == [0]
+    assert second['skipped_pages'] == 3
+
+
+def test_dvf_opendata_is_registered_by_its_own_flag(monkeypatch):
+    monkeypatch.setitem(SCRAPERS_CONFIG['dvf_opendata'], 'enabled', True)
+    assert isinstance(ScraperManager().scrapers['dvf_opendata'], DVFOpenDataScraper)
+
+    monkeypatch.setitem(SCRAPERS_CONFIG['dvf_opendata'], 'enabled', False)
+    assert 'dvf_opendata' not in ScraperManager().scrapers
+
+
+# ============ POINTS DE REPRISE ============
+
+def test_high_water_mark_is_saved(tmp_db):
+    assert tmp_db.get_last_scrape_run() is None
+    manager = make_manager(PagedScraper(pages=2))
+    manager.ingest(tmp_db, zones=['Paris', 'Lyon'])
+
+    states = tmp_db.get_scrape_states()
+    assert set(states) == {('paged', 'Paris'), ('paged', 'Lyon')}
+    assert states[('paged', 'Paris')]['last_listing_id'] == 'paged-Paris-0'
+    assert states[('paged', 'Paris')]['last_posted_date'] == '2024-06-30T12:00:00'
+    assert states[('paged', 'Paris')]['last_full_run_at'] is not None
+    assert tmp_db.get_last_scrape_run() == states[('paged', 'Paris')]['last_run_at']
+
+
+def test_high_water_mark_never_goes_back(tmp_db):
+    tmp_db.save_scrape_states({('s', 'z'): {'last_listing_id': 'new', 'last_posted_date': '2024-07-01'}})
+    tmp_db.save_scrape_states({('s', 'z'): {'last_listing_id': 'old', 'last_posted_date': '2024-01-01'}})
+
+    state = tmp_db.get_scrape_states()[('s', 'z')]
+    assert state['last_listing_id'] == 'new'
+    assert state['last_posted_date'] == '2024-07-01'
+    assert state['last_full_run_at'] is None
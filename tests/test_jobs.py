@@ -0,0 +1,104 @@
+"""
+Tests de la file de jobs de scraping
+"""
+import threading
+
+import pytest
+
+from jobs import JobManager, JobQueueFull, DONE, FAILED
+
+
+def wait_finished(manager, job_id, timeout=5):
+    """Attendre la fin d'un job (les workers tournent en arrière-plan)"""
+    pause = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        job = manager.get(job_id)
+        if job['status'] in (DONE, FAILED):
+            return job
+        pause.wait(0.01)
+    raise AssertionError(f'job {job_id} non terminé')
+
+
+def test_job_reports_sources_and_result():
+    manager = JobManager(max_workers=1, max_pending=1)
+
+    def work(job):
+        job.source_started('pap')
+        job.source_done('pap', 12)
+        job.source_started('seloger')
+        job.source_done('seloger', 0, 'timeout')
+        return {'total': 12, 'new': 3}
+
+    job, coalesced = manager.submit('scrape', {'source': 'all'}, work)
+    assert not coalesced
+    state = wait_finished(manager, job.id)
+
+    assert state['status'] == DONE
+    assert state['result'] == {'total': 12, 'new': 3}
+    assert state['sources']['pap']['count'] == 12
+    assert state['sources']['pap']['status'] == DONE
+    assert state['sources']['seloger']['status'] == FAILED
+    assert state['sources']['seloger']['duration'] is not None
+    assert state['duration'] is not None
+
+
+def test_failing_job_is_marked_failed():
+    manager = JobManager(max_workers=1)
+
+    def work(job):
+        raise RuntimeError('site indisponible')
+
+    job, _ = manager.submit('scrape', {'source': 'pap'}, work)
+    state = wait_finished(manager, job.id)
+    assert state['status'] == FAILED
+    assert state['error'] == 'site indisponible'
+
+
+def test_identical_submissions_are_coalesced():
+    release = threading.Event()
+    manager = JobManager(max_workers=1, max_pending=5)
+    calls = []
+
+    def work(job):
+        calls.append(job.id)
+        release.wait(5)
+
+    first, _ = manager.submit('scrape', {'source': 'all', 'zones': ['Paris']}, work)
+    second, coalesced = manager.submit('scrape', {'zones': ['Paris'], 'source': 'all'}, work)
+    other, other_coalesced = manager.submit('scrape', {'source': 'pap'}, work)
+
+    assert coalesced and second is first
+    assert not other_coalesced and other is not first
+    assert manager.get(first.id)['coalesced'] == 1
+
+    release.set()
+    wait_finished(manager, first.id)
+    wait_finished(manager, other.id)
+    assert len(calls) == 2
+
+    # Une fois terminé, la même soumission relance un job
+    third, coalesced = manager.submit('scrape', {'source': 'all', 'zones': ['Paris']}, lambda job: None)
+    assert not coalesced and third is not first
+    wait_finished(manager, third.id)
+
+
+def test_queue_is_bounded():
+    release = threading.Event()
+    manager = JobManager(max_workers=1, max_pending=1)
+    work = lambda job: release.wait(5)
+
+    manager.submit('scrape', {'n': 1}, work)
+    manager.submit('scrape', {'n': 2}, work)
+    with pytest.raises(JobQueueFull):
+        manager.submit('scrape', {'n': 3}, work)
+
+    release.set()
+    manager.shutdown()
+
+
+def test_listener_sees_start_and_finish():
+    seen = []
+    manager = JobManager(max_workers=1, listener=lambda job: seen.append(job['status']))
+    job, _ = manager.submit('scrape', {}, lambda job: {'new': 0})
+    manager.shutdown()
+    assert seen == ['running', DONE]
@@ -0,0 +1,87 @@
+"""
+Tests de la dimension des localisations (locations.py)
+"""
+from conftest import make_listing
+from database.db import Database
+from dvf_import import import_dvf
+from locations import department_code, seed_locations
+
+
+def ids(rows):
+    return sorted(row['id'] for row in rows)
+
+
+# ============ RÉSOLUTION ============
+
+def test_department_code_and_seeds():
+    assert department_code('Hauts-de-Seine') == '92'
+    assert department_code('92') == department_code('92000') == '92'
+    assert department_code('2A') == '2A'
+    assert department_code('Lyon') is None
+
+    paris_15 = next(loc for loc in seed_locations() if loc['commune'] == 'Paris 15e')
+    assert (paris_15['insee_code'], paris_15['postal_code'], paris_15['department']) == ('75115', '75015', '75')
+
+
+def test_listings_resolved_at_insert(tmp_db):
+    tmp_db.add_properties_bulk([
+        make_listing(1, location='Nanterre', department='Hauts-de-Seine'),
+        make_listing(2, location='Paris 15e', department='Paris'),
+        make_listing(3, location='Appartement Paris 75015'),   # Code postal -> arrondissement
+        make_listing(4, location='Lyon 69003'),                # Commune inconnue: ajoutée
+        make_listing(5, location='Lyon'),
+    ])
+    tmp_db.add_property(make_listing(6, location='Vincennes', department='Val-de-Marne'))
+
+    location_ids = {p['id']: p['location_id'] for p in tmp_db.get_properties()}
+    assert None not in location_ids.values()
+    assert location_ids['prop_2'] == location_ids['prop_3']
+    assert location_ids['prop_4'] == location_ids['prop_5']
+
+    assert ids(tmp_db.get_properties({'department': '92'})) == ['prop_1']
+    assert ids(tmp_db.get_properties({'department': ['Paris', '69']})) == ['prop_2', 'prop_3', 'prop_4', 'prop_5']
+    assert ids(tmp_db.get_properties({'commune': 'vincennes'})) == ['prop_6']
+    assert tmp_db.count_properties({'department': '94'}) == 1
+
+    lyon = tmp_db.get_locations('69')
+    assert [(loc['commune'], loc['postal_code'], loc['n_properties']) for loc in lyon] == [('Lyon', '69003', 2)]
+
+
+def test_existing_listings_assigned_once_on_open(tmp_db):
+    tmp_db.add_property(make_listing(1, location='Colombes', department='Hauts-de-Seine'))
+    with tmp_db.connection() as conn:
+        # Base antérieure à la migration
+        conn.execute('UPDATE properties SET location_id = NULL')
+        conn.execute('PRAGMA user_version = 0')
+        conn.commit()
+
+    Database()
+    assert tmp_db.get_property('prop_1')['location_id'] is not None
+    assert ids(tmp_db.get_properties({'department': 'Hauts-de-Seine'})) == ['prop_1']
+
+    # Migration déjà appliquée: les ouvertures suivantes ne reparcourent pas la table
+    with tmp_db.connection() as conn:
+        conn.execute('UPDATE properties SET location_id = NULL')
+        conn.commit()
+    Database()
+    assert tmp_db.get_property('prop_1')['location_id'] is None
+
+
+def test_locations_completed_from_dvf(tmp_db, tmp_path):
+    path = tmp_path / 'geo-dvf.csv'
+    path.write_text(
+        'id_mutation,date_mutation,nature_mutation,valeur_fonciere,code_postal,nom_commune,'
+        'code_departement,code_commune,type_local,surface_reelle_bati,'
+        'nombre_pieces_principales,surface_terrain,longitude,latitude\n'
+        '2024-1,2024-02-01,Vente,250000,92000,Nanterre,92,92050,Appartement,45,2,,2.20,48.89\n',
+        encoding='utf-8')
+    import_dvf(tmp_db, path, departments={'92'})
+    tmp_db.refresh_commune_centroids()
+
+    [nanterre] = [loc for loc in tmp_db.get_locations('92') if loc['commune'] == 'Nanterre']
+    assert (nanterre['insee_code'], nanterre['postal_code']) == ('92050', '92000')
+    assert (nanterre['latitude'], nanterre['longitude']) == (48.89, 2.20)
+
+    # Le code postal complété sert à la résolution des annonces suivantes
+    tmp_db.add_property(make_listing(1, location='Appartement 92000'))
+    assert tmp_db.get_property('prop_1')['location_id'] == nanterre['id']
@@ -0,0 +1,152 @@
+"""
+Tests du pipeline d'ingestion en flux
+"""
+import threading
+import time
+
+import pytest
+
+from conftest import make_listing
+from scrapers.pipeline import IngestPipeline, prepare_listing
+
+
+class RecordingWriter:
+    """Remplace Database.add_properties_bulk: mémorise les lots écrits"""
+
+    def __init__(self, delay=0):
+        self.batches = []
+        self.delay = delay
+
+    def __call__(self, batch):
+        time.sleep(self.delay)
+        self.batches.append(list(batch))
+        return [(prop, 'inserted') for prop in batch]
+
+
+def test_listings_are_normalized_and_batched():
+    writer = RecordingWriter()
+    pipeline = IngestPipeline(writer, batch_size=3, flush_seconds=5)
+
+    def produce(emit):
+        emit([make_listing(i) for i in range(5)])
+        emit([make_listing(99, title=None, price='N/A'), make_listing(100, surface='50')])
+
+    stats = pipeline.run(produce)
+
+    assert stats['scraped'] == stats['valid'] == 7
+    assert [len(batch) for batch in writer.batches] == [3, 3, 1]
+    written = {prop['id']: prop for batch in writer.batches for prop in batch}
+    assert written['prop_99']['title'] == 'Sans titre'
+    assert written['prop_99']['price'] is None
+    assert written['prop_100']['surface'] == 50.0
+    assert stats['inserted'] == 7
+    assert stats['batches'] == 3
+
+
+def test_rejected_listings_are_counted():
+    writer = RecordingWriter()
+    prepare = lambda prop: prop if prop['price'] < 203000 else None
+    pipeline = IngestPipeline(writer, batch_size=10, flush_seconds=0.05, prepare=prepare)
+
+    stats = pipeline.run(lambda emit: emit([make_listing(i) for i in range(5)]))
+    assert stats['valid'] == 3
+    assert stats['rejected'] == 2
+
+
+def test_first_batch_written_before_scraping_ends():
+    writer = RecordingWriter()
+    pipeline = IngestPipeline(writer, batch_size=100, flush_seconds=0.05)
+    written_during_scrape = []
+
+    def produce(emit):
+        emit([make_listing(1)])
+        time.sleep(0.3)  # source lente
+        written_during_scrape.append(len(writer.batches))
+        emit([make_listing(2)])
+
+    stats = pipeline.run(produce)
+    assert written_during_scrape == [1]
+    assert stats['first_write_seconds'] < 0.3
+
+
+def test_bounded_queues_apply_backpressure():
+    writer = RecordingWriter(delay=0.01)
+    pipeline = IngestPipeline(writer, batch_size=5, queue_size=5, flush_seconds=0.05)
+    peak = []
+
+    def produce(emit):
+        for i in range(60):
+            emit([make_listing(i)])
+            peak.append(pipeline._raw.qsize() + pipeline._valid.qsize())
+
+    stats = pipeline.run(produce)
+    assert stats['inserted'] == 60
+    assert max(peak) <= 10
+
+
+def test_writer_error_stops_producer():
+    def failing_writer(batch):
+        raise RuntimeError('disque plein')
+
+    pipeline = IngestPipeline(failing_writer, batch_size=1, queue_size=2, flush_seconds=0.05)
+    emitted = []
+
+    def produce(emit):
+        for i in range(1000):
+            emit([make_listing(i)])
+            emitted.append(i)
+
+    with pytest.raises(RuntimeError):
+        pipeline.run(produce)
+    assert len(emitted) < 1000
+
+
+def test_producer_error_is_raised_after_flush():
+    writer = RecordingWriter()
+    pipeline = IngestPipeline(writer, batch_size=10, flush_seconds=0.05)
+
+    def produce(emit):
+        emit([make_listing(1)])
+        raise ValueError('source indisponible')
+
+    with pytest.raises(ValueError):
+        pipeline.run(produce)
+    assert sum(len(batch) for batch in writer.batches) == 1
+
+
+def test_transform_error_with_full_queue_stops_pipeline():
+    writer = RecordingWriter()
+
+    def prepare(prop):
+        if prop['price'] == 205000:
+            raise RuntimeError('annonce illisible')
+        return prop
+
+    pipeline = IngestPipeline(writer, batch_size=10, queue_size=10, flush_seconds=0.05, prepare=prepare)
+    errors = []
+
+    def run():
+        try:
+            pipeline.run(lambda emit: emit([make_listing(i) for i in range(100)]))
+        except RuntimeError as e:
+            errors.append(e)
+
+    runner = threading.Thread(target=run, daemon=True)
+    runner.start()
+    runner.join(timeout=5)
+    assert not runner.is_alive(), 'pipeline bloqué après une erreur de validation'
+    assert [str(e) for e in errors] == ['annonce illisible']
+    assert sum(len(batch) for batch in writer.batches) == 5
+
+
+def test_prepare_listing_rejects_unnormalizable_listing():
+    assert prepare_listing(make_listing(1, title=12345)) is None
+
+
+def test_ingest_keeps_fields_outside_the_model(tmp_db):
+    # Même chaîne que ScraperManager.ingest: prepare_listing puis add_properties_bulk
+    pipeline = IngestPipeline(tmp_db.add_properties_bulk, flush_seconds=0.05)
+    pipeline.run(lambda emit: emit([make_listing(1, rooms=3, description='Balcon plein sud', ges='D')]))
+
+    stored = tmp_db.get_property('prop_1')
+    assert (stored['rooms'], stored['description'], stored['ges']) == (3, 'Balcon plein sud', 'D')
@@ -0,0 +1,66 @@
+"""
+Tests du limiteur de débit par hôte
+"""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('bs4')
+pytest.importorskip('retrying')
+
+from scrapers.rate_limiter import (HostRateLimiter, get_rate_limiter, limiter_for_url,
+                                   rate_limit_settings, reset_rate_limiters)
+
+
+def test_burst_then_throttled():
+    limiter = HostRateLimiter('example.com', requests_per_second=20, burst=3, max_concurrent=5)
+    start = time.monotonic()
+    for _ in range(5):
+        with limiter.acquire():
+            pass
+    # 3 jetons immédiats puis 2 requêtes à 20 req/s
+    assert time.monotonic() - start >= 0.09
+    stats = limiter.stats()
+    assert stats['requests'] == 5
+    assert stats['throttled'] == 2
+
+
+def test_concurrency_cap_across_threads():
+    limiter = HostRateLimiter('example.com', requests_per_second=None, max_concurrent=2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def request():
+        with limiter.acquire():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+def test_limiter_shared_per_host():
+    reset_rate_limiters()
+    config = {'delay_between_requests': 2}
+    first = limiter_for_url('https://www.pap.fr/annonces?page=1', config)
+    second = limiter_for_url('https://WWW.PAP.FR/autre', {'rate_limit': {'requests_per_second': 9}})
+    assert first is second
+    assert first.rate == 0.5
+    assert get_rate_limiter('www.seloger.com') is not first
+    reset_rate_limiters()
+
+
+def test_settings_default_to_delay():
+    assert rate_limit_settings({'delay_between_requests': 4}) == {'requests_per_second': 0.25}
+    assert rate_limit_settings({'rate_limit': {'requests_per_second': 2, 'burst': 5}}) == \
+        {'requests_per_second': 2, 'burst': 5}
@@ -0,0 +1,67 @@
+"""
+Tests des prix de référence par commune et du deal_score
+"""
+from config import REFERENCE_CONFIG
+from conftest import make_listing
+from reference_prices import compute_references, deal_score, seed_references
+from utils import PropertyUtils
+
+
+def colombes_listing(n, price_per_sqm):
+    return make_listing(n, location='Colombes', surface=50.0, price=50.0 * price_per_sqm)
+
+
+# ============ CALCUL ============
+
+def test_compute_references_by_commune_and_type():
+    rows = [('Lyon 69003', 'Appartement', 100000.0 + 10000 * n, 20.0) for n in range(5)]
+    rows += [('Lyon', 'Maison', 300000.0, 100.0)] * 5
+    rows += [('Nantes', None, 100000.0, 25.0)] * 4  # Moins de min_sample annonces
+    rows += [('Lyon', None, 100000.0, None)]
+
+    references = {(ref['commune'], ref['property_type']): ref for ref in compute_references(rows)}
+    assert set(references) == {('lyon', ''), ('lyon', 'appartement'), ('lyon', 'maison')}
+    appartement = references[('lyon', 'appartement')]
+    assert appartement['median_price_per_sqm'] == 6000.0
+    assert (appartement['q1'], appartement['q3']) == (5500.0, 6500.0)
+    assert references[('lyon', '')]['sample_size'] == 10
+
+
+def test_deal_score_and_good_deal():
+    reference = {'median_price_per_sqm': 5000.0, 'q1': 4500.0, 'q3': 5500.0}
+    assert deal_score(200000.0, 50.0, reference) == 1.0
+    assert deal_score(300000.0, 50.0, reference) == -1.0
+    assert deal_score(200000.0, None, reference) is None
+    assert deal_score(200000.0, 50.0, None) is None
+
+    assert PropertyUtils.is_good_deal(200000.0, 50.0, reference)
+    assert not PropertyUtils.is_good_deal(240000.0, 50.0, reference)
+    assert not PropertyUtils.is_good_deal(100000.0, 50.0, None)
+
+    seeds = {ref['commune']: ref for ref in seed_references()}
+    assert seeds['nanterre']['median_price_per_sqm'] == 5500.0
+    assert seeds['nanterre']['sample_size'] == 0
+
+
+# ============ BASE ============
+
+def test_refresh_and_score_at_insert(tmp_db, monkeypatch):
+    monkeypatch.setitem(REFERENCE_CONFIG, 'refresh_seconds', 3600)
+    tmp_db.add_properties_bulk([colombes_listing(n, 4000.0 + 500 * n) for n in range(5)])
+    assert tmp_db.get_property('prop_0')['deal_score'] is None
+
+    # Colombes: 4000..6000 €/m² -> médiane 5000, IQR 1000; Nanterre: estimation
+    result = tmp_db.refresh_commune_reference()
+    assert result['computed'] == 1
+    assert result['rescored'] == 5
+    assert tmp_db.get_property('prop_0')['deal_score'] == 1.0
+    assert tmp_db.deal_reference('Nanterre')['sample_size'] == 0
+
+    # Nouvelle annonce notée à l'insertion, puis renotée si son prix change
+    tmp_db.add_properties_bulk([colombes_listing(10, 5500.0)])
+    assert tmp_db.get_property('prop_10')['deal_score'] == -0.5
+    tmp_db.add_properties_bulk([colombes_listing(10, 4500.0)])
+    assert tmp_db.get_property('prop_10')['deal_score'] == 0.5
+
+    best = tmp_db.get_properties(filters={'deal_min': 0.5}, sort='deal_desc')
+    assert [row['id'] for row in best] == ['prop_0', 'prop_10', 'prop_1']
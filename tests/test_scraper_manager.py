@@ -0,0 +1,109 @@
+"""
+Tests du ScraperManager: unités de travail, sources et ingestion en flux
+"""
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('bs4')
+pytest.importorskip('retrying')
+
+from scrapers.base_scraper import BaseScraper
+from scrapers.manager import ScraperManager
+
+
+class FakeScraper(BaseScraper):
+    """Scraper minimal: search() exécuté par le pool de workers"""
+
+    def __init__(self, name, count, error=None):
+        super().__init__(name, {'delay_between_requests': 0})
+        self.count = count
+        self.error = error
+
+    def search(self, budget_min, budget_max, dpe_max, zones):
+        if self.error:
+            raise RuntimeError(self.error)
+        return [{'id': f'{self.name}-{zone}-{i}'} for zone in zones for i in range(self.count)]
+
+    def parse_property(self, property_html):
+        pass
+
+
+def make_manager(*scrapers):
+    manager = ScraperManager.__new__(ScraperManager)
+    manager.scrapers = {scraper.name: scraper for scraper in scrapers}
+    return manager
+
+
+def test_units_cover_sources_zones_and_pages():
+    paged = FakeScraper('paged', 1)
+    paged.config['max_pages'] = 2
+    manager = make_manager(FakeScraper('a', 1), paged)
+
+    units = manager.work_units(['Paris', 'Lyon'])
+    assert ('a', 'Paris', 1) in units
+    assert ('paged', 'Lyon', 2) in units
+    assert len(units) == 6
+
+
+def test_scrape_all_reports_per_source():
+    manager = make_manager(FakeScraper('a', 2), FakeScraper('c', 0, 'down'))
+    progress = []
+
+    results = manager.scrape_all(100000, 500000, 'D', ['Paris', 'Lyon', 'Lille'],
+                                 on_progress=lambda *args: progress.append(args))
+
+    assert len(results) == 6
+    assert sorted(progress) == [('a', 6, None), ('c', 0, 'down')]
+
+
+class ListingScraper(FakeScraper):
+    """Annonces complètes, acceptées par la validation"""
+
+    def search(self, budget_min, budget_max, dpe_max, zones):
+        return [{
+            'id': f'{self.name}-{zone}-{i}', 'source': self.name, 'title': 'Appartement',
+            'url': f'https://example.com/{self.name}/{zone}/{i}', 'location': zone,
+            'price': 200000 + i, 'surface': 40,
+        } for zone in zones for i in range(self.count)]
+
+
+class BatchRecorder:
+    def __init__(self):
+        self.batches = []
+
+    def add_properties_bulk(self, batch):
+        self.batches.append(batch)
+        return [(prop, 'inserted') for prop in batch]
+
+    def existing_urls(self, urls):
+        return set()
+
+    def get_scrape_states(self):
+        return {}
+
+    def save_scrape_states(self, states):
+        self.states = states
+
+
+def test_ingest_streams_units_into_db():
+    manager = make_manager(ListingScraper('a', 2), ListingScraper('b', 1))
+    db = BatchRecorder()
+    inserted = []
+
+    stats = manager.ingest(db, 100000, 500000, 'D', ['Paris', 'Lyon'],
+                           on_batch=lambda outcomes: inserted.extend(outcomes))
+
+    assert stats['scraped'] == stats['inserted'] == 6
+    assert len(inserted) == 6
+    assert sum(len(batch) for batch in db.batches) == 6
+
+
+def test_ingest_unknown_source_is_reported():
+    manager = make_manager(ListingScraper('a', 2))
+    progress = []
+
+    stats = manager.ingest(BatchRecorder(), zones=['Paris'], sources=['absent'],
+                           on_progress=lambda *args: progress.append(args))
+
+    assert stats['scraped'] == 0
+    assert progress == [('absent', 0, 'Scraper non trouvé ou désactivé')]
@@ -0,0 +1,97 @@
+"""
+Tests du pool de workers adaptatif
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('bs4')
+pytest.importorskip('retrying')
+
+from scrapers.worker_pool import WAIT, AdaptiveConcurrency, AdaptiveWorkerPool, is_throttle_error
+
+
+class HTTPError(Exception):
+    """Erreur HTTP minimale portant sa réponse (comme requests.HTTPError)"""
+
+    def __init__(self, status):
+        super().__init__(f'HTTP {status}')
+        self.response = SimpleNamespace(status_code=status)
+
+
+def test_throttle_errors():
+    assert is_throttle_error(HTTPError(429))
+    assert is_throttle_error(HTTPError(503))
+    assert not is_throttle_error(HTTPError(404))
+    assert not is_throttle_error(ValueError('parse'))
+    assert not is_throttle_error(None)
+
+
+def test_concurrency_grows_on_fast_units():
+    controller = AdaptiveConcurrency(min_workers=1, max_workers=4, initial_workers=1, target_latency=1)
+    for _ in range(10):
+        controller.record(0.01)
+    assert controller.limit == 4
+
+
+def test_concurrency_halves_on_throttle():
+    controller = AdaptiveConcurrency(min_workers=2, max_workers=16, initial_workers=12, target_latency=1)
+    controller.record(0.01, HTTPError(429))
+    assert controller.limit == 6
+    controller.record(0.01, HTTPError(502))
+    controller.record(0.01, HTTPError(502))
+    assert controller.limit == 2
+    assert controller.stats()['throttled'] == 3
+
+
+def test_slow_units_reduce_concurrency():
+    controller = AdaptiveConcurrency(min_workers=1, max_workers=8, initial_workers=4, target_latency=0.5)
+    controller.record(2.0)
+    assert controller.limit == 3
+
+
+def test_units_run_in_parallel_and_stream():
+    pool = AdaptiveWorkerPool(min_workers=6, max_workers=6, initial_workers=6, target_latency=5)
+
+    def work(unit):
+        time.sleep(0.1 if unit != 'slow' else 0.3)
+        return unit.upper()
+
+    start = time.monotonic()
+    finished = [unit for unit, result, error, _ in pool.imap_unordered(work, ['slow', 'a', 'b', 'c', 'd', 'e'])]
+    elapsed = time.monotonic() - start
+
+    # Durée ~ unité la plus lente, résultats rendus dans l'ordre de fin
+    assert elapsed < 0.6
+    assert finished[-1] == 'slow'
+    assert sorted(finished) == ['a', 'b', 'c', 'd', 'e', 'slow']
+
+
+def test_errors_are_reported_not_raised():
+    pool = AdaptiveWorkerPool(min_workers=1, max_workers=2)
+
+    def work(unit):
+        if unit == 2:
+            raise HTTPError(503)
+        return unit
+
+    outcomes = {unit: (result, error) for unit, result, error, _ in pool.imap_unordered(work, [1, 2, 3])}
+    assert outcomes[1] == (1, None)
+    assert outcomes[2][0] is None and outcomes[2][1].response.status_code == 503
+
+
+def test_wait_defers_units_until_one_finishes():
+    pool = AdaptiveWorkerPool(min_workers=4, max_workers=4, initial_workers=4)
+    finished = []
+
+    def units():
+        yield 'page1'
+        while 'page1' not in finished:
+            yield WAIT
+        yield 'page2'
+
+    for unit, _, _, _ in pool.imap_unordered(lambda unit: unit, units()):
+        finished.append(unit)
+    assert finished == ['page1', 'page2']
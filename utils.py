@@ -8,6 +8,9 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any
 
+from config import REFERENCE_CONFIG
+from reference_prices import deal_score
+
 logger = logging.getLogger(__name__)
 
 
@@ -115,22 +118,14 @@ class PropertyUtils:
             return "A"
     
     @staticmethod
-    def is_good_deal(price: float, surface: float, zone: str) -> bool:
-        """Déterminer si c'est une bonne affaire"""
-        if not price or not surface:
-            return False
-        
-        price_per_sqm = price / surface
+    def is_good_deal(price: float, surface: float, reference: Dict = None) -> bool:
+        """Déterminer si c'est une bonne affaire
         
-        # Seuils par zone (estimé)
-        thresholds = {
-            'Paris': 8000,
-            'Hauts-de-Seine': 6000,
-            'Val-de-Marne': 5000
-        }
-        
-        threshold = thresholds.get(zone, 6000)
-        return price_per_sqm < threshold * 0.8  # 20% en dessous du seuil
+        Le prix/m² doit être au moins REFERENCE_CONFIG['good_deal_score'] IQR
+        sous la médiane de la commune (Database.deal_reference).
+        """
+        score = deal_score(price, surface, reference)
+        return score is not None and score >= REFERENCE_CONFIG.get('good_deal_score', 1.0)
 
 
 class DataProcessor:
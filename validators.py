@@ -13,8 +13,10 @@ class PropertyModel(BaseModel):
     price: Optional[float] = None
     surface: Optional[float] = None
     price_per_sqm: Optional[float] = None
+    property_type: Optional[str] = None
     dpe: Optional[str] = 'N/A'
     dpe_value: Optional[int] = None
+    department: Optional[str] = None
     images: List[str] = []
     contact_name: Optional[str] = ''
     contact_phone: Optional[str] = ''